@@ -0,0 +1,191 @@
+import re
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from .ingest_utils import normalize_whitespace
+
+# ---------------------------------------------------------------------
+# Chunkers
+# ---------------------------------------------------------------------
+# Every chunker maps normalized text to a list of chunk strings. Boundaries
+# are found in one regex (or tokenizer) pass and packed with np.searchsorted
+# over their offsets, so each chunk costs one slice of the source text.
+
+# End of a sentence (punctuation, optional closing quote/bracket, whitespace)
+# or a paragraph break. Units start at each match's end.
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])[\"')\]]*\s+|\n\s*\n")
+_MD_HEADING = re.compile(r"^(#{1,6})[ \t]+(.+?)[ \t#]*$", re.MULTILINE)
+
+
+def chunk_text(text: str, chunk_size: int = 900, overlap: int = 150) -> List[str]:
+    """
+    Simple character-based chunker with overlap.
+    - chunk_size: target size in characters
+    - overlap: overlap between consecutive chunks
+    """
+    text = normalize_whitespace(text)
+    if not text:
+        return []
+    if overlap >= chunk_size:
+        overlap = max(0, chunk_size // 4)
+
+    chunks: List[str] = []
+    start = 0
+    n = len(text)
+    while start < n:
+        end = min(n, start + chunk_size)
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        if end >= n:
+            break
+        start = max(0, end - overlap)
+    return chunks
+
+
+def _pack(text: str, starts: np.ndarray, chunk_size: int, overlap: int) -> List[str]:
+    """
+    Greedily pack units [starts[i], starts[i+1]) into chunks of at most
+    `chunk_size` characters, repeating up to `overlap` characters of whole
+    units between chunks. A unit longer than chunk_size is split by characters.
+    """
+    chunks: List[str] = []
+    last = len(starts) - 1
+    i = 0
+    while i < last:
+        j = int(np.searchsorted(starts, starts[i] + chunk_size, side="right")) - 1
+        if j <= i:
+            chunks.extend(chunk_text(text[starts[i] : starts[i + 1]], chunk_size, overlap))
+            i += 1
+            continue
+        chunk = text[starts[i] : starts[j]].strip()
+        if chunk:
+            chunks.append(chunk)
+        if j >= last:
+            break
+        k = int(np.searchsorted(starts, starts[j] - overlap, side="left"))
+        i = max(k, i + 1)
+    return chunks
+
+
+def sentence_chunks(text: str, chunk_size: int = 900, overlap: int = 150) -> List[str]:
+    """Sentence/paragraph-aligned chunks of at most chunk_size characters."""
+    if not text:
+        return []
+    bounds = [m.end() for m in _SENTENCE_BOUNDARY.finditer(text)]
+    starts = np.fromiter([0, *bounds, len(text)], dtype=np.int64)
+    return _pack(text, np.unique(starts), chunk_size, overlap)
+
+
+def markdown_chunks(text: str, chunk_size: int = 900, overlap: int = 150) -> List[str]:
+    """
+    Split at Markdown headings, then sentence-chunk each section. Every chunk
+    is prefixed with its heading trail ("Title > Section") so it stays
+    self-describing once retrieved on its own.
+    """
+    if not text:
+        return []
+    trail: List[str] = []
+    sections = []
+    pos = 0
+    for m in _MD_HEADING.finditer(text):
+        sections.append((" > ".join(trail), text[pos : m.start()]))
+        level = len(m.group(1))
+        trail = trail[: level - 1] + [m.group(2).strip()]
+        pos = m.end()
+    sections.append((" > ".join(trail), text[pos:]))
+
+    chunks: List[str] = []
+    for heading, body in sections:
+        body = body.strip()
+        if not body:
+            continue
+        prefix = f"{heading}\n" if heading else ""
+        if len(prefix) > chunk_size // 2:
+            # Keep the innermost headings; the body gets at least half of each chunk
+            prefix = "…" + prefix[len(prefix) - chunk_size // 2 + 1 :]
+        budget = chunk_size - len(prefix)
+        chunks.extend(prefix + ch for ch in sentence_chunks(body, budget, overlap))
+    return chunks
+
+
+class TokenChunker:
+    """
+    Fixed windows of `max_tokens` tokens (with `overlap` tokens repeated),
+    counted by the embedding model's own tokenizer so no chunk is silently
+    truncated at embedding time. Chunks are cut from the source text via the
+    tokenizer's character offsets.
+    """
+
+    def __init__(self, tokenizer, max_tokens: int = 256, overlap: int = 32):
+        self.tokenizer = tokenizer
+        self.max_tokens = max(1, max_tokens)
+        self.overlap = min(max(0, overlap), self.max_tokens - 1)
+
+    def __call__(self, text: str) -> List[str]:
+        if not text:
+            return []
+        offsets = np.asarray(
+            self.tokenizer.encode(text, add_special_tokens=False).offsets, dtype=np.int64
+        ).reshape(-1, 2)
+        n = len(offsets)
+        if n == 0:
+            return []
+        step = self.max_tokens - self.overlap
+        first = np.arange(0, max(n - self.overlap, 1), step)
+        last = np.minimum(first + self.max_tokens, n) - 1
+        spans = zip(offsets[first, 0].tolist(), offsets[last, 1].tolist())
+        return [c for c in (text[s:e].strip() for s, e in spans) if c]
+
+
+def model_tokenizer(embedder):
+    """
+    The fastembed model's tokenizer with truncation and padding turned off
+    (fastembed truncates to the model's max length, which would hide overflow).
+    """
+    from tokenizers import Tokenizer
+
+    tok = Tokenizer.from_str(embedder.model.tokenizer.to_str())
+    tok.no_truncation()
+    tok.no_padding()
+    return tok
+
+
+CHUNKERS = ("char", "sentence", "markdown", "token", "auto")
+
+ChunkFn = Callable[[str, str], List[str]]
+
+
+def build_chunker(
+    name: str,
+    chunk_size: int = 900,
+    overlap: int = 150,
+    tokenizer=None,
+    chunk_tokens: int = 256,
+    overlap_tokens: int = 32,
+) -> ChunkFn:
+    """
+    Returns fn(document_id, text) -> chunks. "auto" uses the Markdown chunker
+    for *.md documents and the sentence chunker for everything else.
+    """
+    by_name: Dict[str, Callable[[str], List[str]]] = {
+        "char": lambda t: chunk_text(t, chunk_size, overlap),
+        "sentence": lambda t: sentence_chunks(t, chunk_size, overlap),
+        "markdown": lambda t: markdown_chunks(t, chunk_size, overlap),
+    }
+    if name == "token":
+        if tokenizer is None:
+            raise ValueError("token chunker needs the embedding model's tokenizer")
+        token_chunker = TokenChunker(tokenizer, chunk_tokens, overlap_tokens)
+        return lambda doc_id, text: token_chunker(text)
+    if name == "auto":
+        return lambda doc_id, text: (
+            markdown_chunks(text, chunk_size, overlap)
+            if doc_id.endswith(".md")
+            else sentence_chunks(text, chunk_size, overlap)
+        )
+    if name not in by_name:
+        raise ValueError(f"unknown chunker {name!r}; expected one of {CHUNKERS}")
+    fn = by_name[name]
+    return lambda doc_id, text: fn(text)
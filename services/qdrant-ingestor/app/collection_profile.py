@@ -0,0 +1,102 @@
+from dataclasses import dataclass, replace
+from typing import Any, Dict, Optional
+
+from qdrant_client import QdrantClient
+from qdrant_client.http import models as qm
+
+# ---------------------------------------------------------------------
+# Collection storage profiles
+# ---------------------------------------------------------------------
+# How dense vectors are stored and indexed. Quantized profiles keep a
+# compressed copy of every vector in RAM for the HNSW walk and move the
+# float32 originals to disk (read back only to rescore the top candidates),
+# which is what keeps RAM and p99 flat as the corpus grows.
+
+
+@dataclass(frozen=True)
+class CollectionProfile:
+    quantization: str = "none"  # none | scalar (int8) | binary (1 bit per dim)
+    quantile: float = 0.99  # scalar: clip outliers before mapping to int8
+    always_ram: bool = True  # keep quantized vectors in RAM
+    on_disk: bool = False  # float32 originals memory-mapped from disk
+    hnsw_m: Optional[int] = None  # edges per node (Qdrant default 16)
+    hnsw_ef_construct: Optional[int] = None  # build-time beam (default 100)
+    indexing_threshold_kb: Optional[int] = None  # build HNSW above this segment size
+    memmap_threshold_kb: Optional[int] = None  # move segments to mmap above this size
+
+    def vector_params(self, size: int) -> qm.VectorParams:
+        return qm.VectorParams(size=size, distance=qm.Distance.COSINE, on_disk=self.on_disk or None)
+
+    def quantization_config(self) -> Optional[qm.QuantizationConfig]:
+        if self.quantization == "scalar":
+            return qm.ScalarQuantization(
+                scalar=qm.ScalarQuantizationConfig(
+                    type=qm.ScalarType.INT8,
+                    quantile=self.quantile,
+                    always_ram=self.always_ram,
+                )
+            )
+        if self.quantization == "binary":
+            return qm.BinaryQuantization(
+                binary=qm.BinaryQuantizationConfig(always_ram=self.always_ram)
+            )
+        return None
+
+    def hnsw_config(self) -> Optional[qm.HnswConfigDiff]:
+        if self.hnsw_m is None and self.hnsw_ef_construct is None:
+            return None
+        return qm.HnswConfigDiff(m=self.hnsw_m, ef_construct=self.hnsw_ef_construct)
+
+    def optimizers_config(self) -> Optional[qm.OptimizersConfigDiff]:
+        if self.indexing_threshold_kb is None and self.memmap_threshold_kb is None:
+            return None
+        return qm.OptimizersConfigDiff(
+            indexing_threshold=self.indexing_threshold_kb,
+            memmap_threshold=self.memmap_threshold_kb,
+        )
+
+    def create_kwargs(self) -> Dict[str, Any]:
+        """Collection-level create_collection kwargs (vectors_config aside)."""
+        return dict(
+            hnsw_config=self.hnsw_config(),
+            optimizers_config=self.optimizers_config(),
+            quantization_config=self.quantization_config(),
+        )
+
+
+# Binary quantization loses too much on small (<~512 dim) models unless
+# searches oversample and rescore generously; measure with
+# benchmarks/bench_search_profiles.py before switching.
+PROFILES: Dict[str, CollectionProfile] = {
+    "default": CollectionProfile(),
+    "scalar": CollectionProfile(quantization="scalar", on_disk=True),
+    "binary": CollectionProfile(quantization="binary", on_disk=True),
+}
+
+QUANTIZATIONS = ("none", "scalar", "binary")
+
+
+def build_profile(name: str, **overrides) -> CollectionProfile:
+    """A named profile with any non-None `overrides` applied."""
+    if name not in PROFILES:
+        raise ValueError(f"unknown collection profile {name!r}; expected one of {tuple(PROFILES)}")
+    return replace(PROFILES[name], **{k: v for k, v in overrides.items() if v is not None})
+
+
+def apply_profile(
+    client: QdrantClient,
+    collection: str,
+    profile: CollectionProfile,
+    vector_name: str = "",
+) -> None:
+    """
+    Push `profile` onto an existing collection. Qdrant re-optimizes segments
+    in the background; the collection stays searchable meanwhile.
+    """
+    client.update_collection(
+        collection_name=collection,
+        vectors_config={vector_name: qm.VectorParamsDiff(on_disk=profile.on_disk)},
+        quantization_config=profile.quantization_config() or qm.Disabled.DISABLED,
+        hnsw_config=profile.hnsw_config(),
+        optimizers_config=profile.optimizers_config(),
+    )
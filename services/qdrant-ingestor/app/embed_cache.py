@@ -0,0 +1,168 @@
+import os
+import re
+import sqlite3
+import time
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+from .manifest import content_hash
+
+
+def _tag(key: str) -> int:
+    """64 bits of the key, stored next to its vector (0 = slot never written)."""
+    return int(key[:16], 16) or 1
+
+
+class EmbeddingCache:
+    """
+    Content-addressed, size-capped embedding cache on local disk (or a PVC).
+
+    Layout under <cache_dir>/<model>/:
+    - vectors.f32: np.memmap float32 array of shape (capacity, dim)
+    - tags.u64: which key each slot's vector belongs to
+    - index.sqlite: key -> slot in vectors.f32, plus last_used for LRU
+
+    Keys are hashes of the chunk text; the model is part of the directory, so
+    vectors from different models never mix. Once `capacity` slots are used,
+    the least recently used entries are evicted and their slots reused.
+    Evictions and inserts commit together, after the vectors are written; a
+    slot whose tag no longer matches its entry (a write that never
+    committed) reads as a miss.
+    One writer at a time: run a single ingestion job against a cache dir.
+    """
+
+    def __init__(self, cache_dir: str, model_name: str, dim: int, max_bytes: int):
+        self.dim = dim
+        self.capacity = max(1, max_bytes // (dim * 4))
+        self.dir = os.path.join(cache_dir, re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name))
+        os.makedirs(self.dir, exist_ok=True)
+
+        self.hits = 0
+        self.misses = 0
+
+        self.db = sqlite3.connect(os.path.join(self.dir, "index.sqlite"))
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY, slot INTEGER NOT NULL UNIQUE, last_used REAL NOT NULL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries(last_used)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+
+        row = self.db.execute("SELECT value FROM meta WHERE name = 'dim'").fetchone()
+        if row is not None and int(row[0]) != dim:
+            self.db.execute("DELETE FROM entries")
+        self.db.execute("INSERT OR REPLACE INTO meta VALUES ('dim', ?)", (str(dim),))
+        # A smaller cap than last time drops the entries that no longer fit
+        self.db.execute("DELETE FROM entries WHERE slot >= ?", (self.capacity,))
+        self.db.commit()
+
+        self.vectors = self._memmap("vectors.f32", np.float32, (self.capacity, dim))
+        tagged = os.path.exists(os.path.join(self.dir, "tags.u64"))
+        self.tags = self._memmap("tags.u64", np.uint64, (self.capacity,))
+        if not tagged:
+            # Entries from before slots were tagged cannot be verified
+            self.db.execute("DELETE FROM entries")
+            self.db.commit()
+        self._load_slots()
+
+    def _memmap(self, name: str, dtype, shape: Tuple[int, ...]) -> np.memmap:
+        path = os.path.join(self.dir, name)
+        nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        with open(path, "ab") as f:
+            if f.tell() != nbytes:
+                f.truncate(nbytes)
+        return np.memmap(path, dtype=dtype, mode="r+", shape=shape)
+
+    def _load_slots(self) -> None:
+        """Slots are handed out from the holes below the highest used one, then above it."""
+        used = [slot for (slot,) in self.db.execute("SELECT slot FROM entries ORDER BY slot")]
+        self._next = used[-1] + 1 if used else 0
+        self._holes = sorted(set(range(self._next)).difference(used))
+
+    @staticmethod
+    def key(text: str) -> str:
+        return content_hash(text)
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, List[float]]:
+        found: Dict[str, int] = {}
+        unique = list(dict.fromkeys(keys))
+        # stay well below SQLite's bound-parameter limit
+        for i in range(0, len(unique), 500):
+            part = unique[i : i + 500]
+            marks = ",".join("?" * len(part))
+            for key, slot in self.db.execute(
+                f"SELECT key, slot FROM entries WHERE key IN ({marks})", part
+            ):
+                found[key] = slot
+
+        stale = [key for key, slot in found.items() if int(self.tags[slot]) != _tag(key)]
+        if stale:
+            self.db.executemany("DELETE FROM entries WHERE key = ?", [(k,) for k in stale])
+            self._holes.extend(found.pop(k) for k in stale)
+
+        now = time.time()
+        self.db.executemany(
+            "UPDATE entries SET last_used = ? WHERE key = ?", [(now, k) for k in found]
+        )
+        self.db.commit()
+
+        self.hits += sum(1 for k in keys if k in found)
+        self.misses += sum(1 for k in keys if k not in found)
+        return {key: self.vectors[slot].tolist() for key, slot in found.items()}
+
+    def _allocate(self, n: int) -> List[int]:
+        """n free slots, evicting LRU entries if needed (uncommitted, like the inserts)."""
+        slots = self._holes[:n]
+        del self._holes[: len(slots)]
+        fresh = min(n - len(slots), self.capacity - self._next)
+        slots.extend(range(self._next, self._next + fresh))
+        self._next += fresh
+        if len(slots) < n:
+            victims = self.db.execute(
+                "SELECT key, slot FROM entries ORDER BY last_used LIMIT ?", (n - len(slots),)
+            ).fetchall()
+            self.db.executemany("DELETE FROM entries WHERE key = ?", [(k,) for k, _ in victims])
+            slots.extend(slot for _, slot in victims)
+        return slots
+
+    def put_many(self, items: Iterable[Tuple[str, Sequence[float]]]) -> None:
+        new = dict(items)
+        if not new:
+            return
+        candidates = list(new)
+        for i in range(0, len(candidates), 500):
+            part = candidates[i : i + 500]
+            marks = ",".join("?" * len(part))
+            for (key,) in self.db.execute(
+                f"SELECT key FROM entries WHERE key IN ({marks})", part
+            ).fetchall():
+                new.pop(key)
+        if not new:
+            return
+
+        pairs = list(new.items())[-self.capacity :]
+        try:
+            slots = self._allocate(len(pairs))
+            for slot, (key, vec) in zip(slots, pairs):
+                self.vectors[slot] = np.asarray(vec, dtype=np.float32)
+                self.tags[slot] = _tag(key)
+            self.vectors.flush()
+            self.tags.flush()
+
+            now = time.time()
+            self.db.executemany(
+                "INSERT INTO entries (key, slot, last_used) VALUES (?, ?, ?)",
+                [(key, slot, now) for slot, (key, _) in zip(slots, pairs)],
+            )
+            self.db.commit()
+        except BaseException:
+            self.db.rollback()
+            self._load_slots()
+            raise
+
+    def close(self) -> None:
+        self.vectors.flush()
+        self.tags.flush()
+        self.db.close()
@@ -1,25 +1,43 @@
 # from __future__ import annotations
 
 import argparse
+import fnmatch
 import glob
 import json
 import os
 import re
-from dataclasses import dataclass
-from typing import Iterable, List, Dict, Any, Optional, Tuple
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Callable, Iterable, Iterator, List, Dict, Any, Optional, Set, Tuple
 
 from qdrant_client import QdrantClient
 from qdrant_client.http import models as qm
-from fastembed import TextEmbedding
+from fastembed import SparseTextEmbedding, TextEmbedding
 import uuid
 
-from .ingest_utils import read_file, normalize_whitespace
+from .chunkers import CHUNKERS, ChunkFn, build_chunker, model_tokenizer
+from .collection_profile import (
+    PROFILES,
+    QUANTIZATIONS,
+    CollectionProfile,
+    apply_profile,
+    build_profile,
+)
+from .embed_cache import EmbeddingCache
+from .ingest_utils import iter_jsonl_records, read_file, normalize_whitespace
+from .manifest import Manifest, chunk_point_id, document_hash
+from .sources import BlobInfo, iter_lines, iter_text, open_source
 
-# Optional GCS support (kept optional to avoid hard dependency if you don't need it)
-try:
-    from google.cloud import storage  # type: ignore
-except Exception:  # pragma: no cover
-    storage = None
+
+@dataclass
+class Document:
+    id: str
+    text: str
+    metadata: Dict[str, Any] = field(default_factory=dict)
 
 
 @dataclass
@@ -29,131 +47,369 @@ class Chunk:
     metadata: Dict[str, Any]
 
 
+@dataclass
+class JsonlFields:
+    """Which JSONL record field is embedded and which one identifies the record."""
+    text: str = "content"
+    id: str = "doc_id"
+
+
+@dataclass
+class IngestPlan:
+    """What an incremental run changes; filled in while documents stream by."""
+    hashes: Dict[str, str] = field(default_factory=dict)  # new/changed doc -> hash
+    chunk_counts: Dict[str, int] = field(default_factory=dict)
+    seen: Set[str] = field(default_factory=set)
+    unchanged: int = 0
+    removed: List[str] = field(default_factory=list)
+    # JSONL files with new/changed records; older runs stored them as one
+    # file-level document whose points the per-record ids never replace
+    jsonl_files: Set[str] = field(default_factory=set)
+
+
 def iter_local_files(path: str, patterns: List[str]) -> Iterable[str]:
     for pat in patterns:
         yield from sorted(glob.glob(os.path.join(path, pat)))
 
 
 
-def chunk_text(text: str, chunk_size: int = 900, overlap: int = 150) -> List[str]:
+# Named vectors of a hybrid collection; must match rag-orchestrator's
+# QDRANT_DENSE_VECTOR / QDRANT_SPARSE_VECTOR defaults
+DENSE_VECTOR = "dense"
+SPARSE_VECTOR = "sparse"
+
+
+def ensure_collection(
+    client: QdrantClient,
+    collection: str,
+    vector_size: int,
+    sparse_model: str = "",
+    profile: Optional[CollectionProfile] = None,
+    update_profile: bool = False,
+):
     """
-    Simple character-based chunker with overlap.
-    - chunk_size: target size in characters
-    - overlap: overlap between consecutive chunks
+    Create `collection` if missing. With a `sparse_model` it gets a named dense
+    vector plus a sparse vector (IDF-weighted for BM25/BM42, whose document
+    vectors carry only term frequencies). `profile` sets dense vector storage,
+    quantization, HNSW and optimizer settings at creation; an existing
+    collection only gets it with `update_profile`.
     """
-    text = normalize_whitespace(text)
-    if not text:
-        return []
-    if overlap >= chunk_size:
-        overlap = max(0, chunk_size // 4)
-
-    chunks: List[str] = []
-    start = 0
-    n = len(text)
-    while start < n:
-        end = min(n, start + chunk_size)
-        chunk = text[start:end].strip()
-        if chunk:
-            chunks.append(chunk)
-        if end >= n:
-            break
-        start = max(0, end - overlap)
-    return chunks
-
-
-def ensure_collection(client: QdrantClient, collection: str, vector_size: int):
+    profile = profile or CollectionProfile()
     existing = {c.name for c in client.get_collections().collections}
     if collection in existing:
+        if sparse_model:
+            params = client.get_collection(collection).config.params
+            if SPARSE_VECTOR not in (params.sparse_vectors or {}):
+                raise SystemExit(
+                    f"Collection '{collection}' has no '{SPARSE_VECTOR}' sparse vector; "
+                    "ingest into a new collection (or drop it) to enable hybrid search."
+                )
+        if update_profile:
+            apply_profile(client, collection, profile, DENSE_VECTOR if sparse_model else "")
         return
+
+    if not sparse_model:
+        client.create_collection(
+            collection_name=collection,
+            vectors_config=profile.vector_params(vector_size),
+            **profile.create_kwargs(),
+        )
+        return
+
+    idf = any(m in sparse_model.lower() for m in ("bm25", "bm42"))
     client.create_collection(
         collection_name=collection,
-        vectors_config=qm.VectorParams(size=vector_size, distance=qm.Distance.COSINE),
+        vectors_config={
+            DENSE_VECTOR: profile.vector_params(vector_size),
+        },
+        sparse_vectors_config={
+            SPARSE_VECTOR: qm.SparseVectorParams(modifier=qm.Modifier.IDF if idf else None),
+        },
+        **profile.create_kwargs(),
     )
 
 
-def upsert_chunks(
-    client: QdrantClient,
-    collection: str,
+def ensure_document_indexes(client: QdrantClient, collection: str):
+    # Per-document deletes filter on these; without an index each is a full scan
+    for key in ("metadata.source", "metadata.document"):
+        client.create_payload_index(
+            collection_name=collection,
+            field_name=key,
+            field_schema=qm.PayloadSchemaType.KEYWORD,
+        )
+
+
+def collection_version_point_id(collection: str) -> str:
+    # Must match rag-orchestrator's retriever.collection_version_point_id
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"rag-collection-version:{collection}"))
+
+
+def bump_collection_version(client: QdrantClient, collection: str, meta_collection: str) -> str:
+    """
+    Record a new version marker for `collection` in the meta collection.
+    The orchestrator scopes its caches by this marker, so bumping it after an
+    ingest invalidates answers/results computed against the old data.
+    """
+    ensure_collection(client, meta_collection, 1)
+    version = uuid.uuid4().hex
+    client.upsert(
+        collection_name=meta_collection,
+        points=[
+            qm.PointStruct(
+                id=collection_version_point_id(collection),
+                vector=[1.0],
+                payload={
+                    "collection": collection,
+                    "version": version,
+                    "updated_at": int(time.time()),
+                },
+            )
+        ],
+    )
+    return version
+
+
+def batched(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    it = iter(items)
+    while True:
+        batch = list(islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+
+def embed_chunks(
     embedder: TextEmbedding,
-    chunks: List[Chunk],
+    chunks: Iterable[Chunk],
     batch_size: int = 64,
-):
-    # embed + upsert in batches
-    for i in range(0, len(chunks), batch_size):
-        batch = chunks[i : i + batch_size]
-        texts = [c.text for c in batch]
-        vectors = [v.tolist() for v in embedder.embed(texts)]
-        points = []
-        for ch, vec in zip(batch, vectors):
-            points.append(
-                qm.PointStruct(
-                    id=ch.id,
-                    vector=vec,
-                    payload={
-                        "text": ch.text,
-                        "metadata": ch.metadata,
-                    },
-                )
+    parallel: Optional[int] = None,
+    cache: Optional[EmbeddingCache] = None,
+    on_cached: Optional[Callable[[Chunk, List[float]], None]] = None,
+) -> Iterator[Tuple[Chunk, List[float]]]:
+    """
+    Stream (chunk, vector) pairs from one long-lived passage_embed() call
+    (the model's document path; queries go through query_embed at serving time).
+
+    fastembed pulls texts lazily and, with `parallel`, fans batches out to
+    worker processes with a bounded queue, so only the chunks it has read
+    ahead are held here (in `pending`, in input order).
+
+    With a `cache`, chunks are looked up a batch at a time before they reach
+    the model; hits are handed to `on_cached` straight away instead of being
+    yielded, so a mostly cached corpus does not pile up behind the embedder.
+    """
+    pending: deque = deque()
+
+    def texts() -> Iterator[str]:
+        if cache is None:
+            for ch in chunks:
+                pending.append((ch, None))
+                yield ch.text
+            return
+        for window in batched(chunks, batch_size):
+            keys = [cache.key(ch.text) for ch in window]
+            hits = cache.get_many(keys)
+            for ch, key in zip(window, keys):
+                if key in hits:
+                    on_cached(ch, hits[key])
+                else:
+                    pending.append((ch, key))
+                    yield ch.text
+
+    fresh: List[Tuple[str, List[float]]] = []
+    for vec in embedder.passage_embed(texts(), batch_size=batch_size, parallel=parallel):
+        ch, key = pending.popleft()
+        vec = vec.tolist()
+        if cache is not None:
+            fresh.append((key, vec))
+            if len(fresh) >= batch_size:
+                cache.put_many(fresh)
+                fresh = []
+        yield ch, vec
+    if cache is not None and fresh:
+        cache.put_many(fresh)
+
+
+class _PointUploader:
+    """
+    Batches (chunk, vector) pairs and upserts them on a thread pool.
+
+    Upserts go out with wait=False and at most 2 x workers batches in flight,
+    so memory stays flat. The last batch is held back and sent with wait=True
+    after the others are acknowledged: Qdrant applies a shard's updates in
+    order, so when close() returns the whole ingest is searchable.
+
+    With a `sparse_embedder`, sparse vectors are computed on the upload
+    threads, overlapping with dense embedding on the main thread.
+    """
+
+    def __init__(
+        self,
+        client: QdrantClient,
+        collection: str,
+        batch_size: int,
+        workers: int,
+        sparse_embedder: Optional[SparseTextEmbedding] = None,
+    ):
+        self.client = client
+        self.collection = collection
+        self.batch_size = batch_size
+        self.sparse_embedder = sparse_embedder
+        self._sparse_lock = threading.Lock()
+        self.max_in_flight = max(1, workers) * 2
+        self.pool = ThreadPoolExecutor(max_workers=max(1, workers))
+        self.in_flight: Set[Future] = set()
+        self.batch: List[Tuple[Chunk, List[float]]] = []
+        self.last: Optional[List[Tuple[Chunk, List[float]]]] = None
+        self.total = 0
+
+    def add(self, ch: Chunk, vec: List[float]) -> None:
+        self.batch.append((ch, vec))
+        self.total += 1
+        if len(self.batch) >= self.batch_size:
+            self._rotate()
+
+    def _points(self, pairs: List[Tuple[Chunk, List[float]]]) -> List[qm.PointStruct]:
+        if self.sparse_embedder is None:
+            vectors: List[Any] = [vec for _, vec in pairs]
+        else:
+            # fastembed models are not guaranteed thread-safe
+            with self._sparse_lock:
+                sparse = list(self.sparse_embedder.passage_embed([ch.text for ch, _ in pairs]))
+            vectors = [
+                {
+                    DENSE_VECTOR: vec,
+                    SPARSE_VECTOR: qm.SparseVector(
+                        indices=sv.indices.tolist(), values=sv.values.tolist()
+                    ),
+                }
+                for (_, vec), sv in zip(pairs, sparse)
+            ]
+        return [
+            qm.PointStruct(
+                id=ch.id,
+                vector=vector,
+                payload={
+                    "text": ch.text,
+                    "metadata": ch.metadata,
+                },
             )
-        client.upsert(collection_name=collection, points=points)
+            for (ch, _), vector in zip(pairs, vectors)
+        ]
+
+    def _send(self, pairs: List[Tuple[Chunk, List[float]]], blocking: bool) -> None:
+        self.client.upsert(
+            collection_name=self.collection,
+            points=self._points(pairs),
+            wait=blocking,
+        )
 
+    def _rotate(self) -> None:
+        if self.last is not None:
+            if len(self.in_flight) >= self.max_in_flight:
+                done, self.in_flight = wait(self.in_flight, return_when=FIRST_COMPLETED)
+                for f in done:
+                    f.result()
+            self.in_flight.add(self.pool.submit(self._send, self.last, False))
+        self.last, self.batch = self.batch, []
+
+    def close(self) -> int:
+        if self.batch:
+            self._rotate()
+        try:
+            for f in self.in_flight:
+                f.result()
+        finally:
+            self.pool.shutdown()
+        if self.last is not None:
+            self._send(self.last, blocking=True)
+        return self.total
 
-def ingest_local_path(
-    input_path: str,
+
+def upsert_chunks(
+    client: QdrantClient,
     collection: str,
-    source_name: str,
+    embedder: TextEmbedding,
+    chunks: Iterable[Chunk],
+    batch_size: int = 64,
+    parallel: Optional[int] = None,
+    upsert_workers: int = 4,
+    cache: Optional[EmbeddingCache] = None,
+    sparse_embedder: Optional[SparseTextEmbedding] = None,
+) -> int:
+    """Embed and upsert `chunks` as a pipeline; returns the number of points."""
+    uploader = _PointUploader(client, collection, batch_size, upsert_workers, sparse_embedder)
+    try:
+        for ch, vec in embed_chunks(
+            embedder,
+            chunks,
+            batch_size=batch_size,
+            parallel=parallel,
+            cache=cache,
+            on_cached=uploader.add,
+        ):
+            uploader.add(ch, vec)
+    except BaseException:
+        uploader.pool.shutdown(cancel_futures=True)
+        raise
+    return uploader.close()
+
+
+def iter_local_documents(
+    input_path: str,
     patterns: List[str],
-    chunk_size: int,
-    overlap: int,
-) -> List[Chunk]:
+    jsonl: Optional[JsonlFields] = None,
+) -> Iterator[Document]:
     files = list(iter_local_files(input_path, patterns))
     if not files:
         raise SystemExit(f"No matching files in {input_path} for patterns {patterns}")
+    return _read_local_documents(files, input_path, jsonl or JsonlFields())
 
-    chunks: List[Chunk] = []
-    for fp in files:
-        raw = read_file(fp)
-        txt = normalize_whitespace(raw)
-        rel = os.path.relpath(fp, input_path)
-        doc_id = rel.replace(os.sep, "/")
-        for idx, ch in enumerate(chunk_text(txt, chunk_size=chunk_size, overlap=overlap)):
-            # cid = f"{source_name}:{doc_id}#{idx}"
-            cid = str(uuid.uuid4())
-            chunks.append(
-                Chunk(
-                    id=cid,
-                    text=ch,
-                    metadata={
-                        "source": source_name,
-                        "document": doc_id,
-                        "chunk_index": idx,
-                    },
-                )
-            )
-    return chunks
-
-def list_gcs_blobs(gcs_uri: str):
-    if storage is None:
-        raise SystemExit(
-            "google-cloud-storage is not installed. "
-            "Add it to requirements.txt to use --gcs-uri."
-        )
-
-    if not gcs_uri.startswith("gs://"):
-        raise SystemExit("--gcs-uri must start with gs://")
 
-    _, _, rest = gcs_uri.partition("gs://")
-    bucket_name, _, prefix = rest.partition("/")
-    prefix = prefix.strip("/")
-
-    client = storage.Client()
-    bucket = client.bucket(bucket_name)
+def _read_local_documents(
+    files: List[str],
+    input_path: str,
+    jsonl: JsonlFields,
+) -> Iterator[Document]:
+    # One file (or one JSONL line) in memory at a time
+    for fp in files:
+        doc_id = os.path.relpath(fp, input_path).replace(os.sep, "/")
+        if fp.endswith(".jsonl"):
+            with open(fp, "r", encoding="utf-8", errors="ignore") as f:
+                yield from jsonl_documents(f, doc_id, jsonl)
+        else:
+            yield Document(id=doc_id, text=normalize_whitespace(read_file(fp)))
+
+
+def jsonl_documents(
+    lines: Iterable[str],
+    file_id: str,
+    jsonl: JsonlFields,
+    metadata: Optional[Dict[str, Any]] = None,
+) -> Iterator[Document]:
+    """
+    One Document per JSONL record: `jsonl.text` is embedded, every other field
+    goes into the payload metadata. Records are chunked like any document, so
+    only the ones longer than --chunk-size are split.
+    """
+    seen: Set[str] = set()
+    for lineno, record in iter_jsonl_records(lines):
+        text = record.get(jsonl.text)
+        if not isinstance(text, str) or not text.strip():
+            print(f" Skipping {file_id}:{lineno}: no '{jsonl.text}' text")
+            continue
 
-    blobs = list(client.list_blobs(bucket, prefix=prefix))
-    if not blobs:
-        raise SystemExit(f"No blobs found under {gcs_uri}")
+        record_id = str(record.get(jsonl.id) or f"line{lineno}")
+        if record_id in seen:
+            record_id = f"{record_id}@{lineno}"
+        seen.add(record_id)
 
-    return bucket_name, blobs
+        fields = {k: v for k, v in record.items() if k != jsonl.text}
+        yield Document(
+            id=f"{file_id}#{record_id}",
+            text=normalize_whitespace(text),
+            metadata={**fields, **(metadata or {}), "file": file_id},
+        )
 
 
 def resolve_allowed_suffixes(patterns: List[str]) -> List[str]:
@@ -167,125 +423,368 @@ def resolve_allowed_suffixes(patterns: List[str]) -> List[str]:
 
     return allowed_suffixes
 
-def blob_to_chunks(
-    blob,
-    bucket_name: str,
+def blob_documents(info: BlobInfo, parts: Iterable[str], jsonl: JsonlFields) -> Iterator[Document]:
+    """Documents of one object whose text arrives as `parts`."""
+    meta = {"gcs_uri": info.uri}
+    if info.name.endswith(".jsonl"):
+        yield from jsonl_documents(iter_lines(parts), info.name, jsonl, metadata=meta)
+        return
+    yield Document(id=info.name, text=normalize_whitespace("".join(parts)), metadata=meta)
+
+
+def _fetch_documents(source, info: BlobInfo, jsonl: JsonlFields) -> List[Document]:
+    # Small object: one request, parsed on the download thread
+    text = source.read(info.name).decode("utf-8", errors="ignore")
+    return list(blob_documents(info, [text], jsonl))
+
+
+def iter_source_documents(
+    source,
+    patterns: List[str],
+    jsonl: Optional[JsonlFields] = None,
+    workers: int = 16,
+    range_bytes: int = 8 * 1024 * 1024,
+) -> Iterator[Document]:
+    """
+    Documents of every matching object, in listing order.
+
+    The listing is paged lazily, and objects up to `range_bytes` are fetched
+    on a pool of `workers` threads. At most 2 x workers objects are in
+    flight or waiting, so per-object round trips overlap without buffering
+    the bucket. Larger objects are streamed in `range_bytes` ranges when
+    their turn comes. A JSONL object yields records as lines arrive; a
+    text document is assembled, since the chunkers need it whole.
+    """
+    jsonl = jsonl or JsonlFields()
+    suffixes = tuple(resolve_allowed_suffixes(patterns))
+    window: deque = deque()
+
+    def drain_one() -> Iterator[Document]:
+        info, future = window.popleft()
+        if future is None:
+            yield from blob_documents(info, iter_text(source, info, range_bytes), jsonl)
+        else:
+            yield from future.result()
+
+    found = False
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="download") as pool:
+        for info in source.list(suffixes):
+            found = True
+            future = (
+                pool.submit(_fetch_documents, source, info, jsonl)
+                if info.size <= range_bytes
+                else None
+            )
+            window.append((info, future))
+            while len(window) > 2 * max(1, workers):
+                yield from drain_one()
+        while window:
+            yield from drain_one()
+
+    if not found:
+        raise SystemExit(f"No objects matching {list(suffixes)} in the source")
+
+
+def select_changed(
+    docs: Iterable[Document],
+    manifest: Manifest,
+    fingerprint: str,
+    plan: IngestPlan,
+    force: bool = False,
+) -> Iterator[Tuple[Document, str]]:
+    """Yield (document, hash) for documents that are new or differ from the manifest."""
+    for doc in docs:
+        plan.seen.add(doc.id)
+        h = document_hash(doc.text, fingerprint)
+        if not force and manifest.get(doc.id) == h:
+            plan.unchanged += 1
+            continue
+        plan.hashes[doc.id] = h
+        if doc.metadata.get("file") and doc.id != doc.metadata["file"]:
+            plan.jsonl_files.add(doc.metadata["file"])
+        yield doc, h
+
+
+def document_chunks(
+    docs: Iterable[Tuple[Document, str]],
     source_name: str,
-    chunk_size: int,
-    overlap: int,
-) -> List[Chunk]:
-    raw = blob.download_as_text(encoding="utf-8", errors="ignore")
-    txt = normalize_whitespace(raw)
-    doc_id = blob.name
-
-    chunks: List[Chunk] = []
-    for idx, ch in enumerate(chunk_text(txt, chunk_size=chunk_size, overlap=overlap)):
-        cid = f"{source_name}:{doc_id}#{idx}"
-        chunks.append(
-            Chunk(
-                id=cid,
+    chunker: ChunkFn,
+    plan: IngestPlan,
+) -> Iterator[Chunk]:
+    for doc, doc_hash in docs:
+        n = 0
+        for idx, ch in enumerate(chunker(doc.id, doc.text)):
+            n += 1
+            yield Chunk(
+                id=chunk_point_id(source_name, doc.id, idx, ch),
                 text=ch,
                 metadata={
+                    # record fields never override the keys deletes rely on
+                    **doc.metadata,
                     "source": source_name,
-                    "document": doc_id,
+                    "document": doc.id,
                     "chunk_index": idx,
-                    "gcs_uri": f"gs://{bucket_name}/{blob.name}",
+                    "doc_hash": doc_hash,
                 },
             )
+        plan.chunk_counts[doc.id] = n
+
+
+def _document_filter(source: str, document: str, keep_hash: Optional[str] = None) -> qm.Filter:
+    must = [
+        qm.FieldCondition(key="metadata.source", match=qm.MatchValue(value=source)),
+        qm.FieldCondition(key="metadata.document", match=qm.MatchValue(value=document)),
+    ]
+    must_not = []
+    if keep_hash is not None:
+        must_not.append(
+            qm.FieldCondition(key="metadata.doc_hash", match=qm.MatchValue(value=keep_hash))
         )
-    return chunks
+    return qm.Filter(must=must, must_not=must_not or None)
 
-def ingest_gcs_prefix(
-    gcs_uri: str,
-    collection: str,
-    source_name: str,
-    patterns: List[str],
-    chunk_size: int,
-    overlap: int,
-) -> List[Chunk]:
-
-    bucket_name, blobs = list_gcs_blobs(gcs_uri)
-    allowed_suffixes = resolve_allowed_suffixes(patterns)
 
-    chunks: List[Chunk] = []
+def removed_documents(known: Iterable[str], seen: Set[str], patterns: List[str]) -> List[str]:
+    """
+    Documents of an earlier run missing from this one. Only those whose file
+    matches this run's patterns count: a run over *.md says nothing about
+    the *.jsonl documents another run ingested.
+    """
+    def in_scope(doc: str) -> bool:
+        file_id = doc.split("#", 1)[0]
+        return any(fnmatch.fnmatch(file_id, pat) for pat in patterns)
 
-    for blob in blobs:
-        if not any(blob.name.endswith(suf) for suf in allowed_suffixes):
-            continue
-        chunks.extend(
-            blob_to_chunks(
-                blob,
-                bucket_name=bucket_name,
-                source_name=source_name,
-                chunk_size=chunk_size,
-                overlap=overlap,
-            )
-        )
+    return sorted(doc for doc in set(known) - seen if in_scope(doc))
 
-    if not chunks:
-        raise SystemExit(f"No matching .txt/.md/.jsonl blobs under {gcs_uri}")
 
-    return chunks
+def delete_stale_points(
+    client: QdrantClient,
+    collection: str,
+    source_name: str,
+    plan: IngestPlan,
+):
+    """
+    Drop points left behind by this run: chunks of re-ingested documents that
+    carry an older doc_hash (including ids from before deterministic ids),
+    file-level chunks of JSONL files now stored record by record, and every
+    chunk of documents that disappeared from the input.
+    """
+    ops = (
+        [(doc, h) for doc, h in plan.hashes.items()]
+        + [(f, None) for f in sorted(plan.jsonl_files)]
+        + [(doc, None) for doc in plan.removed]
+    )
+    for i, (doc, keep) in enumerate(ops):
+        client.delete(
+            collection_name=collection,
+            points_selector=qm.FilterSelector(filter=_document_filter(source_name, doc, keep)),
+            wait=i == len(ops) - 1,
+        )
 
 
 def main():
     ap = argparse.ArgumentParser(description="Ingest documents into Qdrant for RAG.")
     ap.add_argument("--qdrant-url", required=True, help="e.g. http://qdrant:6333")
     ap.add_argument("--collection", default=os.getenv("QDRANT_COLLECTION", "medical_docs"))
+    ap.add_argument("--meta-collection", default=os.getenv("QDRANT_META_COLLECTION", "rag_meta"),
+                    help="Collection holding per-collection version markers")
     ap.add_argument("--embedding-model", default=os.getenv("EMBEDDING_MODEL", "BAAI/bge-small-en-v1.5"))
+    ap.add_argument("--sparse-model", default=os.getenv("SPARSE_EMBEDDING_MODEL", ""),
+                    help="fastembed sparse model (e.g. Qdrant/bm25) for hybrid search; empty = dense only")
+    ap.add_argument("--collection-profile", choices=tuple(PROFILES),
+                    default=os.getenv("QDRANT_COLLECTION_PROFILE", "default"),
+                    help="Dense vector storage: default = float32 in RAM; "
+                         "scalar = int8 in RAM + originals on disk; binary = 1-bit in RAM + originals on disk")
+    ap.add_argument("--quantization", choices=QUANTIZATIONS, default=None,
+                    help="Override the profile's quantization")
+    ap.add_argument("--on-disk", choices=("true", "false"), default=None,
+                    help="Override whether float32 vectors live on disk")
+    ap.add_argument("--hnsw-m", type=int, default=None, help="HNSW edges per node")
+    ap.add_argument("--hnsw-ef-construct", type=int, default=None, help="HNSW build-time beam width")
+    ap.add_argument("--indexing-threshold-kb", type=int, default=None,
+                    help="Segment size above which an HNSW index is built")
+    ap.add_argument("--memmap-threshold-kb", type=int, default=None,
+                    help="Segment size above which segments are memory-mapped")
+    ap.add_argument("--update-profile", action="store_true",
+                    help="Apply the profile to an existing collection (triggers re-optimization)")
     ap.add_argument("--top-level-path", default="/data", help="Local mount path for docs (used with --input-path)")
     ap.add_argument("--input-path", default=".", help="Relative to --top-level-path when running in cluster")
-    ap.add_argument("--gcs-uri", default="", help="gs://bucket/prefix (optional alternative to local input)")
+    ap.add_argument("--gcs-uri", default="",
+                    help="gs://bucket/prefix (optional alternative to local input); "
+                         "file:///path runs the same pipeline against a directory")
+    ap.add_argument("--download-workers", type=int,
+                    default=int(os.getenv("DOWNLOAD_WORKERS", "16")),
+                    help="Concurrent object downloads for --gcs-uri")
+    ap.add_argument("--range-mb", type=int, default=int(os.getenv("DOWNLOAD_RANGE_MB", "8")),
+                    help="Objects larger than this are streamed in ranges of this size")
     ap.add_argument("--source-name", default="medical_corpus")
     ap.add_argument("--patterns", default="*.txt,*.md,*.jsonl", help="Comma-separated glob patterns")
+    ap.add_argument("--jsonl-text-field", default=os.getenv("JSONL_TEXT_FIELD", "content"),
+                    help="JSONL record field to embed; other fields become metadata")
+    ap.add_argument("--jsonl-id-field", default=os.getenv("JSONL_ID_FIELD", "doc_id"),
+                    help="JSONL record field used as the document id (default: line number)")
     ap.add_argument("--chunk-size", type=int, default=900)
     ap.add_argument("--overlap", type=int, default=150)
+    ap.add_argument("--chunker", choices=CHUNKERS, default=os.getenv("CHUNKER", "auto"),
+                    help="auto = markdown for *.md, sentence otherwise; "
+                         "char = fixed windows (the only chunker before --chunker); "
+                         "token = model tokenizer windows")
+    ap.add_argument("--chunk-tokens", type=int, default=256,
+                    help="Tokens per chunk for --chunker token")
+    ap.add_argument("--overlap-tokens", type=int, default=32,
+                    help="Tokens repeated between chunks for --chunker token")
     ap.add_argument("--batch-size", type=int, default=64)
+    ap.add_argument("--embed-parallel", type=int,
+                    default=int(os.getenv("EMBED_PARALLEL", "0")),
+                    help="Embedding worker processes (0 = all cores, 1 = in-process)")
+    ap.add_argument("--embed-threads", type=int,
+                    default=int(os.getenv("EMBED_THREADS", "0")),
+                    help="ONNX threads per embedding worker (0 = 1 per worker process, "
+                         "ONNX default in-process)")
+    ap.add_argument("--model-cache-dir", default=os.getenv("FASTEMBED_CACHE_PATH", ""),
+                    help="Where fastembed models are (or get) downloaded, e.g. a path baked into the image")
+    ap.add_argument("--upsert-workers", type=int,
+                    default=int(os.getenv("UPSERT_WORKERS", "4")),
+                    help="Concurrent Qdrant upserts")
+    ap.add_argument("--embed-cache-dir", default=os.getenv("EMBED_CACHE_DIR", ""),
+                    help="Directory (e.g. a PVC) for the on-disk embedding cache; empty = off")
+    ap.add_argument("--embed-cache-max-mb", type=int,
+                    default=int(os.getenv("EMBED_CACHE_MAX_MB", "2048")),
+                    help="Size cap for cached vectors; least recently used are evicted")
+    ap.add_argument("--force", action="store_true",
+                    help="Re-embed every document, ignoring the manifest")
+    ap.add_argument("--delete-removed", action="store_true",
+                    help="Delete points of documents (matching --patterns) that an earlier run "
+                         "ingested and are missing from this input; use on full re-ingests only")
     ap.add_argument("--dry-run", action="store_true")
     args = ap.parse_args()
 
     patterns = [p.strip() for p in args.patterns.split(",") if p.strip()]
 
     qclient = QdrantClient(url=args.qdrant_url)
-    embedder = TextEmbedding(model_name=args.embedding_model)
+    # Each worker process gets its own ONNX session; ORT's default of one
+    # thread per core in every worker oversubscribes the CPU many times over
+    threads = args.embed_threads or (1 if args.embed_parallel != 1 else None)
+    onnx_kwargs = dict(threads=threads, cache_dir=args.model_cache_dir or None)
+    embedder = TextEmbedding(model_name=args.embedding_model, **onnx_kwargs)
 
     # discover embedding vector size
-    vec_size = len(next(embedder.embed(["vector size probe"])).tolist())
-    ensure_collection(qclient, args.collection, vec_size)
+    vec_size = len(next(embedder.passage_embed(["vector size probe"])).tolist())
+    profile = build_profile(
+        args.collection_profile,
+        quantization=args.quantization,
+        on_disk=None if args.on_disk is None else args.on_disk == "true",
+        hnsw_m=args.hnsw_m,
+        hnsw_ef_construct=args.hnsw_ef_construct,
+        indexing_threshold_kb=args.indexing_threshold_kb,
+        memmap_threshold_kb=args.memmap_threshold_kb,
+    )
+    ensure_collection(
+        qclient,
+        args.collection,
+        vec_size,
+        sparse_model=args.sparse_model,
+        profile=profile,
+        update_profile=args.update_profile,
+    )
+    sparse_embedder = (
+        SparseTextEmbedding(model_name=args.sparse_model, **onnx_kwargs) if args.sparse_model else None
+    )
+
+    ensure_document_indexes(qclient, args.collection)
+    jsonl = JsonlFields(text=args.jsonl_text_field, id=args.jsonl_id_field)
 
     if args.gcs_uri.strip():
-        chunks = ingest_gcs_prefix(
-            gcs_uri=args.gcs_uri.strip(),
-            collection=args.collection,
-            source_name=args.source_name,
-            patterns=patterns,
-            chunk_size=args.chunk_size,
-            overlap=args.overlap,
+        docs = iter_source_documents(
+            open_source(args.gcs_uri.strip()),
+            patterns,
+            jsonl,
+            workers=args.download_workers,
+            range_bytes=args.range_mb * 1024 * 1024,
         )
     else:
         base = os.path.join(args.top_level_path, args.input_path)
-        chunks = ingest_local_path(
-            input_path=base,
-            collection=args.collection,
-            source_name=args.source_name,
-            patterns=patterns,
-            chunk_size=args.chunk_size,
-            overlap=args.overlap,
-        )
+        docs = iter_local_documents(base, patterns, jsonl)
+
+    manifest = Manifest(qclient, args.meta_collection, args.collection, args.source_name)
+    manifest.load()
+    chunker = build_chunker(
+        args.chunker,
+        chunk_size=args.chunk_size,
+        overlap=args.overlap,
+        tokenizer=model_tokenizer(embedder) if args.chunker == "token" else None,
+        chunk_tokens=args.chunk_tokens,
+        overlap_tokens=args.overlap_tokens,
+    )
+    fingerprint = "|".join(str(p) for p in (
+        args.embedding_model, args.sparse_model, args.chunker, args.chunk_size, args.overlap,
+        args.chunk_tokens, args.overlap_tokens,
+    ))
+
+    plan = IngestPlan()
+    chunks = document_chunks(
+        select_changed(docs, manifest, fingerprint, plan, force=args.force),
+        source_name=args.source_name,
+        chunker=chunker,
+        plan=plan,
+    )
 
-    print(json.dumps({"collection": args.collection, "chunks": len(chunks)}, indent=2))
+    def summary(count: int, **extra) -> str:
+        return json.dumps({
+            "collection": args.collection,
+            "documents_changed": len(plan.hashes),
+            "documents_unchanged": plan.unchanged,
+            "documents_removed": len(plan.removed),
+            "chunks": count,
+            **extra,
+        }, indent=2)
 
     if args.dry_run:
+        count = sum(1 for _ in chunks)
+        if args.delete_removed:
+            plan.removed = removed_documents(manifest.entries, plan.seen, patterns)
+        print(summary(count))
         return
 
-    upsert_chunks(
+    cache = None
+    if args.embed_cache_dir:
+        cache = EmbeddingCache(
+            args.embed_cache_dir,
+            args.embedding_model,
+            dim=vec_size,
+            max_bytes=args.embed_cache_max_mb * 1024 * 1024,
+        )
+
+    start = time.time()
+    count = upsert_chunks(
         client=qclient,
         collection=args.collection,
         embedder=embedder,
         chunks=chunks,
         batch_size=args.batch_size,
+        # fastembed: 0 = one worker per core, None = no multiprocessing
+        parallel=None if args.embed_parallel == 1 else args.embed_parallel,
+        upsert_workers=args.upsert_workers,
+        cache=cache,
+        sparse_embedder=sparse_embedder,
     )
-    print(f" Upserted {len(chunks)} chunks into '{args.collection}' at {args.qdrant_url}.")
+    if cache is not None:
+        cache.close()
+    if args.delete_removed:
+        plan.removed = removed_documents(manifest.entries, plan.seen, patterns)
+    delete_stale_points(qclient, args.collection, args.source_name, plan)
+    ensure_collection(qclient, args.meta_collection, 1)
+    manifest.record(plan.hashes, plan.chunk_counts)
+    manifest.forget(plan.removed)
+    extra = {"seconds": round(time.time() - start, 1)}
+    if cache is not None:
+        extra.update(embed_cache_hits=cache.hits, embed_cache_misses=cache.misses)
+    print(summary(count, **extra))
+
+    if not plan.hashes and not plan.removed:
+        print(f" '{args.collection}' is up to date; nothing to do.")
+        return
+    version = bump_collection_version(qclient, args.collection, args.meta_collection)
+    print(f" Upserted {count} chunks into '{args.collection}' at {args.qdrant_url} (version {version}).")
 
 
 if __name__ == "__main__":
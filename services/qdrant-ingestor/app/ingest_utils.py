@@ -1,5 +1,6 @@
+import json
 import re
-from typing import Iterable
+from typing import Any, Dict, Iterable, Iterator, Tuple
 
 
 def read_file(fp: str) -> str:
@@ -11,4 +12,23 @@ def normalize_whitespace(s: str) -> str:
     s = s.replace("\r\n", "\n").replace("\r", "\n")
     s = re.sub(r"[ \t]+", " ", s)
     s = re.sub(r"\n{3,}", "\n\n", s)
-    return s.strip()
\ No newline at end of file
+    return s.strip()
+
+def iter_jsonl_records(lines: Iterable[str]) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Yield (line_number, record) for each JSON object line, one line at a time.
+    Blank lines are skipped; malformed or non-object lines are reported and skipped.
+    """
+    for lineno, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            print(f" Skipping malformed JSONL line {lineno}: {e}")
+            continue
+        if not isinstance(record, dict):
+            print(f" Skipping JSONL line {lineno}: not an object")
+            continue
+        yield lineno, record
@@ -0,0 +1,128 @@
+import hashlib
+import time
+import uuid
+from typing import Dict, Iterable, List, Optional
+
+from qdrant_client import QdrantClient
+from qdrant_client.http import models as qm
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+
+def document_hash(text: str, fingerprint: str) -> str:
+    """
+    Hash of a document as it would be ingested.
+
+    `fingerprint` covers everything besides the text that changes the stored
+    points (embedding model, chunking parameters), so changing any of them
+    re-ingests the document.
+    """
+    return content_hash(f"{fingerprint}\n{text}")
+
+
+def chunk_point_id(source: str, document: str, chunk_index: int, text: str) -> str:
+    """Deterministic point id: re-ingesting identical content overwrites in place."""
+    key = f"{source}\x1f{document}\x1f{chunk_index}\x1f{content_hash(text)}"
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, key))
+
+
+class Manifest:
+    """
+    Per-document content hashes for one (collection, source), stored as
+    points in the meta collection next to the collection version marker.
+
+    Entries are written only after a document's points are upserted, so an
+    interrupted run simply re-ingests the documents it had not recorded.
+    """
+
+    def __init__(
+        self,
+        client: QdrantClient,
+        meta_collection: str,
+        collection: str,
+        source: str,
+        batch_size: int = 256,
+    ):
+        self.client = client
+        self.meta_collection = meta_collection
+        self.collection = collection
+        self.source = source
+        self.batch_size = batch_size
+        self.entries: Dict[str, str] = {}
+
+    def _point_id(self, document: str) -> str:
+        key = f"rag-manifest:{self.collection}:{self.source}:{document}"
+        return str(uuid.uuid5(uuid.NAMESPACE_URL, key))
+
+    def _filter(self) -> qm.Filter:
+        return qm.Filter(
+            must=[
+                qm.FieldCondition(key="kind", match=qm.MatchValue(value="manifest")),
+                qm.FieldCondition(key="collection", match=qm.MatchValue(value=self.collection)),
+                qm.FieldCondition(key="source", match=qm.MatchValue(value=self.source)),
+            ]
+        )
+
+    def load(self) -> Dict[str, str]:
+        existing = {c.name for c in self.client.get_collections().collections}
+        if self.meta_collection not in existing:
+            self.entries = {}
+            return self.entries
+
+        entries: Dict[str, str] = {}
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.meta_collection,
+                scroll_filter=self._filter(),
+                limit=self.batch_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=False,
+            )
+            for p in points:
+                entries[p.payload["document"]] = p.payload["hash"]
+            if offset is None:
+                break
+        self.entries = entries
+        return entries
+
+    def get(self, document: str) -> Optional[str]:
+        return self.entries.get(document)
+
+    def record(self, hashes: Dict[str, str], chunk_counts: Dict[str, int]) -> None:
+        now = int(time.time())
+        points: List[qm.PointStruct] = [
+            qm.PointStruct(
+                id=self._point_id(doc),
+                vector=[1.0],
+                payload={
+                    "kind": "manifest",
+                    "collection": self.collection,
+                    "source": self.source,
+                    "document": doc,
+                    "hash": h,
+                    "chunks": chunk_counts.get(doc, 0),
+                    "updated_at": now,
+                },
+            )
+            for doc, h in hashes.items()
+        ]
+        for i in range(0, len(points), self.batch_size):
+            self.client.upsert(
+                collection_name=self.meta_collection,
+                points=points[i : i + self.batch_size],
+            )
+        self.entries.update(hashes)
+
+    def forget(self, documents: Iterable[str]) -> None:
+        ids = [self._point_id(doc) for doc in documents]
+        for i in range(0, len(ids), self.batch_size):
+            self.client.delete(
+                collection_name=self.meta_collection,
+                points_selector=qm.PointIdsList(points=ids[i : i + self.batch_size]),
+            )
+        for doc in documents:
+            self.entries.pop(doc, None)
@@ -0,0 +1,125 @@
+import codecs
+import os
+import threading
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Optional, Tuple
+
+# Optional GCS support (kept optional to avoid hard dependency if you don't need it)
+try:
+    from google.cloud import storage  # type: ignore
+except Exception:  # pragma: no cover
+    storage = None
+
+# ---------------------------------------------------------------------
+# Object sources
+# ---------------------------------------------------------------------
+# A source lists objects lazily and serves byte ranges of them. GCSSource
+# talks to GCS (or to a fake-gcs-server emulator via STORAGE_EMULATOR_HOST);
+# LocalSource is a filesystem stand-in with the same interface, so the
+# parallel download pipeline runs unchanged against a directory
+# (--gcs-uri file:///path).
+
+
+@dataclass(frozen=True)
+class BlobInfo:
+    name: str  # object name; also the document id
+    size: int
+    uri: str
+
+
+class GCSSource:
+    """
+    Listing pages are fetched lazily (names and sizes only) and filtered by
+    suffix as they arrive. Each download thread gets its own client: the
+    shared HTTP session of a single client caps concurrent connections.
+    """
+
+    def __init__(self, uri: str, page_size: int = 1000, client_factory=None):
+        if not uri.startswith("gs://"):
+            raise SystemExit("--gcs-uri must start with gs://")
+        if storage is None and client_factory is None:
+            raise SystemExit(
+                "google-cloud-storage is not installed. "
+                "Add it to requirements.txt to use --gcs-uri."
+            )
+        bucket_name, _, prefix = uri[len("gs://"):].partition("/")
+        self.bucket_name = bucket_name
+        self.prefix = prefix.strip("/")
+        self.page_size = page_size
+        self._client_factory = client_factory or storage.Client
+        self._local = threading.local()
+
+    def _client(self):
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = self._client_factory()
+        return client
+
+    def list(self, suffixes: Tuple[str, ...]) -> Iterator[BlobInfo]:
+        blobs = self._client().list_blobs(
+            self.bucket_name,
+            prefix=self.prefix or None,
+            page_size=self.page_size,
+            fields="items(name,size),nextPageToken",
+        )
+        for blob in blobs:
+            if blob.name.endswith(suffixes):
+                yield BlobInfo(blob.name, int(blob.size or 0), f"gs://{self.bucket_name}/{blob.name}")
+
+    def read(self, name: str, start: Optional[int] = None, end: Optional[int] = None) -> bytes:
+        """Bytes [start, end) of an object (the whole object by default)."""
+        blob = self._client().bucket(self.bucket_name).blob(name)
+        if start is None and end is None:
+            return blob.download_as_bytes()
+        # GCS ranges are inclusive; CRC checks only cover whole objects
+        return blob.download_as_bytes(
+            start=start, end=None if end is None else end - 1, checksum=None
+        )
+
+
+class LocalSource:
+    """Filesystem stand-in for GCSSource; object names are paths under `root`."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def list(self, suffixes: Tuple[str, ...]) -> Iterator[BlobInfo]:
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames.sort()
+            for fn in sorted(filenames):
+                if not fn.endswith(suffixes):
+                    continue
+                fp = os.path.join(dirpath, fn)
+                name = os.path.relpath(fp, self.root).replace(os.sep, "/")
+                yield BlobInfo(name, os.path.getsize(fp), f"file://{os.path.abspath(fp)}")
+
+    def read(self, name: str, start: Optional[int] = None, end: Optional[int] = None) -> bytes:
+        with open(os.path.join(self.root, name), "rb") as f:
+            f.seek(start or 0)
+            return f.read() if end is None else f.read(end - (start or 0))
+
+
+def open_source(uri: str):
+    if uri.startswith("file://"):
+        return LocalSource(uri[len("file://"):])
+    return GCSSource(uri)
+
+
+def iter_text(source, info: BlobInfo, range_bytes: int) -> Iterator[str]:
+    """Decoded text of an object, fetched `range_bytes` at a time."""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+    for start in range(0, info.size, range_bytes):
+        data = source.read(info.name, start, min(start + range_bytes, info.size))
+        yield decoder.decode(data)
+    yield decoder.decode(b"", final=True)
+
+
+def iter_lines(parts: Iterable[str]) -> Iterator[str]:
+    """Lines across text parts whose boundaries fall mid-line."""
+    tail = ""
+    for part in parts:
+        lines = (tail + part).split("\n")
+        tail = lines.pop()
+        yield from lines
+    if tail:
+        yield tail
@@ -0,0 +1,85 @@
+"""
+Chunker throughput on the sample corpus (or any directory).
+
+    cd services/qdrant-ingestor
+    python -m benchmarks.bench_chunkers --input data --repeat 50
+    python -m benchmarks.bench_chunkers --embedding-model BAAI/bge-small-en-v1.5
+
+Reports chunks/s, MB/s of input and, when the embedding model's tokenizer is
+available, tokens/s plus the share of chunks that exceed the model's window.
+"""
+import argparse
+import glob
+import os
+import time
+
+from app.chunkers import build_chunker
+from app.ingest_utils import normalize_whitespace, read_file
+
+
+def load_corpus(path: str, scale: int):
+    docs = []
+    for fp in sorted(glob.glob(os.path.join(path, "*"))):
+        if os.path.isfile(fp):
+            docs.append((os.path.basename(fp), normalize_whitespace(read_file(fp))))
+    # Long documents are where quadratic slicing shows up
+    return [(doc_id, "\n\n".join([text] * scale)) for doc_id, text in docs]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark ingestor chunkers.")
+    ap.add_argument("--input", default="data")
+    ap.add_argument("--scale", type=int, default=20, help="Repeat each document N times")
+    ap.add_argument("--repeat", type=int, default=20)
+    ap.add_argument("--chunk-size", type=int, default=900)
+    ap.add_argument("--overlap", type=int, default=150)
+    ap.add_argument("--chunk-tokens", type=int, default=256)
+    ap.add_argument("--overlap-tokens", type=int, default=32)
+    ap.add_argument("--embedding-model", default="",
+                    help="Load this fastembed model's tokenizer for token counts/chunker")
+    ap.add_argument("--max-tokens", type=int, default=512, help="Model window for overflow stats")
+    args = ap.parse_args()
+
+    corpus = load_corpus(args.input, args.scale)
+    nbytes = sum(len(t.encode("utf-8")) for _, t in corpus)
+
+    tokenizer = None
+    if args.embedding_model:
+        from fastembed import TextEmbedding
+
+        from app.chunkers import model_tokenizer
+
+        tokenizer = model_tokenizer(TextEmbedding(model_name=args.embedding_model))
+
+    names = ["char", "sentence", "markdown", "auto"] + (["token"] if tokenizer else [])
+    print(f"{len(corpus)} documents, {nbytes / 1e6:.2f} MB x {args.repeat} runs")
+    print(f"{'chunker':<10} {'chunks':>7} {'chunks/s':>10} {'MB/s':>8} {'tokens/s':>10} {'>window':>8}")
+
+    for name in names:
+        chunker = build_chunker(
+            name,
+            chunk_size=args.chunk_size,
+            overlap=args.overlap,
+            tokenizer=tokenizer,
+            chunk_tokens=args.chunk_tokens,
+            overlap_tokens=args.overlap_tokens,
+        )
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            chunks = [c for doc_id, text in corpus for c in chunker(doc_id, text)]
+        elapsed = (time.perf_counter() - start) / args.repeat
+
+        tokens_s = over = "-"
+        if tokenizer is not None:
+            lengths = [len(e.ids) for e in tokenizer.encode_batch(chunks)]
+            tokens_s = f"{sum(lengths) / elapsed:,.0f}"
+            over = f"{sum(n > args.max_tokens for n in lengths) / len(lengths):.1%}"
+
+        print(
+            f"{name:<10} {len(chunks):>7} {len(chunks) / elapsed:>10,.0f} "
+            f"{nbytes / 1e6 / elapsed:>8.1f} {tokens_s:>10} {over:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
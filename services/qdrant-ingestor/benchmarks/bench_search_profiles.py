@@ -0,0 +1,149 @@
+"""
+Recall@k and search latency of each collection profile against exact search.
+
+    cd services/qdrant-ingestor
+    python -m benchmarks.bench_search_profiles --qdrant-url http://localhost:6333
+    python -m benchmarks.bench_search_profiles --qdrant-url http://localhost:6333 \\
+        --synthetic 200000 --dim 384 --profiles default,scalar,binary \\
+        --hnsw-ef 64,128 --oversampling 1,2,4
+
+Vectors come from the sample corpus (chunked and embedded) or, with
+--synthetic N, from N clustered random unit vectors, which is the only way to
+see HNSW/quantization effects at a realistic scale. Queries are noisy copies
+of corpus vectors. Ground truth is an exact (brute-force) search on the
+float32 "default" collection. Each profile is loaded into its own
+<prefix>_<profile> collection, which is dropped and recreated on every run,
+so point this at a scratch Qdrant, never at production.
+
+Needs a Qdrant server: local mode (":memory:") ignores HNSW and quantization.
+"""
+import argparse
+import glob
+import itertools
+import os
+import time
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.http import models as qm
+
+from app.chunkers import sentence_chunks
+from app.collection_profile import PROFILES, build_profile
+from app.ingest_utils import normalize_whitespace, read_file
+
+
+def corpus_vectors(path: str, model: str) -> np.ndarray:
+    from fastembed import TextEmbedding
+
+    texts = []
+    for fp in sorted(glob.glob(os.path.join(path, "*"))):
+        if os.path.isfile(fp):
+            texts.extend(sentence_chunks(normalize_whitespace(read_file(fp)), 400, 50))
+    return np.stack(list(TextEmbedding(model_name=model).embed(texts))).astype(np.float32)
+
+
+def synthetic_vectors(n: int, dim: int, clusters: int, rng: np.random.Generator) -> np.ndarray:
+    # Clustered data: uniform random vectors make every neighbour equally far
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vecs = centers[rng.integers(0, clusters, n)] + 0.5 * rng.standard_normal((n, dim)).astype(np.float32)
+    return vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+
+
+def load_collection(client: QdrantClient, name: str, vectors: np.ndarray, profile, batch_size: int):
+    client.recreate_collection(
+        collection_name=name,
+        vectors_config=profile.vector_params(vectors.shape[1]),
+        **profile.create_kwargs(),
+    )
+    for start in range(0, len(vectors), batch_size):
+        part = vectors[start : start + batch_size]
+        client.upsert(
+            collection_name=name,
+            points=qm.Batch(ids=list(range(start, start + len(part))), vectors=part.tolist()),
+            wait=True,
+        )
+    # Searches before the optimizer finishes would measure a half-built index
+    while client.get_collection(name).status != qm.CollectionStatus.GREEN:
+        time.sleep(0.5)
+
+
+def run_queries(client: QdrantClient, name: str, queries: np.ndarray, k: int, params):
+    ids, latencies = [], []
+    for q in queries:
+        start = time.perf_counter()
+        hits = client.search(collection_name=name, query_vector=q.tolist(), limit=k, search_params=params)
+        latencies.append(time.perf_counter() - start)
+        ids.append({h.id for h in hits})
+    return ids, np.asarray(latencies) * 1000
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark Qdrant collection profiles.")
+    ap.add_argument("--qdrant-url", required=True)
+    ap.add_argument("--prefix", default="bench_profiles")
+    ap.add_argument("--input", default="data")
+    ap.add_argument("--embedding-model", default="BAAI/bge-small-en-v1.5")
+    ap.add_argument("--synthetic", type=int, default=0, help="Use N random vectors instead of the corpus")
+    ap.add_argument("--dim", type=int, default=384, help="Dimension of --synthetic vectors")
+    ap.add_argument("--clusters", type=int, default=256)
+    ap.add_argument("--profiles", default=",".join(PROFILES))
+    ap.add_argument("--indexing-threshold-kb", type=int, default=1,
+                    help="Low enough that even small benchmark sets get an HNSW index")
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--hnsw-ef", default="0", help="Comma-separated query-time ef values (0 = default)")
+    ap.add_argument("--oversampling", default="0",
+                    help="Comma-separated oversampling factors for quantized profiles (0 = default)")
+    ap.add_argument("--batch-size", type=int, default=1024)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    if args.synthetic:
+        vectors = synthetic_vectors(args.synthetic, args.dim, args.clusters, rng)
+    else:
+        vectors = corpus_vectors(args.input, args.embedding_model)
+    sample = vectors[rng.integers(0, len(vectors), args.queries)]
+    queries = sample + 0.05 * rng.standard_normal(sample.shape).astype(np.float32)
+    k = min(args.k, len(vectors))
+
+    client = QdrantClient(url=args.qdrant_url, timeout=300)
+    names = [p.strip() for p in args.profiles.split(",") if p.strip()]
+    if "default" not in names:
+        names.insert(0, "default")
+
+    for name in names:
+        profile = build_profile(name, indexing_threshold_kb=args.indexing_threshold_kb)
+        start = time.perf_counter()
+        load_collection(client, f"{args.prefix}_{name}", vectors, profile, args.batch_size)
+        print(f"loaded {name:<8} {len(vectors)} x {vectors.shape[1]} in {time.perf_counter() - start:.1f}s")
+
+    truth, _ = run_queries(client, f"{args.prefix}_default", queries, k, qm.SearchParams(exact=True))
+
+    efs = [int(x) for x in args.hnsw_ef.split(",")]
+    oversampling = [float(x) for x in args.oversampling.split(",")]
+    print(f"\n{len(queries)} queries, recall@{k} vs exact search")
+    print(f"{'profile':<8} {'hnsw_ef':>7} {'rescore':>7} {'oversmp':>7} "
+          f"{'recall':>7} {'p50 ms':>7} {'p99 ms':>7}")
+
+    for name in names:
+        quantized = PROFILES[name].quantization != "none"
+        combos = itertools.product(efs, (True, False) if quantized else (None,),
+                                   oversampling if quantized else (0.0,))
+        for ef, rescore, over in combos:
+            quant = (
+                qm.QuantizationSearchParams(rescore=rescore, oversampling=over or None)
+                if quantized
+                else None
+            )
+            params = qm.SearchParams(hnsw_ef=ef or None, quantization=quant)
+            found, ms = run_queries(client, f"{args.prefix}_{name}", queries, k, params)
+            recall = np.mean([len(f & t) / k for f, t in zip(found, truth)])
+            print(
+                f"{name:<8} {ef or '-':>7} {'-' if rescore is None else str(rescore).lower():>7} "
+                f"{over or '-':>7} {recall:>7.3f} {np.percentile(ms, 50):>7.2f} {np.percentile(ms, 99):>7.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import numpy as np
+
+from app.chunkers import TokenChunker, _pack, build_chunker, markdown_chunks, sentence_chunks
+
+
+def test_pack_keeps_units_whole_and_overlaps_by_whole_units():
+    text = "aaaa bbbb cccc dddd "
+    starts = np.array([0, 5, 10, 15, 20])
+    assert _pack(text, starts, chunk_size=10, overlap=5) == ["aaaa bbbb", "bbbb cccc", "cccc dddd"]
+
+
+def test_pack_splits_a_unit_longer_than_the_chunk():
+    text = "x" * 25
+    chunks = _pack(text, np.array([0, 25]), chunk_size=10, overlap=0)
+    assert chunks == ["x" * 10, "x" * 10, "x" * 5]
+
+
+def test_sentence_chunks_respect_chunk_size():
+    text = " ".join(f"Sentence number {i} is here." for i in range(50))
+    chunks = sentence_chunks(text, chunk_size=100, overlap=30)
+    assert chunks and all(len(c) <= 100 for c in chunks)
+    assert all(c.endswith(".") for c in chunks)
+
+
+def test_markdown_chunks_carry_their_heading_trail():
+    text = "# Flu\nIntro text.\n## Treatment\nRest and fluids.\n# Cold\nMild."
+    assert markdown_chunks(text, chunk_size=200, overlap=0) == [
+        "Flu\nIntro text.",
+        "Flu > Treatment\nRest and fluids.",
+        "Cold\nMild.",
+    ]
+
+
+def test_markdown_chunks_never_exceed_chunk_size_with_long_headings():
+    text = "".join(f"{'#' * (i + 1)} Very long section title {i}\n" for i in range(6))
+    text += " ".join(f"Body sentence {i}." for i in range(40))
+    chunks = markdown_chunks(text, chunk_size=120, overlap=20)
+    assert chunks and all(len(c) <= 120 for c in chunks)
+    # The innermost heading survives the cut
+    assert all("Very long section title 5" in c.split("\n")[0] for c in chunks)
+
+
+class FakeEncoding:
+    def __init__(self, offsets):
+        self.offsets = offsets
+
+
+class WhitespaceTokenizer:
+    def encode(self, text, add_special_tokens=False):
+        offsets, pos = [], 0
+        for word in text.split():
+            start = text.index(word, pos)
+            pos = start + len(word)
+            offsets.append((start, pos))
+        return FakeEncoding(offsets)
+
+
+def test_token_chunker_windows_with_overlap():
+    chunker = TokenChunker(WhitespaceTokenizer(), max_tokens=3, overlap=1)
+    assert chunker("a b c d e f g") == ["a b c", "c d e", "e f g"]
+    assert chunker("") == []
+
+
+def test_auto_chunker_picks_markdown_for_md_files():
+    chunk = build_chunker("auto", chunk_size=200, overlap=0)
+    assert chunk("notes.md", "# Title\nBody.") == ["Title\nBody."]
+    assert chunk("notes.txt", "# Title\nBody.") == ["# Title\nBody."]
@@ -0,0 +1,61 @@
+import pytest
+from qdrant_client.http import models as qm
+
+from app.collection_profile import CollectionProfile, apply_profile, build_profile
+from app.ingest import ensure_collection
+
+
+class RecordingClient:
+    def __init__(self, existing=()):
+        self.existing = list(existing)
+        self.created = {}
+        self.updated = {}
+
+    def get_collections(self):
+        return qm.CollectionsResponse(
+            collections=[qm.CollectionDescription(name=n) for n in self.existing]
+        )
+
+    def create_collection(self, collection_name, **kwargs):
+        self.created = kwargs
+
+    def update_collection(self, collection_name, **kwargs):
+        self.updated = kwargs
+
+
+def test_named_profiles_and_overrides():
+    scalar = build_profile("scalar", hnsw_m=32, quantile=None)
+    assert scalar.quantization == "scalar" and scalar.on_disk
+    assert scalar.hnsw_m == 32 and scalar.quantile == 0.99
+    with pytest.raises(ValueError):
+        build_profile("nope")
+
+
+def test_default_profile_changes_nothing():
+    kwargs = CollectionProfile().create_kwargs()
+    assert kwargs == {"hnsw_config": None, "optimizers_config": None, "quantization_config": None}
+    assert CollectionProfile().vector_params(384).on_disk is None
+
+
+def test_quantized_profile_is_used_at_creation():
+    client = RecordingClient()
+    ensure_collection(client, "docs", 384, profile=build_profile("binary"))
+    assert client.created["vectors_config"].on_disk is True
+    assert isinstance(client.created["quantization_config"], qm.BinaryQuantization)
+
+
+def test_existing_collection_only_changes_with_update_profile():
+    client = RecordingClient(existing=["docs"])
+    ensure_collection(client, "docs", 384, profile=build_profile("scalar"))
+    assert client.created == {} and client.updated == {}
+
+    ensure_collection(client, "docs", 384, profile=build_profile("scalar"), update_profile=True)
+    assert client.updated["vectors_config"] == {"": qm.VectorParamsDiff(on_disk=True)}
+    assert isinstance(client.updated["quantization_config"], qm.ScalarQuantization)
+
+
+def test_removing_quantization_disables_it():
+    client = RecordingClient()
+    apply_profile(client, "docs", CollectionProfile(), vector_name="dense")
+    assert client.updated["quantization_config"] == qm.Disabled.DISABLED
+    assert set(client.updated["vectors_config"]) == {"dense"}
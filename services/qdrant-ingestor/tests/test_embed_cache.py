@@ -0,0 +1,76 @@
+import numpy as np
+
+from app.embed_cache import EmbeddingCache
+
+
+def _cache(tmp_path, entries=4, dim=2):
+    return EmbeddingCache(str(tmp_path), "BAAI/bge-small", dim=dim, max_bytes=entries * dim * 4)
+
+
+def _vec(i):
+    return [float(i), float(i) + 0.5]
+
+
+def test_roundtrip_and_hit_counts(tmp_path):
+    cache = _cache(tmp_path)
+    cache.put_many([(cache.key("a"), _vec(1))])
+    assert cache.get_many([cache.key("a"), cache.key("b")]) == {cache.key("a"): _vec(1)}
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_least_recently_used_is_evicted(tmp_path):
+    cache = _cache(tmp_path, entries=2)
+    a, b, c = (cache.key(t) for t in "abc")
+    cache.put_many([(a, _vec(1)), (b, _vec(2))])
+    cache.get_many([a])  # b is now the oldest
+    cache.put_many([(c, _vec(3))])
+    assert cache.get_many([a, b, c]) == {a: _vec(1), c: _vec(3)}
+
+
+def test_entries_survive_reopen(tmp_path):
+    cache = _cache(tmp_path)
+    cache.put_many([(cache.key(t), _vec(i)) for i, t in enumerate("abc")])
+    cache.close()
+
+    cache = _cache(tmp_path)
+    cache.put_many([(cache.key("d"), _vec(9))])
+    assert cache.get_many([cache.key(t) for t in "abcd"]) == {
+        **{cache.key(t): _vec(i) for i, t in enumerate("abc")},
+        cache.key("d"): _vec(9),
+    }
+
+
+def test_interrupted_write_neither_collides_nor_serves_wrong_vectors(tmp_path):
+    cache = _cache(tmp_path, entries=2)
+    a, b, c, d = (cache.key(t) for t in "abcd")
+    cache.put_many([(a, _vec(1)), (b, _vec(2))])
+
+    # Crash mid-write: c's vector lands in a's slot, nothing commits
+    slot = cache._allocate(1)[0]
+    cache.vectors[slot] = np.asarray(_vec(3), dtype=np.float32)
+    cache.tags[slot] = 1
+    cache.vectors.flush()
+    cache.tags.flush()
+    cache.db.close()
+
+    cache = _cache(tmp_path, entries=2)
+    assert cache.get_many([a, b]) == {b: _vec(2)}  # a's slot no longer holds a
+    cache.put_many([(c, _vec(3)), (d, _vec(4))])
+    assert cache.get_many([b, c, d]) == {c: _vec(3), d: _vec(4)}
+
+
+def test_freed_slots_below_the_highest_are_reused(tmp_path):
+    cache = _cache(tmp_path, entries=3)
+    keys = [cache.key(t) for t in "abc"]
+    cache.put_many([(k, _vec(i)) for i, k in enumerate(keys)])
+    cache.db.execute("DELETE FROM entries WHERE key = ?", (keys[0],))
+    cache.db.commit()
+    cache.close()
+
+    cache = _cache(tmp_path, entries=3)
+    cache.put_many([(cache.key("d"), _vec(7))])  # slot 0, not a duplicate slot 3
+    assert cache.get_many(keys[1:] + [cache.key("d")]) == {
+        keys[1]: _vec(1),
+        keys[2]: _vec(2),
+        cache.key("d"): _vec(7),
+    }
@@ -0,0 +1,58 @@
+import threading
+
+import numpy as np
+
+from app.ingest import Chunk, embed_chunks, upsert_chunks
+
+
+class FakeEmbedder:
+    """Vectors derived from the text; records how far ahead input was read."""
+
+    def __init__(self):
+        self.texts = []
+
+    def passage_embed(self, texts, batch_size=64, parallel=None):
+        for text in texts:
+            self.texts.append(text)
+            yield np.array([float(len(text)), 1.0], dtype=np.float32)
+
+
+class FakeClient:
+    def __init__(self):
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def upsert(self, collection_name, points, wait=True):
+        with self._lock:
+            self.calls.append(([p.id for p in points], wait))
+
+
+def _chunks(n):
+    return [Chunk(id=f"id-{i}", text="x" * (i + 1), metadata={"i": i}) for i in range(n)]
+
+
+def test_embed_chunks_streams_pairs_in_order():
+    pairs = list(embed_chunks(FakeEmbedder(), iter(_chunks(5)), batch_size=2))
+    assert [ch.id for ch, _ in pairs] == [f"id-{i}" for i in range(5)]
+    assert [vec[0] for _, vec in pairs] == [1.0, 2.0, 3.0, 4.0, 5.0]
+
+
+def test_embed_chunks_is_lazy():
+    embedder = FakeEmbedder()
+    stream = embed_chunks(embedder, iter(_chunks(100)), batch_size=8)
+    next(stream)
+    assert len(embedder.texts) == 1
+
+
+def test_upsert_chunks_sends_every_point_and_waits_on_the_last_batch():
+    client = FakeClient()
+    total = upsert_chunks(
+        client, "docs", FakeEmbedder(), iter(_chunks(10)), batch_size=3, upsert_workers=2
+    )
+    assert total == 10
+    ids = [i for batch, _ in client.calls for i in batch]
+    assert sorted(ids) == sorted(f"id-{i}" for i in range(10))
+    assert [len(batch) for batch, _ in client.calls] == [3, 3, 3, 1]
+    # Only the final batch blocks, after the others were acknowledged
+    assert [wait for _, wait in client.calls] == [False, False, False, True]
+    assert client.calls[-1][0] == ["id-9"]
@@ -0,0 +1,41 @@
+from app.ingest import JsonlFields, iter_local_documents, jsonl_documents
+from app.ingest_utils import iter_jsonl_records
+
+
+def test_malformed_blank_and_non_object_lines_are_skipped():
+    lines = ['{"a": 1}', "", "not json", "[1, 2]", '{"b": 2}']
+    assert list(iter_jsonl_records(lines)) == [(1, {"a": 1}), (5, {"b": 2})]
+
+
+def test_records_become_documents_with_metadata():
+    lines = [
+        '{"doc_id": "flu", "content": "Rest  and fluids.", "topic": "flu"}',
+        '{"doc_id": "flu", "content": "Duplicate id."}',
+        '{"content": "No id."}',
+        '{"doc_id": "empty", "content": "  "}',
+    ]
+    docs = list(jsonl_documents(lines, "qa.jsonl", JsonlFields(), metadata={"gcs_uri": "gs://b/qa"}))
+    assert [d.id for d in docs] == ["qa.jsonl#flu", "qa.jsonl#flu@2", "qa.jsonl#line3"]
+    assert docs[0].text == "Rest and fluids."
+    assert docs[0].metadata == {
+        "doc_id": "flu",
+        "topic": "flu",
+        "gcs_uri": "gs://b/qa",
+        "file": "qa.jsonl",
+    }
+
+
+def test_custom_text_and_id_fields():
+    docs = list(jsonl_documents(['{"q": "Question?", "uid": 7}'], "f.jsonl", JsonlFields("q", "uid")))
+    assert [(d.id, d.text) for d in docs] == [("f.jsonl#7", "Question?")]
+
+
+def test_local_jsonl_files_are_read_record_by_record(tmp_path):
+    (tmp_path / "qa.jsonl").write_text('{"doc_id": "a", "content": "A."}\n{"doc_id": "b", "content": "B."}\n')
+    (tmp_path / "notes.txt").write_text("Plain   text.")
+    docs = list(iter_local_documents(str(tmp_path), ["*.jsonl", "*.txt"]))
+    assert sorted((d.id, d.text) for d in docs) == [
+        ("notes.txt", "Plain text."),
+        ("qa.jsonl#a", "A."),
+        ("qa.jsonl#b", "B."),
+    ]
@@ -0,0 +1,127 @@
+from qdrant_client import QdrantClient
+from qdrant_client.http import models as qm
+
+from app.ingest import (
+    Document,
+    IngestPlan,
+    delete_stale_points,
+    document_chunks,
+    removed_documents,
+    select_changed,
+)
+from app.manifest import Manifest, chunk_point_id
+
+
+def _client():
+    client = QdrantClient(":memory:")
+    for name in ("docs", "rag_meta"):
+        client.create_collection(
+            name, vectors_config=qm.VectorParams(size=1, distance=qm.Distance.COSINE)
+        )
+    return client
+
+
+def _upsert(client, chunks):
+    client.upsert(
+        "docs",
+        [qm.PointStruct(id=ch.id, vector=[1.0], payload={"text": ch.text, "metadata": ch.metadata})
+         for ch in chunks],
+    )
+
+
+def _run(client, manifest, docs, fingerprint="fp", patterns=("*",)):
+    """One incremental run, as ingest.main drives it."""
+    plan = IngestPlan()
+    chunks = list(document_chunks(
+        select_changed(docs, manifest, fingerprint, plan),
+        "src",
+        lambda doc_id, text: text.split("|"),
+        plan,
+    ))
+    _upsert(client, chunks)
+    plan.removed = removed_documents(manifest.entries, plan.seen, list(patterns))
+    delete_stale_points(client, "docs", "src", plan)
+    manifest.record(plan.hashes, plan.chunk_counts)
+    manifest.forget(plan.removed)
+    return plan
+
+
+def _texts(client):
+    points, _ = client.scroll("docs", limit=100, with_payload=True)
+    return sorted(p.payload["text"] for p in points)
+
+
+def test_chunk_ids_are_deterministic():
+    assert chunk_point_id("src", "a.txt", 0, "x") == chunk_point_id("src", "a.txt", 0, "x")
+    assert chunk_point_id("src", "a.txt", 0, "x") != chunk_point_id("src", "a.txt", 1, "x")
+
+
+def test_unchanged_documents_are_skipped():
+    client = _client()
+    manifest = Manifest(client, "rag_meta", "docs", "src")
+    docs = [Document("a", "a1|a2"), Document("b", "b1")]
+    first = _run(client, manifest, docs)
+    assert set(first.hashes) == {"a", "b"}
+
+    reloaded = Manifest(client, "rag_meta", "docs", "src")
+    reloaded.load()
+    second = _run(client, reloaded, docs)
+    assert second.hashes == {} and second.unchanged == 2
+    assert _texts(client) == ["a1", "a2", "b1"]
+
+
+def test_changed_and_removed_documents_leave_no_stale_points():
+    client = _client()
+    manifest = Manifest(client, "rag_meta", "docs", "src")
+    _run(client, manifest, [Document("a", "a1|a2|a3"), Document("b", "b1")])
+
+    plan = _run(client, manifest, [Document("a", "a1|new")])
+    assert set(plan.hashes) == {"a"} and plan.removed == ["b"]
+    assert _texts(client) == ["a1", "new"]
+
+    reloaded = Manifest(client, "rag_meta", "docs", "src")
+    assert set(reloaded.load()) == {"a"}
+
+
+def test_fingerprint_change_reingests_everything():
+    client = _client()
+    manifest = Manifest(client, "rag_meta", "docs", "src")
+    docs = [Document("a", "a1")]
+    _run(client, manifest, docs, fingerprint="model-1")
+    plan = _run(client, manifest, docs, fingerprint="model-2")
+    assert set(plan.hashes) == {"a"}
+    assert _texts(client) == ["a1"]
+
+
+def test_file_level_jsonl_points_are_replaced_by_records():
+    client = _client()
+    # Written before JSONL records became documents of their own
+    legacy = chunk_point_id("src", "qa.jsonl", 0, "whole file")
+    client.upsert("docs", [qm.PointStruct(
+        id=legacy, vector=[1.0],
+        payload={"text": "whole file", "metadata": {"source": "src", "document": "qa.jsonl"}},
+    )])
+
+    manifest = Manifest(client, "rag_meta", "docs", "src")
+    docs = [
+        Document("qa.jsonl#1", "r1", {"file": "qa.jsonl"}),
+        Document("qa.jsonl#2", "r2", {"file": "qa.jsonl"}),
+    ]
+    plan = _run(client, manifest, docs)
+    assert plan.jsonl_files == {"qa.jsonl"}
+    assert _texts(client) == ["r1", "r2"]
+
+
+def test_removal_is_limited_to_the_runs_patterns():
+    client = _client()
+    manifest = Manifest(client, "rag_meta", "docs", "src")
+    _run(client, manifest, [
+        Document("a.md", "a"),
+        Document("qa.jsonl#1", "q", {"file": "qa.jsonl"}),
+        Document("old.md", "old"),
+    ])
+
+    # A later run over Markdown only: the JSONL records are out of its scope
+    plan = _run(client, manifest, [Document("a.md", "a")], patterns=("*.md",))
+    assert plan.removed == ["old.md"]
+    assert _texts(client) == ["a", "q"]
@@ -0,0 +1,62 @@
+import threading
+
+import pytest
+
+from app.ingest import iter_source_documents
+from app.sources import BlobInfo, LocalSource, iter_lines, iter_text
+
+
+class CountingSource(LocalSource):
+    """LocalSource that records ranged reads and the threads reading."""
+
+    def __init__(self, root):
+        super().__init__(root)
+        self.ranges = []
+        self.threads = set()
+
+    def read(self, name, start=None, end=None):
+        self.threads.add(threading.current_thread().name)
+        if start is not None:
+            self.ranges.append((name, start, end))
+        return super().read(name, start, end)
+
+
+def _corpus(tmp_path, n=20):
+    for i in range(n):
+        (tmp_path / f"doc{i:02d}.txt").write_text(f"Document {i}.")
+    (tmp_path / "skip.bin").write_bytes(b"\x00")
+
+
+def test_documents_come_in_listing_order_from_download_threads(tmp_path):
+    _corpus(tmp_path)
+    source = CountingSource(str(tmp_path))
+    docs = list(iter_source_documents(source, ["*.txt"], workers=4))
+    assert [d.id for d in docs] == [f"doc{i:02d}.txt" for i in range(20)]
+    assert docs[3].text == "Document 3."
+    assert docs[3].metadata["gcs_uri"].startswith("file://")
+    assert all(name.startswith("download") for name in source.threads)
+
+
+def test_large_objects_are_streamed_in_ranges(tmp_path):
+    records = "".join(f'{{"doc_id": "r{i}", "content": "Record {i} é."}}\n' for i in range(50))
+    (tmp_path / "big.jsonl").write_text(records, encoding="utf-8")
+    source = CountingSource(str(tmp_path))
+    docs = list(iter_source_documents(source, ["*.jsonl"], range_bytes=64))
+    assert [d.id for d in docs] == [f"big.jsonl#r{i}" for i in range(50)]
+    assert docs[7].text == "Record 7 é."
+    assert len(source.ranges) > 1 and all(end - start <= 64 for _, start, end in source.ranges)
+
+
+def test_no_matching_objects_is_an_error(tmp_path):
+    (tmp_path / "skip.bin").write_bytes(b"\x00")
+    with pytest.raises(SystemExit):
+        list(iter_source_documents(LocalSource(str(tmp_path)), ["*.txt"]))
+
+
+def test_ranges_split_inside_characters_and_lines_are_rejoined(tmp_path):
+    (tmp_path / "a.txt").write_text("héllo\nwörld\nlast", encoding="utf-8")
+    source = LocalSource(str(tmp_path))
+    info = BlobInfo("a.txt", (tmp_path / "a.txt").stat().st_size, "file://a.txt")
+    parts = list(iter_text(source, info, range_bytes=2))
+    assert "".join(parts) == "héllo\nwörld\nlast"
+    assert list(iter_lines(parts)) == ["héllo", "wörld", "last"]
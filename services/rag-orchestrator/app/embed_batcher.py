@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from concurrent.futures import Executor
+from typing import Callable, List, Optional, Set, Tuple
+
+from .metrics import RAG_EMBED_BATCH_SIZE, RAG_EMBED_BATCH_WAIT_SECONDS
+
+EmbedFn = Callable[[List[str]], List[List[float]]]
+
+
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent single-query embeddings into one model call.
+
+    The first request of a batch opens a window of `max_wait_ms`; the batch is
+    flushed when the window closes or `max_batch` texts are queued, whichever
+    comes first. The batch runs on `executor` (keep it small: ONNX Runtime
+    already parallelises inside one call), and each waiter gets its own vector.
+    Identical texts within a batch are embedded once.
+    """
+
+    def __init__(
+        self,
+        embed_fn: EmbedFn,
+        max_batch: int = 32,
+        max_wait_ms: float = 3.0,
+        executor: Optional[Executor] = None,
+    ):
+        self.embed_fn = embed_fn
+        self.max_batch = max(1, max_batch)
+        self.max_wait_s = max(0.0, max_wait_ms) / 1000.0
+        self.executor = executor
+        self._pending: List[Tuple[str, asyncio.Future, float]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # The loop only keeps weak references to tasks: an unreferenced batch
+        # could be collected mid-flight and leave its waiters hanging
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def embed(self, text: str) -> List[float]:
+        loop = asyncio.get_running_loop()
+        fut: asyncio.Future = loop.create_future()
+        self._pending.append((text, fut, time.monotonic()))
+
+        if len(self._pending) >= self.max_batch:
+            self._flush(loop)
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait_s, self._flush, loop)
+
+        return await fut
+
+    def _flush(self, loop: asyncio.AbstractEventLoop) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        task = loop.create_task(self._run(loop, batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def aclose(self) -> None:
+        """Flush whatever is queued and wait for the batches in flight."""
+        if self._pending:
+            self._flush(asyncio.get_running_loop())
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _run(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        batch: List[Tuple[str, asyncio.Future, float]],
+    ) -> None:
+        unique = list(dict.fromkeys(text for text, _, _ in batch))
+        now = time.monotonic()
+        RAG_EMBED_BATCH_SIZE.observe(len(unique))
+        for _, _, queued_at in batch:
+            RAG_EMBED_BATCH_WAIT_SECONDS.observe(now - queued_at)
+
+        try:
+            vectors = await loop.run_in_executor(self.executor, self.embed_fn, unique)
+        except Exception as e:
+            for _, fut, _ in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        except asyncio.CancelledError:
+            for _, fut, _ in batch:
+                fut.cancel()
+            raise
+
+        by_text = dict(zip(unique, vectors))
+        for text, fut, _ in batch:
+            if not fut.done():
+                fut.set_result(by_text[text])
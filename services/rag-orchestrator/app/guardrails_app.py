@@ -1,4 +1,6 @@
+import asyncio
 import os
+from contextvars import ContextVar
 from functools import lru_cache
 from typing import Any
 
@@ -10,12 +12,41 @@ from langchain_core.language_models import BaseLanguageModel
 from langchain_core.outputs import Generation, LLMResult
 from langchain_core.runnables import RunnableConfig
 
+from .resilience import BackendUnavailable
+
+
+# Rails turn a failing LLM call into a canned "internal error" reply, so the
+# adapter notes backend outages here for agenerate_with_guardrails to re-raise
+_backend_errors: ContextVar[Optional[List[BackendUnavailable]]] = ContextVar(
+    "guardrails_backend_errors", default=None
+)
+
+
+def _note_backend_error(exc: BackendUnavailable) -> None:
+    errors = _backend_errors.get()
+    if errors is not None:
+        errors.append(exc)
+
+
+def _inference_client():
+    """The process-wide client (pooled HTTP, retries, breaker, routing)."""
+    from .llm_router import build_kserve_client_from_env
+
+    client = build_kserve_client_from_env()
+    if not client:
+        raise RuntimeError("External inference client not configured")
+    return client
+
 
 class ExternalInferenceLLM(BaseLanguageModel):
     """
     LangChain 0.2.x compatible LLM for NeMo Guardrails 0.20.0
     backed by external inference (KServe).
     Note: LangChain and NeMo Guardrails do not call inference directly.
+
+    Guardrails run their LLM calls on the event loop through the async
+    methods, which await the shared async HTTP client; the sync methods
+    are only for sync callers (scripts, LangChain sync chains).
     """
 
     def __init__(self, *args, **kwargs):
@@ -36,17 +67,15 @@ class ExternalInferenceLLM(BaseLanguageModel):
         """
         Note: LangChain requires `_call` for sync execution paths.
         """
-        from .llm_client import build_kserve_client_from_env
-
-        client = build_kserve_client_from_env()
-        if not client:
-            raise RuntimeError("External inference client not configured")
-
-        return client.generate(
-            prompt,
-            max_tokens=kwargs.get("max_tokens", 512),
-            temperature=kwargs.get("temperature", 0.2),
-        )
+        try:
+            return _inference_client().generate(
+                prompt,
+                max_tokens=kwargs.get("max_tokens", 512),
+                temperature=kwargs.get("temperature", 0.2),
+            )
+        except BackendUnavailable as exc:
+            _note_backend_error(exc)
+            raise
 
     async def _acall(
         self,
@@ -55,10 +84,19 @@ class ExternalInferenceLLM(BaseLanguageModel):
         **kwargs: Any,
     ) -> str:
         """
-        LangChain + NeMo Guardrails expect an async version of `_call`. 
-        However, our backend is not async, we can only delegate to `_call`
+        LangChain + NeMo Guardrails expect an async version of `_call`.
+        Awaits the pooled async client, so the event loop keeps serving
+        other requests while this generation is in flight.
         """
-        return self._call(prompt, stop=stop, **kwargs)
+        try:
+            return await _inference_client().agenerate(
+                prompt,
+                max_tokens=kwargs.get("max_tokens", 512),
+                temperature=kwargs.get("temperature", 0.2),
+            )
+        except BackendUnavailable as exc:
+            _note_backend_error(exc)
+            raise
 
     # ---- Required abstract methods (LangChain 0.2.x) ----
 
@@ -94,11 +132,10 @@ class ExternalInferenceLLM(BaseLanguageModel):
         stop: Optional[List[str]] = None,
         **kwargs: Any,
     ) -> LLMResult:
-        generations = [
-            [Generation(text=await self._acall(p, stop=stop, **kwargs))]
-            for p in prompts
-        ]
-        return LLMResult(generations=generations)
+        texts = await asyncio.gather(
+            *(self._acall(p, stop=stop, **kwargs) for p in prompts)
+        )
+        return LLMResult(generations=[[Generation(text=t)] for t in texts])
 
     def invoke(
         self,
@@ -149,19 +186,47 @@ def get_rails_app() -> LLMRails:
     return LLMRails(config)
 
 
-def generate_with_guardrails(user_message: str, grounded_prompt: str) -> str:
-    rails = get_rails_app()
-
-    messages = [
+def _rails_messages(user_message: str, grounded_prompt: str) -> List[dict]:
+    return [
         {"role": "system", "content": grounded_prompt},
         {"role": "user", "content": user_message},
     ]
 
-    response: Any = rails.generate(messages=messages)
 
+def _response_text(response: Any) -> str:
     # Normalize output safely
     if isinstance(response, str):
         return response
     if isinstance(response, dict):
         return response.get("content") or response.get("output") or str(response)
     return str(response)
+
+
+async def agenerate_with_guardrails(user_message: str, grounded_prompt: str) -> str:
+    """
+    Rails on the caller's event loop; use this from the API. Raises
+    BackendUnavailable when an LLM call failed on it, instead of returning
+    the rails' generic error reply.
+    """
+    rails = get_rails_app()
+    errors: List[BackendUnavailable] = []
+    token = _backend_errors.set(errors)
+    try:
+        response: Any = await rails.generate_async(
+            messages=_rails_messages(user_message, grounded_prompt)
+        )
+    finally:
+        _backend_errors.reset(token)
+    if errors:
+        raise errors[-1]
+    return _response_text(response)
+
+
+def generate_with_guardrails(user_message: str, grounded_prompt: str) -> str:
+    """
+    Blocking variant for code without a running event loop (rails spin up
+    their own). Inside the API use `agenerate_with_guardrails`.
+    """
+    rails = get_rails_app()
+    response: Any = rails.generate(messages=_rails_messages(user_message, grounded_prompt))
+    return _response_text(response)
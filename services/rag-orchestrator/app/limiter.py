@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Optional
+
+from .metrics import (
+    RAG_LLM_CONCURRENCY_LIMIT,
+    RAG_LLM_INFLIGHT,
+    RAG_LLM_QUEUE_DEPTH,
+    RAG_LLM_QUEUE_WAIT_SECONDS,
+    RAG_LLM_SHED_TOTAL,
+)
+
+
+class Overloaded(Exception):
+    """Raised instead of queueing a request that could not start in time."""
+
+    def __init__(self, reason: str, retry_after_s: int):
+        super().__init__(f"LLM backend overloaded ({reason})")
+        self.reason = reason
+        self.retry_after_s = retry_after_s
+
+    @property
+    def status_code(self) -> int:
+        # Full queue: the client is sending too much (429). Queue deadline
+        # passed: the backend is too slow right now (503).
+        return 429 if self.reason == "queue_full" else 503
+
+
+class Slot:
+    """One admitted LLM call; streams mark their first token on it."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.first_token_s: Optional[float] = None
+
+    def first_token(self) -> None:
+        if self.first_token_s is None:
+            self.first_token_s = time.perf_counter() - self.start
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit for calls to one LLM backend.
+
+    - Slow (time to first token over `latency_target_s`) or failed calls
+      shrink the limit multiplicatively by `backoff`. A whole generation
+      takes as long as its answer is, so only streamed calls, which mark
+      their first token, give a latency signal; calls answered in one
+      piece count by success or failure alone.
+    - Calls that complete while the limit was fully used grow it by
+      1/limit, which is about +1 per limit's worth of completions.
+    - Over the limit, requests wait in a FIFO of at most `max_queue`. A
+      request is shed with Overloaded when the queue is full, or when it
+      waited `queue_timeout_s` without starting.
+    - A cancelled call (the client went away) tells nothing about the
+      backend and leaves the limit alone.
+
+    Per worker process and per event loop; nothing here is thread-safe.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 8,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        max_queue: int = 32,
+        queue_timeout_s: float = 5.0,
+        latency_target_s: float = 5.0,
+        backoff: float = 0.9,
+    ):
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = float(min(max(initial_limit, self.min_limit), self.max_limit))
+        self.max_queue = max_queue
+        self.queue_timeout_s = queue_timeout_s
+        self.latency_target_s = latency_target_s
+        self.backoff = backoff
+        self.inflight = 0
+        self.hold_ewma_s: Optional[float] = None
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._publish()
+
+    def _publish(self) -> None:
+        RAG_LLM_CONCURRENCY_LIMIT.set(int(self.limit))
+        RAG_LLM_INFLIGHT.set(self.inflight)
+        RAG_LLM_QUEUE_DEPTH.set(len(self._waiters))
+
+    def retry_after_s(self) -> int:
+        """Rough time for the queue ahead to drain, for Retry-After."""
+        per_call = self.hold_ewma_s or 1.0
+        return min(60, max(1, math.ceil(per_call * (len(self._waiters) + 1) / int(self.limit))))
+
+    def _shed(self, reason: str) -> Overloaded:
+        RAG_LLM_SHED_TOTAL.labels(reason=reason).inc()
+        return Overloaded(reason, self.retry_after_s())
+
+    async def acquire(self) -> None:
+        if self.inflight < int(self.limit) and not self._waiters:
+            self.inflight += 1
+            RAG_LLM_QUEUE_WAIT_SECONDS.observe(0)
+            self._publish()
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            raise self._shed("queue_full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._publish()
+        start = time.perf_counter()
+        try:
+            # release() hands the slot over (inflight already counted)
+            await asyncio.wait_for(waiter, self.queue_timeout_s)
+        except asyncio.TimeoutError:
+            self._forget(waiter)
+            raise self._shed("queue_timeout") from None
+        except asyncio.CancelledError:
+            # Client went away; give back a slot granted in the meantime
+            if waiter.done() and not waiter.cancelled():
+                self.inflight -= 1
+                self._wake()
+            self._forget(waiter)
+            raise
+        RAG_LLM_QUEUE_WAIT_SECONDS.observe(time.perf_counter() - start)
+
+    def release(
+        self,
+        hold_s: float,
+        first_token_s: Optional[float] = None,
+        ok: Optional[bool] = True,
+    ) -> None:
+        """
+        Give the slot back. `ok=None` is a neutral outcome (cancelled):
+        the limit is not adapted.
+        """
+        saturated = self.inflight >= int(self.limit) or bool(self._waiters)
+        self.inflight -= 1
+
+        slow = (
+            self.latency_target_s > 0
+            and first_token_s is not None
+            and first_token_s > self.latency_target_s
+        )
+        if ok is False or (ok and slow):
+            self.limit = max(self.min_limit, self.limit * self.backoff)
+        elif ok and saturated:
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+        if ok:
+            self.hold_ewma_s = (
+                hold_s
+                if self.hold_ewma_s is None
+                else 0.8 * self.hold_ewma_s + 0.2 * hold_s
+            )
+        self._wake()
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[Slot]:
+        await self.acquire()
+        held = Slot()
+        ok: Optional[bool] = False
+        try:
+            yield held
+            ok = True
+        except asyncio.CancelledError:
+            ok = None
+            raise
+        finally:
+            self.release(time.perf_counter() - held.start, held.first_token_s, ok)
+
+    def _wake(self) -> None:
+        while self._waiters and self.inflight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if waiter.done():
+                continue
+            self.inflight += 1
+            waiter.set_result(None)
+        self._publish()
+
+    def _forget(self, waiter: asyncio.Future) -> None:
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+        self._publish()
+
+
+def build_llm_limiter_from_env() -> Optional[AdaptiveLimiter]:
+    if os.getenv("LLM_LIMITER_ENABLED", "false").lower() != "true":
+        return None
+
+    return AdaptiveLimiter(
+        initial_limit=int(os.getenv("LLM_CONCURRENCY_INITIAL", "8")),
+        min_limit=int(os.getenv("LLM_CONCURRENCY_MIN", "1")),
+        max_limit=int(os.getenv("LLM_CONCURRENCY_MAX", "64")),
+        max_queue=int(os.getenv("LLM_QUEUE_MAX", "32")),
+        queue_timeout_s=float(os.getenv("LLM_QUEUE_TIMEOUT_S", "5")),
+        latency_target_s=float(os.getenv("LLM_LATENCY_TARGET_S", "5")),
+        backoff=float(os.getenv("LLM_LIMIT_BACKOFF", "0.9")),
+    )
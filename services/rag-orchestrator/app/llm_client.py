@@ -1,9 +1,9 @@
 import json
 import os
 import time
-from typing import Optional
+from typing import Any, AsyncIterator, Dict, Optional
 
-import requests
+import httpx
 
 from .metrics_llm import (
     LLM_REQUESTS_TOTAL,
@@ -11,6 +11,7 @@ from .metrics_llm import (
     LLM_PROMPT_TOKENS_TOTAL,
     LLM_COMPLETION_TOKENS_TOTAL,
 )
+from .resilience import CircuitBreaker, RetryPolicy, acall_with_retries, call_with_retries
 
 class KServeClient:
     """
@@ -33,29 +34,55 @@ class KServeClient:
         api_key: Optional[str],
         timeout_s: int,
         retries: int,
-        retry_backoff_s: int,
+        retry_backoff_s: float,
+        connect_timeout_s: float = 5.0,
+        retry_max_delay_s: float = 20.0,
+        breaker_failures: int = 5,
+        breaker_reset_s: float = 30.0,
+        name: Optional[str] = None,
     ):
         self.base_url = base_url.rstrip("/")
+        # Label for per-backend metrics; the model id unless routing across replicas
+        self.name = name or model_id
         self.completions_path = completions_path
         self.model_id = model_id
         self.api_key = api_key
         self.timeout_s = timeout_s
+        # Fail fast on unreachable backends; allow long reads for generation
+        self.connect_timeout_s = connect_timeout_s
+        self.timeout = httpx.Timeout(timeout_s, connect=connect_timeout_s)
         self.retries = retries
         self.retry_backoff_s = retry_backoff_s
+        # Retry only transient failures, backing off exponentially with jitter;
+        # every attempt is also bounded by the request deadline (resilience.py)
+        self.retry_policy = RetryPolicy(
+            max_attempts=retries + 1,
+            base_delay_s=retry_backoff_s,
+            max_delay_s=retry_max_delay_s,
+        )
+        # Shared by all requests: while the backend is down, calls fail fast
+        # to the extractive fallback instead of each waiting out its retries
+        self.breaker = CircuitBreaker(self.name, breaker_failures, breaker_reset_s)
 
-    def generate(
-        self,
-        prompt: str,
-        max_tokens: int = 512,
-        temperature: float = 0.2,
-    ) -> str:
+    @property
+    def is_down(self) -> bool:
+        """Known unavailable (circuit open): callers can skip straight to a fallback."""
+        return self.breaker.is_open
+
+    def close(self) -> None:
         """
-        Generate text using OpenAI *Chat Completions* contract.
+        Retire this client after a config change. Connections belong to the
+        shared pool below, so only its per-backend metric series go; calls
+        still in flight finish normally.
         """
+        self.breaker.retire()
 
-        url = f"{self.base_url}{self.completions_path}"
+    @property
+    def url(self) -> str:
+        return f"{self.base_url}{self.completions_path}"
 
-        payload = {
+    def _payload(self, prompt: str, max_tokens: int, temperature: float) -> Dict[str, Any]:
+        return {
             "model": self.model_id,
             "messages": [
                 {"role": "user", "content": prompt}
@@ -64,102 +91,242 @@ class KServeClient:
             "temperature": temperature,
         }
 
+    def _headers(self) -> Dict[str, str]:
         headers = {"Content-Type": "application/json"}
         if self.api_key:
             headers["Authorization"] = f"Bearer {self.api_key}"
+        return headers
+
+    def _parse_response(self, data: Dict[str, Any]) -> str:
+        choices = data.get("choices")
+        if isinstance(choices, list) and choices:
+            msg = choices[0].get("message")
+            if msg and msg.get("content"):
+
+                # Token usage
+                usage = data.get("usage") or {}
+                prompt_tokens = int(usage.get("prompt_tokens", 0))
+                completion_tokens = int(usage.get("completion_tokens", 0))
+
+                LLM_REQUESTS_TOTAL.labels(
+                    model=self.model_id,
+                    status="success",
+                ).inc()
+
+                if prompt_tokens:
+                    LLM_PROMPT_TOKENS_TOTAL.labels(model=self.model_id).inc(prompt_tokens)
+                if completion_tokens:
+                    LLM_COMPLETION_TOKENS_TOTAL.labels(model=self.model_id).inc(completion_tokens)
+
+                return msg["content"].strip()
 
-        last_err = None
+        # Defensive fallback
+        return json.dumps(data)
 
-        for attempt in range(self.retries + 1):
+    def _attempt_timeout(self, timeout_s: Optional[float]) -> httpx.Timeout:
+        """Per-attempt timeout, shrunk to what is left of the request deadline."""
+        if timeout_s is None or timeout_s >= self.timeout_s:
+            return self.timeout
+        return httpx.Timeout(timeout_s, connect=min(self.connect_timeout_s, timeout_s))
+
+    def generate(
+        self,
+        prompt: str,
+        max_tokens: int = 512,
+        temperature: float = 0.2,
+    ) -> str:
+        """
+        Generate text using OpenAI *Chat Completions* contract.
+        """
+
+        payload = self._payload(prompt, max_tokens, temperature)
+        headers = self._headers()
+        http = get_http_client()
+
+        def attempt(timeout_s: Optional[float]) -> str:
+            start = time.time()
             try:
-                start = time.time()
-                r = requests.post(
-                    url,
+                r = http.post(
+                    self.url,
                     json=payload,
                     headers=headers,
-                    timeout=self.timeout_s,
+                    timeout=self._attempt_timeout(timeout_s),
                 )
-                latency = time.time() - start
-                LLM_INFERENCE_LATENCY_SECONDS.labels(model=self.model_id).observe(latency)
+                LLM_INFERENCE_LATENCY_SECONDS.labels(model=self.model_id).observe(time.time() - start)
+                r.raise_for_status()
+                return self._parse_response(r.json())
+            except Exception:
+                LLM_REQUESTS_TOTAL.labels(model=self.model_id, status="error").inc()
+                raise
 
-                if r.status_code in (503, 504):
-                    raise RuntimeError(f"Upstream transient error {r.status_code}")
+        return call_with_retries(
+            attempt, self.retry_policy, self.breaker, self.timeout_s, label=self.name
+        )
 
-                r.raise_for_status()
-                data = r.json()
+    async def agenerate(
+        self,
+        prompt: str,
+        max_tokens: int = 512,
+        temperature: float = 0.2,
+    ) -> str:
+        """
+        Async variant of `generate` on the shared `httpx.AsyncClient`,
+        so a long generation holds no worker thread.
+        """
 
-                choices = data.get("choices")
-                if isinstance(choices, list) and choices:
-                    msg = choices[0].get("message")
-                    if msg and msg.get("content"):
+        payload = self._payload(prompt, max_tokens, temperature)
+        headers = self._headers()
+        http = get_async_http_client()
 
-                        # Token usage
-                        usage = data.get("usage") or {}
-                        prompt_tokens = int(usage.get("prompt_tokens", 0))
-                        completion_tokens = int(usage.get("completion_tokens", 0))
+        async def attempt(timeout_s: Optional[float]) -> str:
+            start = time.time()
+            try:
+                r = await http.post(
+                    self.url,
+                    json=payload,
+                    headers=headers,
+                    timeout=self._attempt_timeout(timeout_s),
+                )
+                LLM_INFERENCE_LATENCY_SECONDS.labels(model=self.model_id).observe(time.time() - start)
+                r.raise_for_status()
+                return self._parse_response(r.json())
+            except Exception:
+                LLM_REQUESTS_TOTAL.labels(model=self.model_id, status="error").inc()
+                raise
 
-                        LLM_REQUESTS_TOTAL.labels(
-                            model=self.model_id,
-                            status="success",
-                        ).inc()
+        return await acall_with_retries(
+            attempt, self.retry_policy, self.breaker, self.timeout_s, label=self.name
+        )
 
-                        if prompt_tokens:
-                            LLM_PROMPT_TOKENS_TOTAL.labels(model=self.model_id).inc(prompt_tokens)
-                        if completion_tokens:
-                            LLM_COMPLETION_TOKENS_TOTAL.labels(model=self.model_id).inc(completion_tokens)
+    async def astream(
+        self,
+        prompt: str,
+        max_tokens: int = 512,
+        temperature: float = 0.2,
+        stats: Optional[Dict[str, Any]] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Stream completion deltas using the OpenAI `stream: true` contract.
 
-                        return msg["content"].strip()
+        Yields text deltas as they arrive. If `stats` is given, it is filled
+        with `usage` (when the backend reports it) once the stream ends.
+        Opening the stream is retried like `agenerate`; once tokens have been
+        handed out the call can't be replayed, so later failures just raise.
+        """
 
-                # Defensive fallback
-                return json.dumps(data)
+        payload = self._payload(prompt, max_tokens, temperature)
+        payload["stream"] = True
+        payload["stream_options"] = {"include_usage": True}
+        headers = self._headers()
+        http = get_async_http_client()
 
-            except Exception as e:
-                LLM_REQUESTS_TOTAL.labels(
-                    model=self.model_id,
-                    status="error",
-                ).inc()
-                last_err = e
-                if attempt < self.retries:
-                    time.sleep(self.retry_backoff_s)
+        async def open_stream(timeout_s: Optional[float]) -> httpx.Response:
+            request = http.build_request(
+                "POST",
+                self.url,
+                json=payload,
+                headers=headers,
+                timeout=self._attempt_timeout(timeout_s),
+            )
+            try:
+                r = await http.send(request, stream=True)
+                if r.is_error:
+                    await r.aread()
+                    await r.aclose()
+                    r.raise_for_status()
+                return r
+            except Exception:
+                LLM_REQUESTS_TOTAL.labels(model=self.model_id, status="error").inc()
+                raise
+
+        usage: Dict[str, Any] = {}
+        start = time.time()
+        r = await acall_with_retries(
+            open_stream, self.retry_policy, self.breaker, self.timeout_s, label=self.name
+        )
+        try:
+            async for line in r.aiter_lines():
+                if not line.startswith("data:"):
                     continue
-                raise last_err
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
 
+                chunk = json.loads(data)
+                usage = chunk.get("usage") or usage
 
-def build_kserve_client_from_env() -> Optional[KServeClient]:
-    """
-    Factory for inference client.
+                for choice in chunk.get("choices") or []:
+                    delta = (choice.get("delta") or {}).get("content")
+                    if delta:
+                        yield delta
 
-    Switching between:
-    - in-cluster KServe
-    - external vLLM
+        except Exception as e:
+            LLM_REQUESTS_TOTAL.labels(
+                model=self.model_id,
+                status="error",
+            ).inc()
+            if isinstance(e, httpx.TransportError):
+                self.breaker.record_failure()
+            raise
+        finally:
+            await r.aclose()
 
-    is done purely via environment variables.
-    """
+        LLM_INFERENCE_LATENCY_SECONDS.labels(model=self.model_id).observe(time.time() - start)
+        LLM_REQUESTS_TOTAL.labels(
+            model=self.model_id,
+            status="success",
+        ).inc()
 
-    enabled = os.getenv("KSERVE_ENABLED", "false").lower() == "true"
-    if not enabled:
-        return None
+        if stats is not None:
+            stats["usage"] = usage
+        if usage.get("prompt_tokens"):
+            LLM_PROMPT_TOKENS_TOTAL.labels(model=self.model_id).inc(int(usage["prompt_tokens"]))
+        if usage.get("completion_tokens"):
+            LLM_COMPLETION_TOKENS_TOTAL.labels(model=self.model_id).inc(int(usage["completion_tokens"]))
 
-    base_url = (os.getenv("KSERVE_BASE_URL") or "").strip()
-    if not base_url:
-        return None
 
-    completions_path = (
-        os.getenv("KSERVE_COMPLETIONS_PATH") or "/v1/completions"
-    ).strip()
+# ---------------------------------------------------------------------
+# Shared HTTP transport
+# ---------------------------------------------------------------------
+# One sync and one async client per process: keep-alive connections to the
+# inference backend are reused across requests instead of paying a TCP/TLS
+# handshake per generation. HTTP/2 is negotiated via ALPN on https backends.
 
-    model_id = (os.getenv("LLM_MODEL_ID") or "").strip()
-    if not model_id:
-        raise RuntimeError("LLM_MODEL_ID is required when KSERVE_ENABLED=true")
+_http: Optional[httpx.Client] = None
+_async_http: Optional[httpx.AsyncClient] = None
 
-    api_key = (os.getenv("LLM_API_KEY") or "").strip() or None
 
-    return KServeClient(
-        base_url=base_url,
-        completions_path=completions_path,
-        model_id=model_id,
-        api_key=api_key,
-        timeout_s=int(os.getenv("LLM_TIMEOUT_S", "300")),
-        retries=int(os.getenv("LLM_RETRIES", "3")),
-        retry_backoff_s=int(os.getenv("LLM_RETRY_BACKOFF_S", "3")),
+def _http_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=int(os.getenv("LLM_POOL_MAX_CONNECTIONS", "100")),
+        max_keepalive_connections=int(os.getenv("LLM_POOL_MAX_KEEPALIVE", "20")),
+        keepalive_expiry=float(os.getenv("LLM_KEEPALIVE_EXPIRY_S", "60")),
     )
+
+
+def _http2_enabled() -> bool:
+    return os.getenv("LLM_HTTP2", "true").lower() == "true"
+
+
+def get_http_client() -> httpx.Client:
+    global _http
+    if _http is None or _http.is_closed:
+        _http = httpx.Client(limits=_http_limits(), http2=_http2_enabled())
+    return _http
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    global _async_http
+    if _async_http is None or _async_http.is_closed:
+        _async_http = httpx.AsyncClient(limits=_http_limits(), http2=_http2_enabled())
+    return _async_http
+
+
+async def aclose_http_clients() -> None:
+    global _http, _async_http
+    if _async_http is not None:
+        await _async_http.aclose()
+        _async_http = None
+    if _http is not None:
+        _http.close()
+        _http = None
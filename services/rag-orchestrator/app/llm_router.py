@@ -0,0 +1,448 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+from urllib.parse import urlsplit
+
+from .llm_client import KServeClient
+from .metrics_llm import LLM_ENDPOINT_INFLIGHT, LLM_ENDPOINT_TTFB_SECONDS, LLM_HEDGED_TOTAL
+from .resilience import BackendUnavailable, CircuitOpen
+
+T = TypeVar("T")
+
+# ---------------------------------------------------------------------
+# Routing across LLM replicas
+# ---------------------------------------------------------------------
+# Each endpoint is a KServeClient with its own retry policy and circuit
+# breaker; an open breaker takes the endpoint out of rotation (passive
+# ejection) until its half-open probe succeeds. Healthy endpoints are ranked
+# per call by outstanding requests and EWMA latency, scaled by weight.
+# Optionally a call that has not answered within the observed latency
+# quantile is hedged to the next-best endpoint; whichever answers first wins
+# and the other is cancelled. Streams are measured (and hedged) on time to
+# first token, whole generations on full response time: the two differ by the
+# length of the answer, so each kind keeps its own EWMA and window.
+
+POLICIES = ("ewma", "least_outstanding")
+TTFB, RESPONSE = "ttfb", "response"
+
+
+def parse_endpoints(spec: str) -> List[Tuple[str, float]]:
+    """'http://a:8080|2, https://b' -> [('http://a:8080', 2.0), ('https://b', 1.0)]"""
+    endpoints = []
+    for item in spec.split(","):
+        url, _, weight = item.strip().partition("|")
+        if url.strip():
+            endpoints.append((url.strip(), float(weight) if weight.strip() else 1.0))
+    return endpoints
+
+
+def endpoint_label(url: str) -> str:
+    return urlsplit(url).netloc or url
+
+
+class Endpoint:
+    def __init__(self, client: KServeClient, weight: float = 1.0, ewma_alpha: float = 0.3):
+        self.client = client
+        self.name = client.name
+        self.weight = max(weight, 1e-6)
+        self.ewma_alpha = ewma_alpha
+        # 0 until the first observation: new endpoints get tried
+        self.ewma_s = 0.0  # time to first token (streams)
+        self.response_ewma_s = 0.0  # full response time (whole generations)
+        self.outstanding = 0
+        self.closed = False
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        with self._lock:
+            self.outstanding += 1
+        if not self.closed:
+            LLM_ENDPOINT_INFLIGHT.labels(backend=self.name).inc()
+
+    def finish(self) -> None:
+        with self._lock:
+            self.outstanding -= 1
+        if not self.closed:
+            LLM_ENDPOINT_INFLIGHT.labels(backend=self.name).dec()
+
+    def close(self) -> None:
+        self.closed = True
+        self.client.close()
+        try:
+            LLM_ENDPOINT_INFLIGHT.remove(self.name)
+        except KeyError:
+            pass
+
+    def latency_s(self, kind: str = TTFB) -> float:
+        return self.ewma_s if kind == TTFB else self.response_ewma_s
+
+    def observe(self, seconds: float, kind: str = TTFB) -> None:
+        attr = "ewma_s" if kind == TTFB else "response_ewma_s"
+        with self._lock:
+            ewma = getattr(self, attr)
+            if ewma == 0.0:
+                ewma = seconds
+            else:
+                ewma += self.ewma_alpha * (seconds - ewma)
+            setattr(self, attr, ewma)
+        if kind == TTFB:
+            LLM_ENDPOINT_TTFB_SECONDS.labels(backend=self.name).observe(seconds)
+
+    def cost(self, policy: str, kind: str = TTFB) -> Tuple[float, ...]:
+        load = (self.outstanding + 1) / self.weight
+        latency = self.latency_s(kind)
+        if policy == "least_outstanding":
+            return (load, latency)
+        # Peak-EWMA style: expected wait grows with both latency and queue
+        return (latency * load, load)
+
+
+class LLMRouter:
+    """
+    Drop-in for KServeClient (generate / agenerate / astream / is_down)
+    that spreads calls across several replicas of the same model.
+    """
+
+    def __init__(
+        self,
+        endpoints: List[Endpoint],
+        policy: str = "ewma",
+        hedge: bool = False,
+        hedge_quantile: float = 0.95,
+        hedge_min_samples: int = 20,
+        hedge_max_ratio: float = 0.1,
+        window: int = 256,
+    ):
+        if not endpoints:
+            raise ValueError("LLMRouter needs at least one endpoint")
+        if policy not in POLICIES:
+            raise ValueError(f"unknown LLM_LB_POLICY '{policy}' (expected one of {POLICIES})")
+        self.endpoints = endpoints
+        self.policy = policy
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_max_ratio = hedge_max_ratio
+        self._ttfb: deque = deque(maxlen=window)
+        self._response: deque = deque(maxlen=window)
+        self._calls = 0
+        self._hedges = 0
+
+    @property
+    def is_down(self) -> bool:
+        return all(ep.client.is_down for ep in self.endpoints)
+
+    def close(self) -> None:
+        for ep in self.endpoints:
+            ep.close()
+
+    def ranked(self, kind: str = TTFB) -> List[Endpoint]:
+        """Healthy endpoints, best first (ties broken at random)."""
+        healthy = [ep for ep in self.endpoints if not ep.client.is_down]
+        return sorted(healthy, key=lambda ep: ep.cost(self.policy, kind) + (random.random(),))
+
+    def _window(self, kind: str) -> deque:
+        return self._ttfb if kind == TTFB else self._response
+
+    def _observe(self, ep: Endpoint, seconds: float, kind: str = TTFB) -> None:
+        ep.observe(seconds, kind)
+        self._window(kind).append(seconds)
+
+    def hedge_delay_s(self, kind: str = TTFB) -> Optional[float]:
+        """When to send the backup call; None = don't hedge this one."""
+        window = self._window(kind)
+        if not self.hedge or len(window) < self.hedge_min_samples:
+            return None
+        if self._hedges >= self.hedge_max_ratio * self._calls:
+            return None  # hedging budget: never more than a fraction of extra load
+        samples = sorted(window)
+        return samples[min(len(samples) - 1, int(self.hedge_quantile * len(samples)))]
+
+    # -----------------------------------------------------------------
+    # Sync path (guardrails' LangChain adapter runs in a worker thread)
+    # -----------------------------------------------------------------
+    def generate(self, prompt: str, max_tokens: int = 512, temperature: float = 0.2) -> str:
+        """Best endpoint first, failing over to the next when one is unavailable."""
+        last: Optional[BaseException] = None
+        for ep in self.ranked(RESPONSE):
+            ep.start()
+            start = time.time()
+            try:
+                answer = ep.client.generate(prompt, max_tokens=max_tokens, temperature=temperature)
+            except BackendUnavailable as exc:
+                last = exc
+                continue
+            finally:
+                ep.finish()
+            self._observe(ep, time.time() - start, RESPONSE)
+            return answer
+        raise last or CircuitOpen("all LLM endpoints are ejected")
+
+    # -----------------------------------------------------------------
+    # Async paths
+    # -----------------------------------------------------------------
+    async def _race(
+        self,
+        call: Callable[[Endpoint], Awaitable[T]],
+        discard: Optional[Callable[[T], Awaitable[None]]] = None,
+        kind: str = TTFB,
+    ) -> T:
+        """
+        Run `call` on the best endpoint. If it has not answered within the
+        hedge delay, also run it on the next one; the first success wins.
+        An endpoint that turns out unavailable is failed over immediately.
+        `kind` is what `call` measures, for ranking and the hedge delay.
+        """
+        candidates = iter(self.ranked(kind))
+        first = next(candidates, None)
+        if first is None:
+            raise CircuitOpen("all LLM endpoints are ejected")
+
+        self._calls += 1
+        tasks: Dict[asyncio.Task, str] = {asyncio.ensure_future(call(first)): "primary"}
+        delay = self.hedge_delay_s(kind)
+        last: Optional[BaseException] = None
+        try:
+            while tasks:
+                done, _ = await asyncio.wait(
+                    tasks, timeout=delay, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    # Slow to answer: hedge to the next endpoint (once)
+                    delay = None
+                    backup = next(candidates, None)
+                    if backup is not None:
+                        self._hedges += 1
+                        tasks[asyncio.ensure_future(call(backup))] = "hedge"
+                    continue
+
+                winner = None
+                for task in done:
+                    role = tasks.pop(task)
+                    exc = task.exception()
+                    if exc is None and winner is None:
+                        winner = task.result()
+                        if len(tasks) or role == "hedge":
+                            LLM_HEDGED_TOTAL.labels(winner=role).inc()
+                    elif exc is None:
+                        if discard is not None:
+                            await discard(task.result())
+                    elif isinstance(exc, BackendUnavailable):
+                        last = exc
+                    else:
+                        raise exc
+                if winner is not None:
+                    return winner
+                if not tasks:
+                    nxt = next(candidates, None)
+                    if nxt is not None:
+                        tasks[asyncio.ensure_future(call(nxt))] = "failover"
+            raise last or CircuitOpen("all LLM endpoints are ejected")
+        finally:
+            for task in tasks:
+                task.cancel()
+            if tasks:
+                results = await asyncio.gather(*tasks, return_exceptions=True)
+                for result in results:
+                    # A loser that finished just before it was cancelled
+                    if discard is not None and not isinstance(result, BaseException):
+                        await discard(result)
+
+    async def agenerate(self, prompt: str, max_tokens: int = 512, temperature: float = 0.2) -> str:
+        async def call(ep: Endpoint) -> str:
+            ep.start()
+            start = time.time()
+            try:
+                answer = await ep.client.agenerate(prompt, max_tokens=max_tokens, temperature=temperature)
+            finally:
+                ep.finish()
+            self._observe(ep, time.time() - start, RESPONSE)
+            return answer
+
+        return await self._race(call, kind=RESPONSE)
+
+    async def astream(
+        self,
+        prompt: str,
+        max_tokens: int = 512,
+        temperature: float = 0.2,
+        stats: Optional[Dict[str, Any]] = None,
+    ) -> AsyncIterator[str]:
+        """Hedges and fails over only until the first token; then it is one stream."""
+
+        async def first_token(ep: Endpoint):
+            ep.start()
+            own_stats: Dict[str, Any] = {}
+            tokens = ep.client.astream(
+                prompt, max_tokens=max_tokens, temperature=temperature, stats=own_stats
+            )
+            start = time.time()
+            try:
+                first = await tokens.__anext__()
+            except StopAsyncIteration:
+                first = None
+            except BaseException:
+                ep.finish()
+                await tokens.aclose()
+                raise
+            self._observe(ep, time.time() - start)
+            return ep, tokens, first, own_stats
+
+        async def discard(opened) -> None:
+            ep, tokens, _, _ = opened
+            try:
+                await tokens.aclose()
+            finally:
+                ep.finish()
+
+        ep, tokens, first, own_stats = await self._race(first_token, discard)
+        try:
+            if first is not None:
+                yield first
+                async for delta in tokens:
+                    yield delta
+        finally:
+            await tokens.aclose()
+            ep.finish()
+        if stats is not None:
+            stats.update(own_stats)
+
+
+# ---------------------------------------------------------------------
+# Factory
+# ---------------------------------------------------------------------
+@dataclass(frozen=True)
+class KServeConfig:
+    endpoints: Tuple[Tuple[str, float], ...]
+    completions_path: str
+    model_id: str
+    api_key: Optional[str] = None
+    timeout_s: int = 300
+    retries: int = 3
+    retry_backoff_s: float = 1.0
+    connect_timeout_s: float = 5.0
+    retry_max_delay_s: float = 20.0
+    breaker_failures: int = 5
+    breaker_reset_s: float = 30.0
+    lb_policy: str = "ewma"
+    hedge: bool = False
+    hedge_quantile: float = 0.95
+    hedge_min_samples: int = 20
+    hedge_max_ratio: float = 0.1
+
+
+def kserve_config_from_env() -> Optional[KServeConfig]:
+    enabled = os.getenv("KSERVE_ENABLED", "false").lower() == "true"
+    if not enabled:
+        return None
+
+    endpoints = tuple(parse_endpoints(os.getenv("KSERVE_BASE_URLS") or ""))
+    if not endpoints:
+        base_url = (os.getenv("KSERVE_BASE_URL") or "").strip()
+        if not base_url:
+            return None
+        endpoints = ((base_url, 1.0),)
+
+    completions_path = (
+        os.getenv("KSERVE_COMPLETIONS_PATH") or "/v1/completions"
+    ).strip()
+
+    model_id = (os.getenv("LLM_MODEL_ID") or "").strip()
+    if not model_id:
+        raise RuntimeError("LLM_MODEL_ID is required when KSERVE_ENABLED=true")
+
+    return KServeConfig(
+        endpoints=endpoints,
+        completions_path=completions_path,
+        model_id=model_id,
+        api_key=(os.getenv("LLM_API_KEY") or "").strip() or None,
+        timeout_s=int(os.getenv("LLM_TIMEOUT_S", "300")),
+        retries=int(os.getenv("LLM_RETRIES", "3")),
+        retry_backoff_s=float(os.getenv("LLM_RETRY_BACKOFF_S", "1")),
+        connect_timeout_s=float(os.getenv("LLM_CONNECT_TIMEOUT_S", "5")),
+        retry_max_delay_s=float(os.getenv("LLM_RETRY_MAX_DELAY_S", "20")),
+        breaker_failures=int(os.getenv("LLM_BREAKER_FAILURES", "5")),
+        breaker_reset_s=float(os.getenv("LLM_BREAKER_RESET_S", "30")),
+        lb_policy=os.getenv("LLM_LB_POLICY", "ewma").strip().lower(),
+        hedge=os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true",
+        hedge_quantile=float(os.getenv("LLM_HEDGE_QUANTILE", "0.95")),
+        hedge_min_samples=int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20")),
+        hedge_max_ratio=float(os.getenv("LLM_HEDGE_MAX_RATIO", "0.1")),
+    )
+
+
+def build_kserve_client(config: KServeConfig):
+    """One KServeClient, or an LLMRouter when several endpoints are configured."""
+    routed = len(config.endpoints) > 1
+
+    def client(base_url: str) -> KServeClient:
+        return KServeClient(
+            base_url=base_url,
+            completions_path=config.completions_path,
+            model_id=config.model_id,
+            api_key=config.api_key,
+            timeout_s=config.timeout_s,
+            retries=config.retries,
+            retry_backoff_s=config.retry_backoff_s,
+            connect_timeout_s=config.connect_timeout_s,
+            retry_max_delay_s=config.retry_max_delay_s,
+            breaker_failures=config.breaker_failures,
+            breaker_reset_s=config.breaker_reset_s,
+            name=endpoint_label(base_url) if routed else None,
+        )
+
+    if not routed:
+        return client(config.endpoints[0][0])
+
+    return LLMRouter(
+        [Endpoint(client(url), weight) for url, weight in config.endpoints],
+        policy=config.lb_policy,
+        hedge=config.hedge,
+        hedge_quantile=config.hedge_quantile,
+        hedge_min_samples=config.hedge_min_samples,
+        hedge_max_ratio=config.hedge_max_ratio,
+    )
+
+
+_kserve_client = None  # KServeClient, or LLMRouter across several replicas
+_kserve_config: Optional[KServeConfig] = None
+_kserve_lock = threading.Lock()
+
+
+def build_kserve_client_from_env():
+    """
+    Factory for inference client.
+
+    Switching between:
+    - in-cluster KServe
+    - external vLLM
+    - several replicas of either (KSERVE_BASE_URLS="url|weight,url,...")
+
+    is done purely via environment variables. The client is cached per
+    process and only rebuilt when that configuration changes; the one it
+    replaces is closed.
+    """
+    global _kserve_client, _kserve_config
+
+    config = kserve_config_from_env()
+    if config == _kserve_config:
+        return _kserve_client
+
+    with _kserve_lock:
+        if config != _kserve_config:
+            # Close first: the new client re-registers any backend it keeps
+            if _kserve_client is not None:
+                _kserve_client.close()
+            _kserve_client, _kserve_config = None, None
+            if config is not None:
+                _kserve_client = build_kserve_client(config)
+            _kserve_config = config
+
+    return _kserve_client
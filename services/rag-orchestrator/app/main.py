@@ -1,27 +1,39 @@
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 from uuid import uuid4
+import json
 import time
 import os
 
-from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse, Response
+from fastapi import Depends, FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 
 from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
 
 from opentelemetry import trace as otel_trace
 from opentelemetry import trace
 
+from .redis_pool import aclose_redis_pools
 from .session import SessionStore
 from .health import readiness, liveness
 from utils.logging import log_request
-from .retriever import build_retriever_from_env
-from .prompt import build_prompt
-from .llm_client import build_kserve_client_from_env
-from .schemas import ChatRequest, ChatResponse
+from .retriever import QdrantRetriever, RetrievedChunk, get_retriever, retriever_config_from_env
+from .prompt import PROMPT_VERSION, assemble_prompt, prompt_budget_from_env
+from .limiter import Overloaded, Slot, build_llm_limiter_from_env
+from .llm_client import aclose_http_clients
+from .llm_router import build_kserve_client_from_env
+from .resilience import BackendUnavailable, DeadlineExceeded, deadline_scope
+from .schemas import ChatRequest, ChatResponse, ChatSource
+from .semantic_cache import CachedAnswer, build_semantic_cache_from_env, make_scope
+from .singleflight import Flight, build_single_flight_from_env, flight_key, normalize_question
 from .metrics import (
     RAG_CHAT_REQUESTS_TOTAL,
     RAG_CHAT_ERRORS_TOTAL,
     RAG_RETRIEVAL_LATENCY_SECONDS,
     RAG_CONTEXT_TOKENS,
+    RAG_PROMPT_TOKENS,
+    RAG_PROMPT_HISTORY_TURNS_TOTAL,
     RAG_EMPTY_CONTEXT_TOTAL,
     RAG_GENERATION_LATENCY_SECONDS,
     RAG_FALLBACK_TOTAL,
@@ -32,14 +44,27 @@ from utils.tracing import setup_tracing
 
 from .guardrails_app import (
     GUARDRAILS_ENABLED,
-    generate_with_guardrails,
+    agenerate_with_guardrails,
 )
 
 # ---------------------------------------------------------------------
 # App bootstrap and tracing
 # ---------------------------------------------------------------------
 
-app = FastAPI(title="Medical RAG Orchestrator")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load + warm the embedding model once per worker, before traffic arrives
+    try:
+        get_retriever()
+    except Exception as e:
+        # Not fatal: the chat dependency retries the build on the next request
+        print(f"[RAG] Retriever warmup failed: {e}")
+    yield
+    await aclose_http_clients()
+    await aclose_redis_pools()
+
+
+app = FastAPI(title="Medical RAG Orchestrator", lifespan=lifespan)
 
 # Initialize OpenTelemetry tracing (FastAPI + outbound clients)
 setup_tracing(
@@ -55,10 +80,82 @@ tracer = trace.get_tracer("rag-orchestrator")
 
 session_store = SessionStore()
 
+# ---------------------------------------------------------------------
+# Semantic answer cache (SEMANTIC_CACHE_ENABLED=true)
+# ---------------------------------------------------------------------
+# Follow-up answers depend on chat history, so by default only the first
+# turn of a session is served from / written to the cache.
+
+semantic_cache = build_semantic_cache_from_env()
+SEMANTIC_CACHE_FIRST_TURN_ONLY = (
+    os.getenv("SEMANTIC_CACHE_FIRST_TURN_ONLY", "true").lower() == "true"
+)
+
+
+# ---------------------------------------------------------------------
+# Request coalescing (SINGLE_FLIGHT_ENABLED=true)
+# ---------------------------------------------------------------------
+# Concurrent first-turn requests for the same question join one retrieval +
+# generation and all receive its answer; with Redis this holds across
+# replicas. Every turn runs as a Flight either way (a private one when
+# coalescing does not apply).
+
+single_flight = build_single_flight_from_env()
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "false").lower() == "true"
+
+
+# ---------------------------------------------------------------------
+# LLM admission control (LLM_LIMITER_ENABLED=true)
+# ---------------------------------------------------------------------
+# Caps concurrent calls to the LLM backend per worker and adapts the cap
+# to its time to first token; requests that cannot start within
+# LLM_QUEUE_TIMEOUT_S are shed with 429/503 + Retry-After instead of piling up.
+
+llm_limiter = build_llm_limiter_from_env()
+
+
+@asynccontextmanager
+async def llm_slot():
+    if llm_limiter is None:
+        yield Slot()
+        return
+    async with llm_limiter.slot() as held:
+        yield held
+
+
+# ---------------------------------------------------------------------
+# Request deadline (RAG_REQUEST_DEADLINE_S, 0 = none)
+# ---------------------------------------------------------------------
+# Bounds LLM retries and backoff for one chat request. Callers with a
+# shorter timeout of their own send it as X-Request-Timeout (seconds), so
+# no work continues after they have given up.
+
+REQUEST_DEADLINE_S = float(os.getenv("RAG_REQUEST_DEADLINE_S", "120"))
+
+
+def request_deadline_s(request: Request) -> Optional[float]:
+    limits = [REQUEST_DEADLINE_S] if REQUEST_DEADLINE_S > 0 else []
+    try:
+        header = float(request.headers.get("X-Request-Timeout", ""))
+        if header > 0:
+            limits.append(header)
+    except ValueError:
+        pass
+    return min(limits) if limits else None
+
 
 # ---------------------------------------------------------------------
 # Global exception handler
 # ---------------------------------------------------------------------
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": "The assistant is busy; please retry shortly."},
+        headers={"Retry-After": str(exc.retry_after_s)},
+    )
+
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     RAG_CHAT_ERRORS_TOTAL.inc()
@@ -128,134 +225,449 @@ async def api_logging_middleware(request: Request, call_next):
     return await call_next(request)
 
 
+# ---------------------------------------------------------------------
+# Chat pipeline (shared by /api/chat and /api/chat/stream)
+# ---------------------------------------------------------------------
+@dataclass
+class ChatTurn:
+    session_id: str
+    history: List[Dict]
+    chunks: List[RetrievedChunk]
+    prompt: str
+    retrieval_ms: float
+    query_vector: Optional[List[float]] = None
+    cache_scope: Optional[str] = None
+    cached: Optional[CachedAnswer] = None
+
+
+async def open_session(req: ChatRequest, request: Request) -> Tuple[str, List[Dict]]:
+    """Record the user message; returns (session_id, history window)."""
+    session_id = req.session_id or str(uuid4())
+    request.state.session_id = session_id
+    otel_trace.get_current_span().set_attribute("session.id", session_id)
+
+    # append user message and load the history window in one round trip
+    with tracer.start_as_current_span("session.append_user") as span:
+        history = await session_store.aappend_and_window(session_id, "user", req.message)
+        span.set_attribute("session.history_length", len(history))
+    return session_id, history
+
+
+async def prepare_turn(
+    req: ChatRequest,
+    request: Request,
+    retriever: Optional[QdrantRetriever],
+    session_id: str,
+    history: List[Dict],
+) -> ChatTurn:
+    """Retrieve context and build the grounded prompt."""
+    # semantic cache: embed once, reuse the vector for retrieval on a miss
+    query_vector = None
+    cache_scope = None
+    first_turn = len(history) <= 1
+    if semantic_cache is not None and retriever is not None and (
+        first_turn or not SEMANTIC_CACHE_FIRST_TURN_ONLY
+    ):
+        with tracer.start_as_current_span("cache.semantic_lookup") as span:
+            query_vector = await retriever.aembed_query(req.message)
+            cache_scope = make_scope(
+                retriever.collection,
+                await retriever.acollection_version(),
+                PROMPT_VERSION,
+                os.getenv("LLM_MODEL_ID", "unknown"),
+            )
+            cached = await semantic_cache.lookup(cache_scope, query_vector)
+            span.set_attribute("cache.hit", cached is not None)
+
+        if cached is not None:
+            request.state.chunks_returned = len(cached.sources)
+            return ChatTurn(
+                session_id=session_id,
+                history=history,
+                chunks=[],
+                prompt="",
+                retrieval_ms=0.0,
+                cached=cached,
+            )
+
+    # retrieve context
+    with tracer.start_as_current_span("retrieval.vector_search") as span:
+        span.set_attribute("vector.db", "qdrant")
+        span.set_attribute(
+            "vector.collection",
+            os.getenv("QDRANT_COLLECTION", "medical_docs"),
+        )
+        span.set_attribute(
+            "vector.top_k",
+            int(os.getenv("RAG_TOP_K", "4")),
+        )
+
+        t0 = time.time()
+        chunks = (
+            await retriever.aretrieve(req.message, query_vector=query_vector)
+            if retriever
+            else []
+        )
+        retrieval_ms = round((time.time() - t0) * 1000.0, 2)
+
+        span.set_attribute("retrieval.chunks", len(chunks))
+
+    RAG_RETRIEVAL_LATENCY_SECONDS.observe(retrieval_ms / 1000.0)
+    request.state.retrieval_ms = retrieval_ms
+    request.state.chunks_returned = len(chunks)
+
+    if not chunks:
+        RAG_EMPTY_CONTEXT_TOTAL.inc()
+
+    # build grounded prompt within the model's token budget + trace
+    with tracer.start_as_current_span("prompt.build") as span:
+        assembled = assemble_prompt(
+            req.message,
+            chunks,
+            chat_history=history,
+            budget=prompt_budget_from_env(),
+        )
+        span.set_attribute("prompt.history_turns", len(history))
+        span.set_attribute("prompt.history_compacted", assembled.turns_compacted)
+        span.set_attribute("prompt.history_dropped", assembled.turns_dropped)
+        span.set_attribute("prompt.context_chunks", len(assembled.chunks))
+        span.set_attribute("prompt.tokens", assembled.tokens)
+
+    RAG_CONTEXT_TOKENS.observe(assembled.context_tokens)
+    RAG_PROMPT_TOKENS.observe(assembled.tokens)
+    if assembled.turns_compacted:
+        RAG_PROMPT_HISTORY_TURNS_TOTAL.labels(action="compacted").inc(assembled.turns_compacted)
+    if assembled.turns_dropped:
+        RAG_PROMPT_HISTORY_TURNS_TOTAL.labels(action="dropped").inc(assembled.turns_dropped)
+    # Sources are the chunks the model actually saw
+    chunks = assembled.chunks
+    request.state.chunks_returned = len(chunks)
+
+    return ChatTurn(
+        session_id=session_id,
+        history=history,
+        chunks=chunks,
+        prompt=assembled.text,
+        retrieval_ms=retrieval_ms,
+        query_vector=query_vector,
+        cache_scope=cache_scope,
+    )
+
+
+def source_dicts(chunks: List[RetrievedChunk]) -> List[Dict[str, Any]]:
+    return [
+        ChatSource(
+            id=c.id, score=c.score, rerank_score=c.rerank_score, metadata=c.metadata
+        ).model_dump()
+        for c in chunks
+    ]
+
+
+async def remember_answer(turn: ChatTurn, answer: str) -> None:
+    if semantic_cache is None or turn.cache_scope is None or turn.query_vector is None:
+        return
+    with tracer.start_as_current_span("cache.semantic_store"):
+        await semantic_cache.store(
+            turn.cache_scope,
+            turn.query_vector,
+            answer,
+            sources=source_dicts(turn.chunks),
+        )
+
+
+def fallback_answer(
+    chunks: List[RetrievedChunk],
+    note: Optional[str] = None,
+) -> str:
+    RAG_FALLBACK_TOTAL.inc()
+    note = note or "Configure KSERVE_URL for full generation."
+    if chunks:
+        return (
+            "General information based on available context:\n\n"
+            + "\n\n".join(
+                f"- {c.text} [source:{c.id}]"
+                for c in chunks[:3]
+            )
+            + f"\n\n({note})"
+        )
+    return (
+        "I don't have enough context. "
+        "Ingest documents into Qdrant first."
+    )
+
+
+# Served while the LLM backend is down (circuit open or retries exhausted);
+# never written to the semantic cache
+BACKEND_DOWN_NOTE = "The language model is temporarily unavailable; showing retrieved passages."
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+# What the browser sees of a failed stream; the exception itself (hostnames,
+# URLs, driver messages) only goes to the server log
+_STREAM_ERRORS: Tuple[Tuple[type, str, str], ...] = (
+    (DeadlineExceeded, "deadline_exceeded", "the answer took too long"),
+    (BackendUnavailable, "backend_unavailable", "the language model is unavailable"),
+)
+
+
+def _stream_error(exc: BaseException) -> Dict[str, str]:
+    for exc_type, code, detail in _STREAM_ERRORS:
+        if isinstance(exc, exc_type):
+            return {"code": code, "detail": detail}
+    return {"code": "internal_error", "detail": "generation failed"}
+
+
+# ---------------------------------------------------------------------
+# Generation (runs as a Flight producer, see singleflight.py)
+# ---------------------------------------------------------------------
+async def run_turn(
+    flight: Flight,
+    req: ChatRequest,
+    request: Request,
+    retriever: Optional[QdrantRetriever],
+    session_id: str,
+    history: List[Dict],
+    stream: bool,
+) -> Dict[str, Any]:
+    """
+    Retrieve, then generate into `flight` (token by token when `stream`).
+    Admission (the LLM slot) is signalled with flight.admit() so that
+    streaming responses only start once the request is past shedding.
+    """
+    turn = await prepare_turn(req, request, retriever, session_id, history)
+    if turn.cached is not None:
+        # Semantic cache hit: no LLM call at all
+        await flight.set_sources(turn.cached.sources)
+        flight.admit()
+        await flight.publish(turn.cached.answer)
+        return {"cached": True, "retrieval_ms": 0.0, "llm_ms": 0.0}
+
+    await flight.set_sources(source_dicts(turn.chunks))
+    stats: Dict[str, Any] = {}
+    generated = False
+    kserve = build_kserve_client_from_env()
+
+    with tracer.start_as_current_span("llm.inference_stream" if stream else "llm.inference") as span:
+        span.set_attribute(
+            "llm.model",
+            os.getenv("LLM_MODEL_ID", "unknown"),
+        )
+        g0 = time.time()
+
+        if kserve is None or kserve.is_down:
+            # No backend configured, or known down: answer now, don't queue for a slot
+            if kserve is not None:
+                span.set_attribute("llm.circuit_open", True)
+            flight.admit()
+            await flight.publish(
+                fallback_answer(turn.chunks, BACKEND_DOWN_NOTE if kserve is not None else None)
+            )
+        elif GUARDRAILS_ENABLED:
+            # Check prompt before send; guardrails produce the answer in one piece
+            with tracer.start_as_current_span("guardrails.evaluate") as g_span:
+                g_span.set_attribute("llm.provider", "nemo_guardrails")
+                try:
+                    async with llm_slot():
+                        flight.admit()
+                        answer = await agenerate_with_guardrails(
+                            user_message=req.message,
+                            grounded_prompt=turn.prompt,
+                        )
+                    generated = True
+                except BackendUnavailable as exc:
+                    g_span.record_exception(exc)
+                    answer = fallback_answer(turn.chunks, BACKEND_DOWN_NOTE)
+            await flight.publish(answer)
+        else:
+            span.set_attribute("llm.provider", "kserve")
+            max_tokens = int(os.getenv("LLM_MAX_TOKENS", "512"))
+            temperature = float(os.getenv("LLM_TEMPERATURE", "0.2"))
+            try:
+                async with llm_slot() as held:
+                    flight.admit()
+                    if stream:
+                        async for delta in kserve.astream(
+                            turn.prompt,
+                            max_tokens=max_tokens,
+                            temperature=temperature,
+                            stats=stats,
+                        ):
+                            held.first_token()
+                            await flight.publish(delta)
+                    else:
+                        await flight.publish(await kserve.agenerate(
+                            turn.prompt,
+                            max_tokens=max_tokens,
+                            temperature=temperature,
+                        ))
+                generated = True
+            except BackendUnavailable as exc:
+                if flight.parts:
+                    raise
+                # Nothing sent yet (a stream only raises this before its first token)
+                span.record_exception(exc)
+                await flight.publish(fallback_answer(turn.chunks, BACKEND_DOWN_NOTE))
+        llm_s = time.time() - g0
+
+    RAG_GENERATION_LATENCY_SECONDS.observe(llm_s)
+    if generated:
+        await remember_answer(turn, flight.answer)
+    return {
+        "cached": False,
+        "usage": stats.get("usage") or {},
+        "retrieval_ms": turn.retrieval_ms,
+        "llm_ms": round(llm_s * 1000.0, 2),
+        # Only real generations are handed to other replicas
+        "shareable": generated,
+    }
+
+
+def coalesce_key(req: ChatRequest, history: List[Dict]) -> Optional[str]:
+    """
+    Identical history-free questions under the same retrieval, prompt and
+    model settings get one answer; None = this request runs on its own.
+    """
+    if not SINGLE_FLIGHT_ENABLED or len(history) > 1:
+        return None
+    return flight_key(
+        normalize_question(req.message),
+        repr(retriever_config_from_env()),
+        PROMPT_VERSION,
+        os.getenv("LLM_MODEL_ID", "unknown"),
+        os.getenv("LLM_MAX_TOKENS", "512"),
+        os.getenv("LLM_TEMPERATURE", "0.2"),
+        GUARDRAILS_ENABLED,
+    )
+
+
+def start_flight(
+    req: ChatRequest,
+    request: Request,
+    retriever: Optional[QdrantRetriever],
+    session_id: str,
+    history: List[Dict],
+    stream: bool,
+) -> Tuple[Flight, bool]:
+    async def produce(flight: Flight) -> Dict[str, Any]:
+        return await run_turn(flight, req, request, retriever, session_id, history, stream)
+
+    flight, joined = single_flight.start(produce, coalesce_key(req, history))
+    otel_trace.get_current_span().set_attribute("singleflight.joined", joined)
+    return flight, joined
+
+
 # ---------------------------------------------------------------------
 # Chat endpoint
 # ---------------------------------------------------------------------
 @app.post("/api/chat", response_model=ChatResponse)
-def chat(req: ChatRequest, request: Request):
+async def chat(
+    req: ChatRequest,
+    request: Request,
+    retriever: Optional[QdrantRetriever] = Depends(get_retriever),
+):
     RAG_CHAT_REQUESTS_TOTAL.inc()
     RAG_INFLIGHT.inc()
     try:
         # Root span for this chat request
-        with tracer.start_as_current_span("rag.chat") as root_span:
-            session_id = req.session_id or str(uuid4())
-            request.state.session_id = session_id
-            root_span.set_attribute("session.id", session_id)
-
-            # append user message + trace
-            with tracer.start_as_current_span("session.append_user"):
-                session_store.append(session_id, "user", req.message)
-
-            # load chat history + trace
-            with tracer.start_as_current_span("session.load_history") as span:
-                history = session_store.get_history(session_id)
-                span.set_attribute("session.history_length", len(history))
-
-            # retrieve context
-            with tracer.start_as_current_span("retriever.build"):
-                retriever = build_retriever_from_env()
-
-            with tracer.start_as_current_span("retrieval.vector_search") as span:
-                span.set_attribute("vector.db", "qdrant")
-                span.set_attribute(
-                    "vector.collection",
-                    os.getenv("QDRANT_COLLECTION", "medical_docs"),
-                )
-                span.set_attribute(
-                    "vector.top_k",
-                    int(os.getenv("RAG_TOP_K", "4")),
-                )
-
-                t0 = time.time()
-                chunks = retriever.retrieve(req.message) if retriever else []
-                retrieval_ms = round((time.time() - t0) * 1000.0, 2)
-
-                span.set_attribute("retrieval.chunks", len(chunks))
-
-            RAG_RETRIEVAL_LATENCY_SECONDS.observe(retrieval_ms / 1000.0)
-            request.state.retrieval_ms = retrieval_ms
-            request.state.chunks_returned = len(chunks)
-
-            # estimate context tokens (simple heuristic; consistent with retriever)
-            est_tokens = sum(max(1, len(c.text) // 4) for c in chunks)
-            RAG_CONTEXT_TOKENS.observe(est_tokens)
-
-            if not chunks:
-                RAG_EMPTY_CONTEXT_TOTAL.inc()
-
-            # build grounded prompt + trace
-            with tracer.start_as_current_span("prompt.build") as span:
-                span.set_attribute("prompt.history_turns", len(history))
-                span.set_attribute("prompt.context_chunks", len(chunks))
-                prompt = build_prompt(
-                    req.message,
-                    chunks,
-                    chat_history=history,
-                )
-                
-            with tracer.start_as_current_span("llm.inference") as span:
-                span.set_attribute(
-                    "llm.model",
-                    os.getenv("LLM_MODEL_ID", "unknown"),
-                )
-                g0 = time.time()
-
-                # Check prompt before send
-                if GUARDRAILS_ENABLED:
-                    with tracer.start_as_current_span("guardrails.evaluate") as span:
-                        span.set_attribute("llm.provider", "nemo_guardrails")
-                        answer = generate_with_guardrails(
-                        user_message=req.message,
-                        grounded_prompt=prompt,
-                    )
-                else:
-                    span.set_attribute("llm.provider", "kserve")
-                    kserve = build_kserve_client_from_env()
-
-                    if kserve:
-                        max_tokens = int(os.getenv("LLM_MAX_TOKENS", "512"))
-                        temperature = float(os.getenv("LLM_TEMPERATURE", "0.2"))
-                        answer = kserve.generate(
-                            prompt,
-                            max_tokens=max_tokens,
-                            temperature=temperature,
-                        )
-                    else:
-                        # existing fallback path
-                        RAG_FALLBACK_TOTAL.inc()
-                        if chunks:
-                            answer = (
-                                "General information based on available context:\n\n"
-                                + "\n\n".join(
-                                    f"- {c.text} [source:{c.id}]"
-                                    for c in chunks[:3]
-                                )
-                                + "\n\n(Configure KSERVE_URL for full generation.)"
-                            )
-                        else:
-                            answer = (
-                                "I don't have enough context. "
-                                "Ingest documents into Qdrant first."
-                            )
-                llm_ms = round((time.time() - g0) * 1000.0, 2)
-
-            # generate answer
-            kserve = build_kserve_client_from_env()
-
-            RAG_GENERATION_LATENCY_SECONDS.observe(llm_ms / 1000.0)
-            request.state.llm_ms = llm_ms
-
-            # append assistant response
-            session_store.append(session_id, "assistant", answer)
-
-            # reload full history
-            history = session_store.get_history(session_id)
+        with tracer.start_as_current_span("rag.chat"), deadline_scope(request_deadline_s(request)):
+            session_id, history = await open_session(req, request)
+            flight, joined = start_flight(req, request, retriever, session_id, history, stream=False)
+            try:
+                answer = await flight.result()
+            finally:
+                flight.leave()
+
+            context_used = len(flight.sources or [])
+            request.state.chunks_returned = context_used
+            request.state.llm_ms = 0.0 if joined else flight.meta.get("llm_ms", 0.0)
+
+            # append assistant response; returns the updated history window
+            history = await session_store.aappend_and_window(
+                session_id, "assistant", answer
+            )
 
             return ChatResponse(
                 session_id=session_id,
                 answer=answer,
                 history=history,
-                context_used=len(chunks),
+                context_used=context_used,
             )
     finally:
         RAG_INFLIGHT.dec()
+
+
+# ---------------------------------------------------------------------
+# Streaming chat endpoint (Server-Sent Events)
+# ---------------------------------------------------------------------
+# Event order:
+#   sources -> {session_id, context_used, sources: [ChatSource]}
+#   token   -> {text}                       (repeated)
+#   done    -> {usage, timings, cached, coalesced}     (or `error` -> {detail})
+@app.post("/api/chat/stream")
+async def chat_stream(
+    req: ChatRequest,
+    request: Request,
+    retriever: Optional[QdrantRetriever] = Depends(get_retriever),
+):
+    RAG_CHAT_REQUESTS_TOTAL.inc()
+    RAG_INFLIGHT.inc()
+    try:
+        with tracer.start_as_current_span("rag.chat_stream"), deadline_scope(request_deadline_s(request)):
+            session_id, history = await open_session(req, request)
+            flight, joined = start_flight(req, request, retriever, session_id, history, stream=True)
+        try:
+            # Wait for the LLM slot before responding, so a shed request still
+            # gets a real 429/503 status instead of an error event mid-stream
+            await flight.admitted()
+        except BaseException:
+            flight.leave()
+            raise
+    except BaseException:
+        RAG_INFLIGHT.dec()
+        raise
+
+    async def events() -> AsyncIterator[str]:
+        g0 = time.time()
+        ttft_ms = None
+        try:
+            sources = flight.sources or []
+            yield _sse("sources", {
+                "session_id": session_id,
+                "context_used": len(sources),
+                "sources": sources,
+            })
+
+            async for delta in flight.tokens():
+                if ttft_ms is None:
+                    ttft_ms = round((time.time() - g0) * 1000.0, 2)
+                yield _sse("token", {"text": delta})
+
+            yield _sse("done", {
+                "usage": flight.meta.get("usage") or {},
+                "cached": bool(flight.meta.get("cached")),
+                "coalesced": joined or bool(flight.meta.get("coalesced")),
+                "timings": {
+                    "retrieval_ms": flight.meta.get("retrieval_ms", 0.0),
+                    "ttft_ms": ttft_ms,
+                    "llm_ms": round((time.time() - g0) * 1000.0, 2),
+                },
+            })
+        except Exception as exc:
+            RAG_CHAT_ERRORS_TOTAL.inc()
+            print(f"[RAG] Stream failed: {type(exc).__name__}: {exc}")
+            yield _sse("error", _stream_error(exc))
+        finally:
+            # Persist whatever was generated, even if the client went away
+            flight.leave()
+            if flight.parts:
+                await session_store.aappend(session_id, "assistant", flight.answer)
+            RAG_INFLIGHT.dec()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -22,10 +22,22 @@ RAG_RETRIEVAL_LATENCY_SECONDS = Histogram(
 
 RAG_CONTEXT_TOKENS = Histogram(
     "rag_context_tokens",
-    "Estimated tokens included in the retrieved context",
+    "Tokens of retrieved context included in the prompt",
     buckets=(0, 128, 256, 512, 1024, 1536, 2048, 3072, 4096, 8192),
 )
 
+RAG_PROMPT_TOKENS = Histogram(
+    "rag_prompt_tokens",
+    "Prompt tokens sent for generation (system rules + history + question + context)",
+    buckets=(128, 256, 512, 1024, 1536, 2048, 3072, 4096, 6144, 8192, 16384),
+)
+
+RAG_PROMPT_HISTORY_TURNS_TOTAL = Counter(
+    "rag_prompt_history_turns_total",
+    "History messages cut short (compacted) or left out (dropped) to fit the prompt budget",
+    ["action"],
+)
+
 RAG_EMPTY_CONTEXT_TOTAL = Counter(
     "rag_empty_context_total",
     "Number of times retrieval produced no usable context",
@@ -48,3 +60,104 @@ RAG_INFLIGHT = Gauge(
     "rag_inflight_requests",
     "Number of in-flight /api/chat requests",
 )
+
+# --- Semantic answer cache ---
+RAG_SEMANTIC_CACHE_REQUESTS_TOTAL = Counter(
+    "rag_semantic_cache_requests_total",
+    "Semantic cache lookups by result (hit/miss) and tier (front/redis/none)",
+    ["result", "tier"],
+)
+
+RAG_SEMANTIC_CACHE_SIMILARITY = Histogram(
+    "rag_semantic_cache_similarity",
+    "Best cosine similarity found per semantic cache lookup",
+    buckets=(0.5, 0.7, 0.8, 0.85, 0.9, 0.92, 0.94, 0.96, 0.98, 0.99, 1.0),
+)
+
+# --- Exact-match retrieval caches (query vector / search results) ---
+RAG_RETRIEVAL_CACHE_REQUESTS_TOTAL = Counter(
+    "rag_retrieval_cache_requests_total",
+    "Exact-match retrieval cache lookups by cache (embedding/search) and result",
+    ["cache", "result"],
+)
+
+RAG_RETRIEVAL_CACHE_BYTES = Gauge(
+    "rag_retrieval_cache_bytes",
+    "Approximate bytes held by each exact-match retrieval cache",
+    ["cache"],
+)
+
+# --- Query embedding micro-batching ---
+RAG_EMBED_BATCH_SIZE = Histogram(
+    "rag_embed_batch_size",
+    "Distinct queries embedded per coalesced model call",
+    buckets=(1, 2, 4, 8, 16, 32, 64),
+)
+
+RAG_EMBED_BATCH_WAIT_SECONDS = Histogram(
+    "rag_embed_batch_wait_seconds",
+    "Time a query waited in the embedding batch window",
+    buckets=(0.0005, 0.001, 0.002, 0.003, 0.005, 0.01, 0.025, 0.05, 0.1),
+)
+
+# --- Shared Redis connection pools (sync / async) ---
+RAG_REDIS_POOL_CONNECTIONS = Gauge(
+    "rag_redis_pool_connections",
+    "Redis pool connections by pool (sync/async) and state (in_use/idle)",
+    ["pool", "state"],
+)
+
+RAG_REDIS_POOL_MAX_CONNECTIONS = Gauge(
+    "rag_redis_pool_max_connections",
+    "Configured Redis pool size (REDIS_MAX_CONNECTIONS)",
+    ["pool"],
+)
+
+# --- Cross-encoder reranking ---
+RAG_RERANK_LATENCY_SECONDS = Histogram(
+    "rag_rerank_latency_seconds",
+    "Cross-encoder forward pass time per query (uncached candidates only)",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.15, 0.2, 0.3, 0.5, 1, 2),
+)
+
+RAG_RERANK_TOTAL = Counter(
+    "rag_rerank_total",
+    "Rerank outcomes (reranked / skipped_budget / error)",
+    ["result"],
+)
+
+# --- LLM admission control (adaptive concurrency limit) ---
+RAG_LLM_CONCURRENCY_LIMIT = Gauge(
+    "rag_llm_concurrency_limit",
+    "Current adaptive limit on concurrent LLM calls (per worker)",
+)
+
+RAG_LLM_INFLIGHT = Gauge(
+    "rag_llm_inflight",
+    "LLM calls currently holding a concurrency slot",
+)
+
+RAG_LLM_QUEUE_DEPTH = Gauge(
+    "rag_llm_queue_depth",
+    "Requests waiting for an LLM concurrency slot",
+)
+
+RAG_LLM_QUEUE_WAIT_SECONDS = Histogram(
+    "rag_llm_queue_wait_seconds",
+    "Time spent waiting for an LLM concurrency slot (0 when admitted at once)",
+    buckets=(0, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10),
+)
+
+RAG_LLM_SHED_TOTAL = Counter(
+    "rag_llm_shed_total",
+    "Requests rejected before reaching the LLM (queue_full -> 429, queue_timeout -> 503)",
+    ["reason"],
+)
+
+# --- Request coalescing (single-flight) ---
+RAG_SINGLEFLIGHT_TOTAL = Counter(
+    "rag_singleflight_total",
+    "Coalescable chat turns by role: leader (ran the pipeline), follower "
+    "(joined one in this worker), remote (served another replica's result)",
+    ["role"],
+)
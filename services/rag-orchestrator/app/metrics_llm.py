@@ -1,5 +1,5 @@
 # metrics_llm.py
-from prometheus_client import Counter, Histogram
+from prometheus_client import Counter, Gauge, Histogram
 
 LLM_REQUESTS_TOTAL = Counter(
     "llm_requests_total",
@@ -25,3 +25,40 @@ LLM_COMPLETION_TOKENS_TOTAL = Counter(
     "Total completion tokens generated by the LLM",
     ["model"],
 )
+
+LLM_RETRIES_TOTAL = Counter(
+    "llm_retries_total",
+    "LLM call attempts that were retried, by reason (status code or error class)",
+    ["backend", "reason"],
+)
+
+LLM_CIRCUIT_STATE = Gauge(
+    "llm_circuit_state",
+    "LLM backend circuit breaker state (0 = closed, 1 = half-open, 2 = open)",
+    ["backend"],
+)
+
+LLM_CIRCUIT_REJECTED_TOTAL = Counter(
+    "llm_circuit_rejected_total",
+    "LLM calls failed fast because the circuit breaker was open",
+    ["backend"],
+)
+
+LLM_ENDPOINT_INFLIGHT = Gauge(
+    "llm_endpoint_inflight",
+    "LLM calls currently outstanding per routed endpoint",
+    ["backend"],
+)
+
+LLM_ENDPOINT_TTFB_SECONDS = Histogram(
+    "llm_endpoint_ttfb_seconds",
+    "Time to first token of streamed calls per routed endpoint",
+    ["backend"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60),
+)
+
+LLM_HEDGED_TOTAL = Counter(
+    "llm_hedged_total",
+    "Hedged LLM calls by which attempt answered first",
+    ["winner"],  # primary | hedge
+)
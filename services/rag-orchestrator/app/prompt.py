@@ -1,6 +1,13 @@
 from __future__ import annotations
-from typing import List
+import os
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
 from .retriever import RetrievedChunk
+from .tokenizer import get_tokenizer
+
+# Bump whenever SYSTEM_RULES or the template below change; cached answers
+# are scoped by this version.
+PROMPT_VERSION = "2"
 
 SYSTEM_RULES = """You are a medical question-answering assistant.
 Rules:
@@ -10,14 +17,54 @@ Rules:
 4) Add citations like [source:<id>].
 """
 
-def build_prompt(question: str, chunks: List[RetrievedChunk], chat_history: list | None = None) -> str:
-    history = ""
-    if chat_history:
-        last = chat_history[-6:]
-        history = "\n".join([f"{m.get('role','').upper()}: {m.get('content','')}" for m in last])
+# Session messages considered for CHAT_HISTORY (newest last)
+HISTORY_MESSAGES = 6
+# A truncated chunk shorter than this is more noise than evidence
+MIN_PARTIAL_CHUNK_TOKENS = 64
+ELLIPSIS = " ..."
+
+
+@dataclass(frozen=True)
+class PromptBudget:
+    """
+    Token budget for one prompt. Whatever the model context leaves after the
+    reserved answer tokens is split as: system rules + question first, then
+    history (capped), then retrieved context.
+    """
+    context_window: int = 4096  # serving model's max_model_len
+    max_output_tokens: int = 512  # reserved for the answer
+    overhead_tokens: int = 32  # chat template + special tokens
+    history_max_tokens: int = 512
+    history_full_turns: int = 2  # newest messages kept verbatim
+    compact_turn_tokens: int = 64  # older messages are cut to this
+
+    @property
+    def prompt_tokens(self) -> int:
+        return max(0, self.context_window - self.max_output_tokens - self.overhead_tokens)
+
 
-    context = "NO_CONTEXT" if not chunks else "\n\n".join([f"[source:{c.id}] {c.text}" for c in chunks])
+def prompt_budget_from_env() -> PromptBudget:
+    return PromptBudget(
+        context_window=int(os.getenv("LLM_CONTEXT_WINDOW", "4096")),
+        max_output_tokens=int(os.getenv("LLM_MAX_TOKENS", "512")),
+        history_max_tokens=int(os.getenv("PROMPT_HISTORY_MAX_TOKENS", "512")),
+        history_full_turns=int(os.getenv("PROMPT_HISTORY_FULL_TURNS", "2")),
+        compact_turn_tokens=int(os.getenv("PROMPT_HISTORY_TURN_TOKENS", "64")),
+    )
 
+
+@dataclass
+class AssembledPrompt:
+    text: str
+    chunks: List[RetrievedChunk] = field(default_factory=list)  # context actually included
+    tokens: int = 0
+    context_tokens: int = 0
+    history_tokens: int = 0
+    turns_compacted: int = 0
+    turns_dropped: int = 0
+
+
+def _render(history: str, question: str, context: str) -> str:
     return f"""{SYSTEM_RULES}
 
 CHAT_HISTORY:
@@ -30,3 +77,116 @@ CONTEXT:
 {context}
 
 Answer concisely. Include citations like [source:abc]."""
+
+
+def _compact_history(
+    question: str,
+    chat_history: list,
+    budget: int,
+    full_turns: int,
+    turn_tokens: int,
+    tokenizer,
+) -> Tuple[List[str], int, int, int]:
+    """
+    Newest-first: the last `full_turns` messages verbatim, older ones cut to
+    `turn_tokens`; the oldest are dropped once `budget` runs out.
+    Returns (lines in chronological order, tokens, compacted, dropped).
+    """
+    messages = list(chat_history[-HISTORY_MESSAGES:])
+    # The session already holds the current question; QUESTION carries it
+    if messages and messages[-1].get("role") == "user" and messages[-1].get("content") == question:
+        messages.pop()
+
+    lines: List[str] = []
+    used = compacted = 0
+    for age, m in enumerate(reversed(messages)):
+        label = f"{m.get('role', '').upper()}: "
+        content = m.get("content", "")
+        label_tokens = tokenizer.count(label)
+        left = budget - used - label_tokens
+        cap = left if age < full_turns else min(left, turn_tokens)
+        if cap <= 0:
+            break
+        tokens = tokenizer.count(content)
+        if tokens > cap:
+            content = tokenizer.truncate(content, cap) + ELLIPSIS
+            tokens = cap
+            compacted += 1
+        lines.append(label + content)
+        used += label_tokens + tokens
+
+    dropped = len(messages) - len(lines)
+    return lines[::-1], used, compacted, dropped
+
+
+def assemble_prompt(
+    question: str,
+    chunks: List[RetrievedChunk],
+    chat_history: list | None = None,
+    budget: Optional[PromptBudget] = None,
+    tokenizer=None,
+) -> AssembledPrompt:
+    """
+    Build the grounded prompt within `budget`, counting with the serving
+    model's tokenizer. Context chunks are kept in rank order while they fit;
+    the first one that does not is truncated (if enough room is left) and
+    the rest are dropped.
+    """
+    budget = budget or PromptBudget()
+    tokenizer = tokenizer or get_tokenizer()
+
+    fixed = tokenizer.count(_render("", question, "NO_CONTEXT"))
+    if fixed > budget.prompt_tokens:
+        # A pasted wall of text as the question: keep its head, leave room for context
+        question = tokenizer.truncate(question, budget.prompt_tokens // 2) + ELLIPSIS
+        fixed = tokenizer.count(_render("", question, "NO_CONTEXT"))
+    available = max(0, budget.prompt_tokens - fixed)
+
+    lines, history_tokens, compacted, dropped = _compact_history(
+        question,
+        chat_history or [],
+        min(budget.history_max_tokens, available // 2),
+        budget.history_full_turns,
+        budget.compact_turn_tokens,
+        tokenizer,
+    )
+
+    left = available - history_tokens
+    entries = [f"[source:{c.id}] {c.text}" for c in chunks]
+    parts: List[str] = []
+    used_chunks: List[RetrievedChunk] = []
+    context_tokens = 0
+    for c, entry, tokens in zip(chunks, entries, tokenizer.count_many(entries)):
+        tokens += 1  # "\n\n" separator
+        if tokens <= left - context_tokens:
+            parts.append(entry)
+        elif left - context_tokens >= MIN_PARTIAL_CHUNK_TOKENS:
+            tokens = left - context_tokens
+            parts.append(tokenizer.truncate(entry, tokens - 1) + ELLIPSIS)
+        else:
+            break
+        used_chunks.append(c)
+        context_tokens += tokens
+        if context_tokens >= left:
+            break
+
+    context = "\n\n".join(parts) if parts else "NO_CONTEXT"
+    return AssembledPrompt(
+        text=_render("\n".join(lines), question, context),
+        chunks=used_chunks,
+        tokens=fixed + history_tokens + context_tokens,
+        context_tokens=context_tokens,
+        history_tokens=history_tokens,
+        turns_compacted=compacted,
+        turns_dropped=dropped,
+    )
+
+
+def build_prompt(
+    question: str,
+    chunks: List[RetrievedChunk],
+    chat_history: list | None = None,
+    budget: Optional[PromptBudget] = None,
+    tokenizer=None,
+) -> str:
+    return assemble_prompt(question, chunks, chat_history, budget, tokenizer).text
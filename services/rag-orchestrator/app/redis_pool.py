@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import redis
+import redis.asyncio as aioredis
+
+from .metrics import RAG_REDIS_POOL_CONNECTIONS, RAG_REDIS_POOL_MAX_CONNECTIONS
+
+# ---------------------------------------------------------------------
+# Shared Redis connection pools
+# ---------------------------------------------------------------------
+# One sync and one async pool per worker, shared by the session store, the
+# semantic cache and anything else that talks to Redis. Pools are created on
+# first use, so importing a module never opens a socket. Both are blocking
+# pools: when every connection is busy a caller waits up to
+# REDIS_POOL_TIMEOUT_S for one instead of failing immediately.
+
+_sync_pool: Optional[redis.BlockingConnectionPool] = None
+_async_pool: Optional[aioredis.BlockingConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def redis_configured() -> bool:
+    if os.getenv("REDIS_ENABLED", "true").lower() != "true":
+        return False
+    return bool(os.getenv("REDIS_URL") or os.getenv("REDIS_HOST"))
+
+
+def _pool_kwargs() -> Tuple[Optional[str], Dict[str, Any]]:
+    kwargs: Dict[str, Any] = {
+        "max_connections": int(os.getenv("REDIS_MAX_CONNECTIONS", "32")),
+        "timeout": float(os.getenv("REDIS_POOL_TIMEOUT_S", "1.0")),
+        "socket_timeout": float(os.getenv("REDIS_SOCKET_TIMEOUT_S", "1.0")),
+        "socket_connect_timeout": float(os.getenv("REDIS_CONNECT_TIMEOUT_S", "1.0")),
+        "health_check_interval": int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL_S", "30")),
+        "decode_responses": True,
+    }
+    url = os.getenv("REDIS_URL")
+    if not url:
+        kwargs["host"] = os.getenv("REDIS_HOST")
+        kwargs["port"] = int(os.getenv("REDIS_PORT", "6379"))
+        kwargs["db"] = int(os.getenv("REDIS_DB", "0"))
+    return url, kwargs
+
+
+def _build_pool(pool_cls, url: Optional[str], kwargs: Dict[str, Any]):
+    if url:
+        return pool_cls.from_url(url, **kwargs)
+    return pool_cls(**kwargs)
+
+
+def _pool_usage(pool) -> Tuple[int, int]:
+    """
+    (in_use, idle) connection counts for a redis-py pool. These are private
+    redis-py attributes, so every read has a default: a redis-py upgrade that
+    renames them reports (0, 0) instead of failing the metrics scrape.
+    """
+    in_use = getattr(pool, "_in_use_connections", None)
+    if in_use is not None:
+        return len(in_use), len(getattr(pool, "_available_connections", ()))
+    # sync BlockingConnectionPool: idle connections sit in the queue, the
+    # remaining slots are None placeholders for not-yet-created connections
+    created = len(getattr(pool, "_connections", ()))
+    queue = getattr(getattr(pool, "pool", None), "queue", ())
+    idle = sum(1 for c in list(queue) if c is not None)
+    return max(0, created - idle), idle
+
+
+def _register_metrics(name: str, pool) -> None:
+    RAG_REDIS_POOL_MAX_CONNECTIONS.labels(pool=name).set(pool.max_connections)
+    RAG_REDIS_POOL_CONNECTIONS.labels(pool=name, state="in_use").set_function(
+        lambda: _pool_usage(pool)[0]
+    )
+    RAG_REDIS_POOL_CONNECTIONS.labels(pool=name, state="idle").set_function(
+        lambda: _pool_usage(pool)[1]
+    )
+
+
+def get_redis() -> Optional[redis.Redis]:
+    """Sync client over the shared pool, or None when Redis is not configured."""
+    global _sync_pool
+    if not redis_configured():
+        return None
+    with _pool_lock:
+        if _sync_pool is None:
+            url, kwargs = _pool_kwargs()
+            _sync_pool = _build_pool(redis.BlockingConnectionPool, url, kwargs)
+            _register_metrics("sync", _sync_pool)
+    return redis.Redis(connection_pool=_sync_pool)
+
+
+def get_async_redis() -> Optional[aioredis.Redis]:
+    """Async client over the shared pool, or None when Redis is not configured."""
+    global _async_pool
+    if not redis_configured():
+        return None
+    with _pool_lock:
+        if _async_pool is None:
+            url, kwargs = _pool_kwargs()
+            _async_pool = _build_pool(aioredis.BlockingConnectionPool, url, kwargs)
+            _register_metrics("async", _async_pool)
+    return aioredis.Redis(connection_pool=_async_pool)
+
+
+async def aclose_redis_pools() -> None:
+    global _sync_pool, _async_pool
+    with _pool_lock:
+        sync_pool, _sync_pool = _sync_pool, None
+        async_pool, _async_pool = _async_pool, None
+    if async_pool is not None:
+        await async_pool.disconnect()
+    if sync_pool is not None:
+        sync_pool.disconnect()
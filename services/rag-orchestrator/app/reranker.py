@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import time
+from typing import Dict, List, Optional, Sequence
+
+from fastembed.rerank.cross_encoder import TextCrossEncoder
+
+from .cache import LRUCache
+from .metrics import RAG_RERANK_LATENCY_SECONDS
+
+
+class CrossEncoderReranker:
+    """
+    Scores (query, passage) pairs with a small ONNX cross-encoder.
+
+    All uncached candidates of a query go through one forward pass. Scores
+    are memoized per (query, chunk id), so a repeated or paraphrase-identical
+    query only pays for candidates it has not seen.
+    """
+
+    def __init__(
+        self,
+        model_name: str = "Xenova/ms-marco-MiniLM-L-6-v2",
+        cache_entries: int = 50_000,
+        cache_ttl_s: float = 300.0,
+        threads: Optional[int] = None,
+        cache_dir: Optional[str] = None,
+    ):
+        self.model = TextCrossEncoder(model_name=model_name, threads=threads, cache_dir=cache_dir)
+        self.scores = LRUCache(max_entries=cache_entries, ttl_s=cache_ttl_s)
+
+    def warmup(self) -> None:
+        list(self.model.rerank("warmup probe", ["warmup passage"]))
+
+    def score(self, query_key: str, query: str, ids: Sequence[str], texts: Sequence[str]) -> List[float]:
+        """Scores aligned with `ids`; `query_key` is the normalized query hash."""
+        cached: Dict[str, float] = {}
+        todo: List[int] = []
+        for i, cid in enumerate(ids):
+            s = self.scores.get((query_key, cid))
+            if s is None:
+                todo.append(i)
+            else:
+                cached[cid] = s
+
+        if todo:
+            start = time.perf_counter()
+            fresh = list(self.model.rerank(query, [texts[i] for i in todo], batch_size=len(todo)))
+            RAG_RERANK_LATENCY_SECONDS.observe(time.perf_counter() - start)
+            for i, s in zip(todo, fresh):
+                cached[ids[i]] = float(s)
+                self.scores.put((query_key, ids[i]), float(s))
+
+        return [cached[cid] for cid in ids]
@@ -0,0 +1,285 @@
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import random
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Iterator, Optional, TypeVar
+
+import httpx
+
+from .metrics_llm import LLM_CIRCUIT_REJECTED_TOTAL, LLM_CIRCUIT_STATE, LLM_RETRIES_TOTAL
+
+T = TypeVar("T")
+
+# Worth another attempt: throttling, gateway/upstream hiccups, timeouts.
+# Other 4xx (bad request, auth, context too long) fail the same way again.
+RETRYABLE_STATUS = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+
+class BackendUnavailable(Exception):
+    """The LLM backend could not produce an answer in time; callers fall back."""
+
+
+class CircuitOpen(BackendUnavailable):
+    pass
+
+
+class DeadlineExceeded(BackendUnavailable):
+    pass
+
+
+# ---------------------------------------------------------------------
+# Request deadlines
+# ---------------------------------------------------------------------
+# Set once per HTTP request (see main.py) and read by every outbound call
+# in that request's context, so retries never outlive the caller.
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar(
+    "rag_request_deadline", default=None
+)
+
+
+@contextmanager
+def deadline_scope(timeout_s: Optional[float]) -> Iterator[None]:
+    """Bound everything in this context to `timeout_s` from now (None = no bound).
+    A tighter enclosing deadline wins."""
+    expires = None if timeout_s is None else time.monotonic() + timeout_s
+    outer = _deadline.get()
+    if outer is not None and (expires is None or outer < expires):
+        expires = outer
+    token = _deadline.set(expires)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_s() -> Optional[float]:
+    """Seconds left before the current request's deadline (None = unbounded)."""
+    expires = _deadline.get()
+    return None if expires is None else expires - time.monotonic()
+
+
+# ---------------------------------------------------------------------
+# Retry policy
+# ---------------------------------------------------------------------
+def is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code in RETRYABLE_STATUS
+    # Connect/read/pool timeouts, refused or reset connections
+    return isinstance(exc, httpx.TransportError)
+
+
+def _retry_after_s(exc: BaseException) -> Optional[float]:
+    if isinstance(exc, httpx.HTTPStatusError):
+        value = exc.response.headers.get("Retry-After", "")
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return None
+
+
+def _reason(exc: BaseException) -> str:
+    if isinstance(exc, httpx.HTTPStatusError):
+        return str(exc.response.status_code)
+    return type(exc).__name__
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """Exponential backoff with full jitter, honouring Retry-After."""
+
+    max_attempts: int = 4
+    base_delay_s: float = 0.5
+    max_delay_s: float = 8.0
+
+    def delay_s(self, attempt: int, exc: BaseException) -> float:
+        """Sleep before attempt `attempt + 1` (attempt counts from 0)."""
+        hinted = _retry_after_s(exc)
+        if hinted is not None:
+            return min(self.max_delay_s, hinted)
+        return random.uniform(0, min(self.max_delay_s, self.base_delay_s * (2 ** attempt)))
+
+
+# ---------------------------------------------------------------------
+# Circuit breaker
+# ---------------------------------------------------------------------
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive backend failures and fails
+    calls fast for `reset_timeout_s`; then lets one probe through (half-open)
+    and closes again on its success. Client errors (non-retryable) do not
+    count: they say nothing about backend health.
+    """
+
+    CLOSED, HALF_OPEN, OPEN = 0, 1, 2
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout_s: float = 30.0):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout_s = reset_timeout_s
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._retired = False
+        self._lock = threading.Lock()
+        LLM_CIRCUIT_STATE.labels(backend=name).set(self.state)
+
+    def _set(self, state: int) -> None:
+        self.state = state
+        if not self._retired:
+            LLM_CIRCUIT_STATE.labels(backend=self.name).set(state)
+
+    def retire(self) -> None:
+        """Stop reporting state (the backend left the config); a stale 'open' would alert."""
+        with self._lock:
+            self._retired = True
+            try:
+                LLM_CIRCUIT_STATE.remove(self.name)
+            except KeyError:
+                pass
+
+    @property
+    def is_open(self) -> bool:
+        """Open and not yet due for a probe; calls would fail fast."""
+        return self.state == self.OPEN and time.monotonic() - self.opened_at < self.reset_timeout_s
+
+    def before_call(self) -> bool:
+        """Admit a call or raise CircuitOpen; True if it is the half-open probe."""
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout_s:
+                self._set(self.HALF_OPEN)
+            if self.state == self.OPEN or (self.state == self.HALF_OPEN and self._probing):
+                LLM_CIRCUIT_REJECTED_TOTAL.labels(backend=self.name).inc()
+                raise CircuitOpen(f"LLM backend circuit open for '{self.name}'")
+            if self.state == self.HALF_OPEN:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self._probing = False
+            if self.state != self.CLOSED:
+                self._set(self.CLOSED)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                self._set(self.OPEN)
+
+    def record_neutral(self, probe: bool) -> None:
+        """
+        The call ended for reasons unrelated to backend health (client error,
+        cancellation). A probe that ends this way frees the slot for the next.
+        """
+        if not probe:
+            return
+        with self._lock:
+            self._probing = False
+
+
+# ---------------------------------------------------------------------
+# Calling with all of the above
+# ---------------------------------------------------------------------
+def _attempt_timeout(cap_s: Optional[float]) -> Optional[float]:
+    left = remaining_s()
+    if left is None:
+        return cap_s
+    if left <= 0:
+        raise DeadlineExceeded("request deadline exceeded before the LLM call")
+    return left if cap_s is None else min(cap_s, left)
+
+
+def _on_error(
+    exc: Exception,
+    attempt: int,
+    policy: RetryPolicy,
+    breaker: Optional[CircuitBreaker],
+    probe: bool,
+    label: str,
+) -> float:
+    """Record the failure; return the backoff to sleep, or raise if giving up."""
+    if not is_retryable(exc):
+        if breaker is not None:
+            breaker.record_neutral(probe)
+        raise exc
+    if breaker is not None:
+        breaker.record_failure()
+    if attempt + 1 >= policy.max_attempts:
+        raise BackendUnavailable(f"LLM backend failed after {attempt + 1} attempts: {exc}") from exc
+    delay = policy.delay_s(attempt, exc)
+    left = remaining_s()
+    if left is not None and delay >= left:
+        raise DeadlineExceeded(f"no time left to retry the LLM call: {exc}") from exc
+    LLM_RETRIES_TOTAL.labels(backend=label, reason=_reason(exc)).inc()
+    return delay
+
+
+async def acall_with_retries(
+    call: Callable[[Optional[float]], Awaitable[T]],
+    policy: RetryPolicy,
+    breaker: Optional[CircuitBreaker] = None,
+    timeout_s: Optional[float] = None,
+    label: str = "llm",
+) -> T:
+    """
+    Run `call(attempt_timeout_s)` with retries. Each attempt gets the smaller
+    of `timeout_s` and what is left of the request deadline.
+    """
+    for attempt in range(policy.max_attempts):
+        # Before admission: a request out of time never takes the probe slot
+        attempt_timeout = _attempt_timeout(timeout_s)
+        probe = breaker.before_call() if breaker is not None else False
+        try:
+            result = await call(attempt_timeout)
+        except Exception as exc:
+            delay = _on_error(exc, attempt, policy, breaker, probe, label)
+        except BaseException:
+            # Cancelled (client gone, hedge lost): no verdict on the backend
+            if breaker is not None:
+                breaker.record_neutral(probe)
+            raise
+        else:
+            if breaker is not None:
+                breaker.record_success()
+            return result
+        await asyncio.sleep(delay)
+    raise AssertionError("unreachable")
+
+
+def call_with_retries(
+    call: Callable[[Optional[float]], T],
+    policy: RetryPolicy,
+    breaker: Optional[CircuitBreaker] = None,
+    timeout_s: Optional[float] = None,
+    label: str = "llm",
+) -> T:
+    """Blocking twin of acall_with_retries (for the sync client / threads)."""
+    for attempt in range(policy.max_attempts):
+        attempt_timeout = _attempt_timeout(timeout_s)
+        probe = breaker.before_call() if breaker is not None else False
+        try:
+            result = call(attempt_timeout)
+        except Exception as exc:
+            delay = _on_error(exc, attempt, policy, breaker, probe, label)
+        except BaseException:
+            if breaker is not None:
+                breaker.record_neutral(probe)
+            raise
+        else:
+            if breaker is not None:
+                breaker.record_success()
+            return result
+        time.sleep(delay)
+    raise AssertionError("unreachable")
@@ -1,21 +1,31 @@
 from __future__ import annotations
 
+import asyncio
+import math
 import os
 import hashlib
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from dataclasses import dataclass
-from typing import List, Dict, Any, Optional, Iterable
+from typing import List, Dict, Any, Optional, Iterable, Set, Tuple
 
-from qdrant_client import QdrantClient
-from fastembed import TextEmbedding
+import anyio.from_thread
+import numpy as np
+from qdrant_client import AsyncQdrantClient, QdrantClient
+from qdrant_client.http import models as qm
+from fastembed import SparseTextEmbedding, TextEmbedding
 
-
-def _estimate_tokens(text: str) -> int:
-    """Rough token estimate without external tokenizers.
-    Empirically, ~4 characters per token for English-like text.
-    """
-    if not text:
-        return 0
-    return max(1, len(text) // 4)
+from .cache import LRUCache
+from .embed_batcher import EmbeddingBatcher
+from .metrics import (
+    RAG_RERANK_TOTAL,
+    RAG_RETRIEVAL_CACHE_BYTES,
+    RAG_RETRIEVAL_CACHE_REQUESTS_TOTAL,
+)
+from .reranker import CrossEncoderReranker
+from .tokenizer import HeuristicTokenizer, get_tokenizer
 
 
 def _stable_text_hash(text: str) -> str:
@@ -23,12 +33,109 @@ def _stable_text_hash(text: str) -> str:
     return hashlib.sha256(norm.encode("utf-8")).hexdigest()
 
 
+def _vector_hash(vector: List[float]) -> str:
+    return hashlib.sha1(np.asarray(vector, dtype=np.float32).tobytes()).hexdigest()
+
+
+def _chunks_nbytes(chunks: List["RetrievedChunk"]) -> int:
+    # Approximate resident size: text plus per-object overhead
+    return 64 + sum(len(c.text) + 256 for c in chunks)
+
+
+# Instructions the model authors recommend prepending to retrieval queries
+# (passages are embedded as-is). fastembed's query_embed does not add them.
+QUERY_INSTRUCTIONS: Dict[str, str] = {
+    "baai/bge-small-en-v1.5": "Represent this sentence for searching relevant passages: ",
+    "baai/bge-base-en-v1.5": "Represent this sentence for searching relevant passages: ",
+    "baai/bge-large-en-v1.5": "Represent this sentence for searching relevant passages: ",
+}
+
+
+def query_instruction(embedding_model: str, setting: str) -> str:
+    """
+    Query prefix for RAG_QUERY_INSTRUCTION: "" / "none" = no prefix, "auto" =
+    the model's recommended instruction (if known), anything else is used
+    verbatim. Changing it changes every query vector, so the collection
+    does not need re-ingesting but cached answers effectively reset.
+    """
+    if setting.strip().lower() in ("", "none"):
+        return ""
+    if setting.strip().lower() == "auto":
+        return QUERY_INSTRUCTIONS.get(embedding_model.lower(), "")
+    return setting
+
+
+def cpu_limit() -> Optional[float]:
+    """The container's CPU quota in cores (cgroup v2, then v1), if any."""
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()[:2]
+        return None if quota == "max" else int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+        return None if quota <= 0 else quota / period
+    except (OSError, ValueError):
+        return None
+
+
+def onnx_threads(requested: int = 0) -> Optional[int]:
+    """
+    ONNX Runtime intra-op threads. ORT defaults to one per *host* core, which
+    under a pod CPU limit means throttling and contention with the event
+    loop; 0 = size to the CPU limit instead (None = ORT default, no limit).
+    """
+    if requested > 0:
+        return requested
+    limit = cpu_limit()
+    return max(1, math.ceil(limit)) if limit else None
+
+
+def build_search_params(
+    hnsw_ef: int = 0,
+    exact: bool = False,
+    rescore: Optional[bool] = None,
+    oversampling: float = 0.0,
+) -> Optional[qm.SearchParams]:
+    """
+    Qdrant search params from the RAG_* knobs (None when all are defaults).
+    - hnsw_ef: HNSW beam width at query time (0 = collection's ef_construct)
+    - exact: brute-force scan, bypassing HNSW and quantization
+    - rescore/oversampling: on quantized collections, fetch `oversampling` x
+      limit candidates with the compressed vectors and rescore them with the
+      originals (None / 0 = Qdrant defaults)
+    """
+    quantization = None
+    if rescore is not None or oversampling > 0:
+        quantization = qm.QuantizationSearchParams(
+            rescore=rescore,
+            oversampling=oversampling if oversampling > 0 else None,
+        )
+    if not (hnsw_ef > 0 or exact or quantization):
+        return None
+    return qm.SearchParams(
+        hnsw_ef=hnsw_ef if hnsw_ef > 0 else None,
+        exact=exact,
+        quantization=quantization,
+    )
+
+
+def collection_version_point_id(collection: str) -> str:
+    # Must match qdrant-ingestor's ingest.collection_version_point_id
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"rag-collection-version:{collection}"))
+
+
 @dataclass
 class RetrievedChunk:
     id: str
     text: str
     score: float
     metadata: Dict[str, Any]
+    rerank_score: Optional[float] = None
 
 
 class QdrantRetriever:
@@ -41,38 +148,450 @@ class QdrantRetriever:
         score_threshold: float = 0.25,
         max_context_tokens: int = 2048,
         deduplicate: bool = True,
+        meta_collection: str = "rag_meta",
+        version_ttl_s: float = 30.0,
+        embed_cache_bytes: int = 8 * 1024 * 1024,
+        search_cache_bytes: int = 16 * 1024 * 1024,
+        search_cache_ttl_s: float = 300.0,
+        embed_batch_window_ms: float = 3.0,
+        embed_batch_max: int = 32,
+        embed_workers: int = 1,
+        sparse_model: str = "",
+        dense_vector_name: str = "",
+        sparse_vector_name: str = "sparse",
+        prefetch_limit: int = 0,
+        rerank_model: str = "",
+        rerank_candidates: int = 20,
+        rerank_budget_ms: float = 250.0,
+        hnsw_ef: int = 0,
+        exact: bool = False,
+        quantization_rescore: Optional[bool] = None,
+        quantization_oversampling: float = 0.0,
+        embed_threads: int = 0,
+        model_cache_dir: str = "",
+        query_instruction: str = "",
+        tokenizer=None,
     ):
         self.client = QdrantClient(url=qdrant_url)
+        self.aclient = AsyncQdrantClient(url=qdrant_url)
         self.collection = collection
         self.top_k = top_k
         self.score_threshold = score_threshold
         self.max_context_tokens = max_context_tokens
+        # Counts chunk tokens for max_context_tokens (the prompt's tokenizer)
+        self.tokenizer = tokenizer or HeuristicTokenizer()
         self.deduplicate = deduplicate
-        self.embedder = TextEmbedding(model_name=embedding_model)
+        self.meta_collection = meta_collection
+        self.version_ttl_s = version_ttl_s
+        self._version: str = "0"
+        self._version_checked_at: float = 0.0
+        # Models load from `model_cache_dir` (baked into the image) with
+        # threads sized to the pod's CPU limit, not the node's core count
+        onnx_kwargs: Dict[str, Any] = dict(
+            threads=onnx_threads(embed_threads),
+            cache_dir=model_cache_dir or None,
+        )
+        self.embedder = TextEmbedding(model_name=embedding_model, **onnx_kwargs)
+        self.query_prefix = query_instruction
+
+        # Hybrid mode: dense + sparse prefetches fused with RRF in one
+        # query_points call. The collection must have been ingested with the
+        # same sparse model (named vectors, see qdrant-ingestor).
+        self.sparse_embedder: Optional[SparseTextEmbedding] = (
+            SparseTextEmbedding(model_name=sparse_model, **onnx_kwargs) if sparse_model else None
+        )
+        self.dense_vector_name = dense_vector_name or ("dense" if sparse_model else "")
+        self.sparse_vector_name = sparse_vector_name
+        self.prefetch_limit = prefetch_limit or top_k * 4
+
+        # Optional rerank stage: over-fetch `rerank_candidates`, score them with
+        # a cross-encoder on its own thread, keep the best top_k. A rerank that
+        # overruns `rerank_budget_ms` is abandoned in favour of vector order.
+        self.reranker: Optional[CrossEncoderReranker] = (
+            CrossEncoderReranker(model_name=rerank_model, **onnx_kwargs) if rerank_model else None
+        )
+        self.rerank_model = rerank_model
+        self.rerank_candidates = max(top_k, rerank_candidates)
+        self.rerank_budget_s = rerank_budget_ms / 1000.0
+        self._rerank_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rerank")
+        # One rerank at a time and none queued: a job that overruns its budget
+        # keeps the worker busy, and queueing behind it would only miss too
+        self._rerank_slot = threading.BoundedSemaphore(1)
+
+        # Per-request search knobs; None leaves Qdrant's collection defaults
+        self.search_params = build_search_params(
+            hnsw_ef=hnsw_ef,
+            exact=exact,
+            rescore=quantization_rescore,
+            oversampling=quantization_oversampling,
+        )
+        self._search_params_key = (
+            self.search_params.model_dump_json(exclude_none=True) if self.search_params else ""
+        )
+
+        # Exact-match memoization (0 bytes disables a level):
+        # - normalized query text -> float32 query vector
+        # - (vector, search params, collection version) -> filtered chunks
+        self.query_vectors: Optional[LRUCache] = (
+            LRUCache(max_entries=1 << 20, max_bytes=embed_cache_bytes, sizeof=lambda v: v.nbytes + 96)
+            if embed_cache_bytes > 0
+            else None
+        )
+        self.search_results: Optional[LRUCache] = (
+            LRUCache(
+                max_entries=1 << 20,
+                ttl_s=search_cache_ttl_s,
+                max_bytes=search_cache_bytes,
+                sizeof=_chunks_nbytes,
+            )
+            if search_cache_bytes > 0
+            else None
+        )
+        self._search_cache_version: Optional[str] = None
+
+        # Concurrent requests share ONNX forward passes (window 0 disables)
+        self._embed_executor = ThreadPoolExecutor(
+            max_workers=max(1, embed_workers),
+            thread_name_prefix="embed",
+        )
+        self.batcher: Optional[EmbeddingBatcher] = (
+            EmbeddingBatcher(
+                self._embed_texts,
+                max_batch=embed_batch_max,
+                max_wait_ms=embed_batch_window_ms,
+                executor=self._embed_executor,
+            )
+            if embed_batch_window_ms > 0
+            else None
+        )
+
+    @property
+    def hybrid(self) -> bool:
+        return self.sparse_embedder is not None
+
+    def close(self) -> None:
+        """Stop the worker threads (work already queued still runs) and the sync client."""
+        self._embed_executor.shutdown(wait=False)
+        self._rerank_executor.shutdown(wait=False)
+        self.client.close()
+
+    async def aclose(self) -> None:
+        if self.batcher is not None:
+            await self.batcher.aclose()
+        self.close()
+        await self.aclient.close()
+
+    def warmup(self) -> None:
+        """Run one probe embedding so the ONNX session is initialised before traffic."""
+        next(self.embedder.query_embed([self.query_prefix + "warmup probe"]))
+        if self.sparse_embedder is not None:
+            next(self.sparse_embedder.query_embed("warmup probe"))
+        if self.reranker is not None:
+            self.reranker.warmup()
+
+    @property
+    def fetch_limit(self) -> int:
+        return self.rerank_candidates if self.reranker is not None else self.top_k
+
+    # ---- exact-match caches ----
+
+    def _cached_query_vector(self, key: str) -> Optional[List[float]]:
+        if self.query_vectors is None:
+            return None
+        vec = self.query_vectors.get(key)
+        RAG_RETRIEVAL_CACHE_REQUESTS_TOTAL.labels(
+            cache="embedding", result="miss" if vec is None else "hit"
+        ).inc()
+        return None if vec is None else vec.tolist()
+
+    def _remember_query_vector(self, key: str, vector: List[float]) -> None:
+        if self.query_vectors is None:
+            return
+        self.query_vectors.put(key, np.asarray(vector, dtype=np.float32))
+        RAG_RETRIEVAL_CACHE_BYTES.labels(cache="embedding").set(self.query_vectors.nbytes)
+
+    def _search_key(self, query: str, qvec: List[float], version: str) -> Tuple:
+        # The sparse half of a hybrid query depends on the raw text, not the vector
+        text_key = _stable_text_hash(query) if self.hybrid else ""
+        return (
+            _vector_hash(qvec),
+            text_key,
+            self.top_k,
+            self.score_threshold,
+            self.rerank_model,
+            self.rerank_candidates,
+            self._search_params_key,
+            self.collection,
+            version,
+        )
+
+    def _cached_search(self, key: Tuple) -> Optional[List[RetrievedChunk]]:
+        if self.search_results is None:
+            return None
+        # A new collection version makes every older entry unreachable; free them
+        if key[-1] != self._search_cache_version:
+            self.search_results.clear()
+            self._search_cache_version = key[-1]
+        chunks = self.search_results.get(key)
+        RAG_RETRIEVAL_CACHE_REQUESTS_TOTAL.labels(
+            cache="search", result="miss" if chunks is None else "hit"
+        ).inc()
+        return None if chunks is None else list(chunks)
+
+    def _remember_search(self, key: Tuple, chunks: List[RetrievedChunk]) -> None:
+        if self.search_results is None:
+            return
+        self.search_results.put(key, list(chunks))
+        RAG_RETRIEVAL_CACHE_BYTES.labels(cache="search").set(self.search_results.nbytes)
+
+    # ---- embedding ----
+
+    def _embed_texts(self, texts: List[str]) -> List[List[float]]:
+        # query_embed: the model-specific query path (vs passage_embed at ingest)
+        return [v.tolist() for v in self.embedder.query_embed([self.query_prefix + t for t in texts])]
+
+    def embed_query(self, query: str) -> List[float]:
+        key = _stable_text_hash(query)
+        cached = self._cached_query_vector(key)
+        if cached is not None:
+            return cached
+        vector = self._embed_texts([query])[0]
+        self._remember_query_vector(key, vector)
+        return vector
+
+    async def aembed_query(self, query: str) -> List[float]:
+        key = _stable_text_hash(query)
+        cached = self._cached_query_vector(key)
+        if cached is not None:
+            return cached
+        # ONNX inference is CPU-bound; keep it off the event loop
+        if self.batcher is not None:
+            vector = await self.batcher.embed(query)
+        else:
+            loop = asyncio.get_running_loop()
+            vector = (await loop.run_in_executor(self._embed_executor, self._embed_texts, [query]))[0]
+        self._remember_query_vector(key, vector)
+        return vector
+
+    def embed_sparse_query(self, query: str) -> qm.SparseVector:
+        emb = next(self.sparse_embedder.query_embed(query))
+        return qm.SparseVector(indices=emb.indices.tolist(), values=emb.values.tolist())
+
+    # ---- retrieval ----
+
+    def _dense_query(self, qvec: List[float]):
+        return (self.dense_vector_name, qvec) if self.dense_vector_name else qvec
+
+    def _hybrid_request(self, qvec: List[float], svec: qm.SparseVector) -> Dict[str, Any]:
+        """
+        query_points kwargs: dense and sparse candidates are fetched and fused
+        server-side (reciprocal rank fusion). The similarity threshold applies
+        to the dense prefetch; fused scores are rank-based.
+        """
+        return dict(
+            collection_name=self.collection,
+            prefetch=[
+                qm.Prefetch(
+                    query=qvec,
+                    using=self.dense_vector_name,
+                    limit=max(self.prefetch_limit, self.fetch_limit),
+                    score_threshold=self.score_threshold,
+                    params=self.search_params,
+                ),
+                qm.Prefetch(
+                    query=svec,
+                    using=self.sparse_vector_name,
+                    limit=max(self.prefetch_limit, self.fetch_limit),
+                ),
+            ],
+            query=qm.FusionQuery(fusion=qm.Fusion.RRF),
+            limit=self.fetch_limit,
+            with_payload=True,
+        )
 
     def retrieve(self, query: str) -> List[RetrievedChunk]:
         try:
             # Embed query
-            qvec = next(self.embedder.embed([query])).tolist()
+            qvec = self.embed_query(query)
 
-            res = self.client.search(
-                collection_name=self.collection,
-                query_vector=qvec,
-                limit=self.top_k,
-                with_payload=True,
-            )
+            key = self._search_key(query, qvec, self._version)
+            cached = self._cached_search(key)
+            if cached is not None:
+                return cached
+
+            if self.hybrid:
+                svec = self.embed_sparse_query(query)
+                res = self.client.query_points(**self._hybrid_request(qvec, svec)).points
+            else:
+                res = self.client.search(
+                    collection_name=self.collection,
+                    query_vector=self._dense_query(qvec),
+                    limit=self.fetch_limit,
+                    search_params=self.search_params,
+                    with_payload=True,
+                )
 
         except Exception as e:
             # Graceful fallback: no retrieval, no crash
             print(f"[RAG] Retrieval skipped: {e}")
             return []
 
+        candidates = self._candidates(res)
+        complete = True
+        if self.reranker is not None and len(candidates) > 1:
+            future = self._submit_rerank(query, candidates)
+            try:
+                if future is None:  # an earlier rerank still holds the worker
+                    raise FutureTimeoutError()
+                scores = future.result(timeout=self.rerank_budget_s)
+            except FutureTimeoutError:
+                RAG_RERANK_TOTAL.labels(result="skipped_budget").inc()
+                scores = None
+            except Exception as e:
+                print(f"[RAG] Rerank skipped: {e}")
+                RAG_RERANK_TOTAL.labels(result="error").inc()
+                scores = None
+            candidates, complete = self._apply_rerank(candidates, scores)
+
+        chunks = self._pack(candidates)
+        if complete:
+            self._remember_search(key, chunks)
+        return chunks
+
+    async def aretrieve(
+        self,
+        query: str,
+        query_vector: Optional[List[float]] = None,
+    ) -> List[RetrievedChunk]:
+        try:
+            qvec = query_vector if query_vector is not None else await self.aembed_query(query)
+
+            key = self._search_key(query, qvec, await self.acollection_version())
+            cached = self._cached_search(key)
+            if cached is not None:
+                return cached
+
+            if self.hybrid:
+                loop = asyncio.get_running_loop()
+                svec = await loop.run_in_executor(
+                    self._embed_executor, self.embed_sparse_query, query
+                )
+                res = (await self.aclient.query_points(**self._hybrid_request(qvec, svec))).points
+            else:
+                res = await self.aclient.search(
+                    collection_name=self.collection,
+                    query_vector=self._dense_query(qvec),
+                    limit=self.fetch_limit,
+                    search_params=self.search_params,
+                    with_payload=True,
+                )
+
+        except Exception as e:
+            print(f"[RAG] Retrieval skipped: {e}")
+            return []
+
+        candidates = self._candidates(res)
+        complete = True
+        if self.reranker is not None and len(candidates) > 1:
+            future = self._submit_rerank(query, candidates)
+            try:
+                if future is None:  # an earlier rerank still holds the worker
+                    raise asyncio.TimeoutError()
+                # On timeout the forward pass still finishes in the background
+                # (holding the rerank slot) and fills the score cache
+                scores = await asyncio.wait_for(
+                    asyncio.shield(asyncio.wrap_future(future)), self.rerank_budget_s
+                )
+            except asyncio.TimeoutError:
+                RAG_RERANK_TOTAL.labels(result="skipped_budget").inc()
+                scores = None
+            except Exception as e:
+                print(f"[RAG] Rerank skipped: {e}")
+                RAG_RERANK_TOTAL.labels(result="error").inc()
+                scores = None
+            candidates, complete = self._apply_rerank(candidates, scores)
+
+        chunks = self._pack(candidates)
+        if complete:
+            self._remember_search(key, chunks)
+        return chunks
+
+    # ---- reranking ----
+
+    def _submit_rerank(
+        self, query: str, candidates: List[RetrievedChunk]
+    ) -> Optional["Future[List[float]]"]:
+        """Start a rerank, or None if one is still running (it counts as over budget)."""
+        if not self._rerank_slot.acquire(blocking=False):
+            return None
+        try:
+            return self._rerank_executor.submit(self._rerank_job, query, candidates)
+        except BaseException:
+            self._rerank_slot.release()
+            raise
+
+    def _rerank_job(self, query: str, candidates: List[RetrievedChunk]) -> List[float]:
+        try:
+            return self._rerank_scores(query, candidates)
+        finally:
+            self._rerank_slot.release()
+
+    def _rerank_scores(self, query: str, candidates: List[RetrievedChunk]) -> List[float]:
+        return self.reranker.score(
+            _stable_text_hash(query),
+            query,
+            [c.id for c in candidates],
+            [c.text for c in candidates],
+        )
+
+    def _apply_rerank(
+        self,
+        candidates: List[RetrievedChunk],
+        scores: Optional[List[float]],
+    ) -> Tuple[List[RetrievedChunk], bool]:
+        """(chunks in final order, whether the result is complete enough to cache)"""
+        if scores is None:
+            return candidates, False
+        RAG_RERANK_TOTAL.labels(result="reranked").inc()
+        for c, s in zip(candidates, scores):
+            c.rerank_score = s
+        return sorted(candidates, key=lambda c: c.rerank_score, reverse=True), True
+
+    async def acollection_version(self) -> str:
+        """
+        Version marker the ingestor bumps after each run (polled, cached for
+        `version_ttl_s`). "0" when no marker has been written yet.
+        """
+        now = time.monotonic()
+        if now - self._version_checked_at < self.version_ttl_s:
+            return self._version
+
+        self._version_checked_at = now
+        try:
+            points = await self.aclient.retrieve(
+                collection_name=self.meta_collection,
+                ids=[collection_version_point_id(self.collection)],
+                with_payload=True,
+            )
+            if points:
+                self._version = str((points[0].payload or {}).get("version", "0"))
+        except Exception as e:
+            print(f"[RAG] Collection version check skipped: {e}")
+        return self._version
+
+    def _to_chunks(self, res: Iterable[Any]) -> List[RetrievedChunk]:
+        return self._pack(self._candidates(res))
+
+    def _candidates(self, res: Iterable[Any]) -> List[RetrievedChunk]:
+        """Search hits above the score threshold, de-duplicated, in rank order."""
         chunks: List[RetrievedChunk] = []
         seen: set[str] = set()
-        used_tokens = 0
 
         for p in res:
-            if p.score is None or p.score < self.score_threshold:
+            if p.score is None:
+                continue
+            # Fused (RRF) scores are not similarities; the dense prefetch filtered
+            if not self.hybrid and p.score < self.score_threshold:
                 continue
 
             payload = p.payload or {}
@@ -86,11 +605,6 @@ class QdrantRetriever:
                     continue
                 seen.add(h)
 
-            tks = _estimate_tokens(text)
-            if self.max_context_tokens and used_tokens + tks > self.max_context_tokens:
-                break
-
-            used_tokens += tks
             md = payload.get("metadata", {})
             chunks.append(
                 RetrievedChunk(
@@ -103,9 +617,58 @@ class QdrantRetriever:
 
         return chunks
 
+    def _pack(self, candidates: List[RetrievedChunk]) -> List[RetrievedChunk]:
+        """The first top_k candidates that fit in max_context_tokens."""
+        picked = candidates[: self.top_k]
+        if not self.max_context_tokens:
+            return picked
 
+        chunks: List[RetrievedChunk] = []
+        used_tokens = 0
+        for c, tks in zip(picked, self.tokenizer.count_many([c.text for c in picked])):
+            if used_tokens + tks > self.max_context_tokens:
+                break
+            used_tokens += tks
+            chunks.append(c)
 
-def build_retriever_from_env() -> Optional[QdrantRetriever]:
+        return chunks
+
+
+@dataclass(frozen=True)
+class RetrieverConfig:
+    qdrant_url: str
+    collection: str
+    embedding_model: str
+    top_k: int
+    score_threshold: float
+    max_context_tokens: int
+    deduplicate: bool
+    meta_collection: str = "rag_meta"
+    version_ttl_s: float = 30.0
+    embed_cache_bytes: int = 8 * 1024 * 1024
+    search_cache_bytes: int = 16 * 1024 * 1024
+    search_cache_ttl_s: float = 300.0
+    embed_batch_window_ms: float = 3.0
+    embed_batch_max: int = 32
+    embed_workers: int = 1
+    sparse_model: str = ""
+    dense_vector_name: str = ""
+    sparse_vector_name: str = "sparse"
+    prefetch_limit: int = 0
+    rerank_model: str = ""
+    rerank_candidates: int = 20
+    rerank_budget_ms: float = 250.0
+    hnsw_ef: int = 0
+    exact: bool = False
+    quantization_rescore: Optional[bool] = None
+    quantization_oversampling: float = 0.0
+    embed_threads: int = 0
+    model_cache_dir: str = ""
+    query_instruction: str = ""
+    prompt_tokenizer: str = ""
+
+
+def retriever_config_from_env() -> Optional[RetrieverConfig]:
     qdrant_url = os.getenv("QDRANT_URL", "").strip()
     if not qdrant_url:
         return None
@@ -115,13 +678,157 @@ def build_retriever_from_env() -> Optional[QdrantRetriever]:
     score_threshold = float(os.getenv("RAG_MIN_SCORE", os.getenv("SCORE_THRESHOLD", "0.25")))
     max_context_tokens = int(os.getenv("RAG_MAX_CONTEXT_TOKENS", "2048"))
     dedup = os.getenv("RAG_DEDUPLICATE", "true").strip().lower() in ("1", "true", "yes", "y", "on")
+    exact = os.getenv("RAG_EXACT_SEARCH", "false").strip().lower() in ("1", "true", "yes", "y", "on")
+    # Unset = let Qdrant decide (it rescores quantized results by default)
+    rescore_env = os.getenv("RAG_QUANTIZATION_RESCORE", "").strip().lower()
+    rescore = None if not rescore_env else rescore_env in ("1", "true", "yes", "y", "on")
+    embedding_model = os.getenv("EMBEDDING_MODEL", "BAAI/bge-small-en-v1.5")
 
-    return QdrantRetriever(
+    return RetrieverConfig(
         qdrant_url=qdrant_url,
         collection=os.getenv("QDRANT_COLLECTION", "medical_docs"),
-        embedding_model=os.getenv("EMBEDDING_MODEL", "BAAI/bge-small-en-v1.5"),
+        embedding_model=embedding_model,
         top_k=top_k,
         score_threshold=score_threshold,
         max_context_tokens=max_context_tokens,
         deduplicate=dedup,
+        meta_collection=os.getenv("QDRANT_META_COLLECTION", "rag_meta"),
+        version_ttl_s=float(os.getenv("RAG_COLLECTION_VERSION_TTL_S", "30")),
+        embed_cache_bytes=int(os.getenv("RAG_EMBED_CACHE_MAX_BYTES", str(8 * 1024 * 1024))),
+        search_cache_bytes=int(os.getenv("RAG_SEARCH_CACHE_MAX_BYTES", str(16 * 1024 * 1024))),
+        search_cache_ttl_s=float(os.getenv("RAG_SEARCH_CACHE_TTL_S", "300")),
+        embed_batch_window_ms=float(os.getenv("RAG_EMBED_BATCH_WINDOW_MS", "3")),
+        embed_batch_max=int(os.getenv("RAG_EMBED_BATCH_MAX", "32")),
+        embed_workers=int(os.getenv("RAG_EMBED_WORKERS", "1")),
+        sparse_model=os.getenv("SPARSE_EMBEDDING_MODEL", "").strip(),
+        dense_vector_name=os.getenv("QDRANT_DENSE_VECTOR", "").strip(),
+        sparse_vector_name=os.getenv("QDRANT_SPARSE_VECTOR", "sparse").strip(),
+        prefetch_limit=int(os.getenv("RAG_PREFETCH_LIMIT", "0")),
+        rerank_model=os.getenv("RAG_RERANK_MODEL", "").strip(),
+        rerank_candidates=int(os.getenv("RAG_RERANK_CANDIDATES", "20")),
+        rerank_budget_ms=float(os.getenv("RAG_RERANK_BUDGET_MS", "250")),
+        hnsw_ef=int(os.getenv("RAG_HNSW_EF", "0")),
+        exact=exact,
+        quantization_rescore=rescore,
+        quantization_oversampling=float(os.getenv("RAG_QUANTIZATION_OVERSAMPLING", "0")),
+        embed_threads=int(os.getenv("RAG_EMBED_THREADS", "0")),
+        model_cache_dir=os.getenv("FASTEMBED_CACHE_PATH", "").strip(),
+        query_instruction=query_instruction(
+            embedding_model, os.getenv("RAG_QUERY_INSTRUCTION", "")
+        ),
+        prompt_tokenizer=os.getenv("PROMPT_TOKENIZER", "").strip(),
     )
+
+
+def build_retriever(config: RetrieverConfig) -> QdrantRetriever:
+    return QdrantRetriever(
+        qdrant_url=config.qdrant_url,
+        collection=config.collection,
+        embedding_model=config.embedding_model,
+        top_k=config.top_k,
+        score_threshold=config.score_threshold,
+        max_context_tokens=config.max_context_tokens,
+        deduplicate=config.deduplicate,
+        meta_collection=config.meta_collection,
+        version_ttl_s=config.version_ttl_s,
+        embed_cache_bytes=config.embed_cache_bytes,
+        search_cache_bytes=config.search_cache_bytes,
+        search_cache_ttl_s=config.search_cache_ttl_s,
+        embed_batch_window_ms=config.embed_batch_window_ms,
+        embed_batch_max=config.embed_batch_max,
+        embed_workers=config.embed_workers,
+        sparse_model=config.sparse_model,
+        dense_vector_name=config.dense_vector_name,
+        sparse_vector_name=config.sparse_vector_name,
+        prefetch_limit=config.prefetch_limit,
+        rerank_model=config.rerank_model,
+        rerank_candidates=config.rerank_candidates,
+        rerank_budget_ms=config.rerank_budget_ms,
+        hnsw_ef=config.hnsw_ef,
+        exact=config.exact,
+        quantization_rescore=config.quantization_rescore,
+        quantization_oversampling=config.quantization_oversampling,
+        embed_threads=config.embed_threads,
+        model_cache_dir=config.model_cache_dir,
+        query_instruction=config.query_instruction,
+        # get_tokenizer() reads PROMPT_TOKENIZER, which is config.prompt_tokenizer
+        tokenizer=get_tokenizer(),
+    )
+
+
+def build_retriever_from_env() -> Optional[QdrantRetriever]:
+    config = retriever_config_from_env()
+    return build_retriever(config) if config else None
+
+
+# ---------------------------------------------------------------------
+# Process-wide retriever
+# ---------------------------------------------------------------------
+# Building a retriever loads the ONNX embedding model and opens a Qdrant
+# connection pool, so it is done once per worker and only redone when the
+# env-derived config actually changes.
+
+_retriever: Optional[QdrantRetriever] = None
+_retriever_config: Optional[RetrieverConfig] = None
+_retriever_lock = threading.Lock()
+
+# Requests that already hold a replaced retriever get this long to finish
+_RETIRE_GRACE_S = 30.0
+_retiring: Set[asyncio.Task] = set()
+
+
+async def _close_later(retriever: QdrantRetriever) -> None:
+    await asyncio.sleep(_RETIRE_GRACE_S)
+    await retriever.aclose()
+
+
+def _retire(retriever: QdrantRetriever) -> None:
+    """
+    Close a replaced retriever's threads and Qdrant clients. Its async client
+    lives on the event loop, while FastAPI runs get_retriever on a worker
+    thread, so the close is handed over to the loop.
+    """
+
+    def schedule() -> None:
+        task = asyncio.get_running_loop().create_task(_close_later(retriever))
+        _retiring.add(task)
+        task.add_done_callback(_retiring.discard)
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        pass
+    else:
+        schedule()  # already on the loop (lifespan)
+        return
+    try:
+        anyio.from_thread.run_sync(schedule)
+    except RuntimeError:
+        # No event loop to hand it to (scripts, tests): nothing serves it anymore
+        retriever.close()
+
+
+def get_retriever() -> Optional[QdrantRetriever]:
+    global _retriever, _retriever_config
+
+    config = retriever_config_from_env()
+    if config == _retriever_config:
+        return _retriever
+
+    with _retriever_lock:
+        if config != _retriever_config:
+            retriever = build_retriever(config) if config else None
+            if retriever is not None:
+                retriever.warmup()
+            if _retriever is not None:
+                _retire(_retriever)
+            _retriever, _retriever_config = retriever, config
+
+    return _retriever
+
+
+def reset_retriever() -> None:
+    global _retriever, _retriever_config
+
+    with _retriever_lock:
+        _retriever, _retriever_config = None, None
@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from pydantic import BaseModel
 
 
@@ -17,3 +17,10 @@ class ChatResponse(BaseModel):
     answer: str
     history: List[ChatMessage]
     context_used: int
+
+
+class ChatSource(BaseModel):
+    id: str
+    score: float
+    rerank_score: Optional[float] = None
+    metadata: Dict[str, Any] = {}
@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+import base64
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import redis.asyncio as aioredis
+
+from .cache import LRUCache
+from .metrics import (
+    RAG_SEMANTIC_CACHE_REQUESTS_TOTAL,
+    RAG_SEMANTIC_CACHE_SIMILARITY,
+)
+from .redis_pool import get_async_redis
+
+
+@dataclass
+class CachedAnswer:
+    answer: str
+    sources: List[Dict[str, Any]] = field(default_factory=list)
+    similarity: float = 1.0
+
+
+def _normalize(vector: Sequence[float]) -> np.ndarray:
+    v = np.asarray(vector, dtype=np.float32)
+    norm = float(np.linalg.norm(v))
+    return v / norm if norm else v
+
+
+def _encode_vector(v: np.ndarray) -> str:
+    return base64.b64encode(v.astype(np.float32).tobytes()).decode("ascii")
+
+
+def _decode_vector(s: str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(s), dtype=np.float32)
+
+
+def make_scope(*parts: str) -> str:
+    """Cache namespace; answers never cross collection/prompt/model versions."""
+    return ":".join(str(p) for p in parts)
+
+
+class SemanticCache:
+    """
+    Answer cache keyed on query-embedding similarity.
+
+    Two tiers:
+    - front: in-process LRU, scanned with one matrix product
+    - redis: shared across replicas; each entry is its own key (TTL) and a
+      per-scope sorted set tracks recency for LRU trimming. A front-tier miss
+      scans only the `redis_scan` most recently used entries of the scope.
+    """
+
+    def __init__(
+        self,
+        redis_client: Optional[aioredis.Redis] = None,
+        threshold: float = 0.95,
+        ttl_s: int = 3600,
+        max_entries: int = 5000,
+        front_max_entries: int = 512,
+        redis_scan: int = 256,
+    ):
+        self.redis = redis_client
+        self.threshold = threshold
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.redis_scan = redis_scan
+        self.front = LRUCache(max_entries=front_max_entries, ttl_s=ttl_s)
+
+    # ---- keys ----
+
+    @staticmethod
+    def _entry_id(v: np.ndarray) -> str:
+        return hashlib.sha1(v.tobytes()).hexdigest()
+
+    @staticmethod
+    def _entry_key(scope: str, entry_id: str) -> str:
+        return f"semcache:{scope}:e:{entry_id}"
+
+    @staticmethod
+    def _lru_key(scope: str) -> str:
+        return f"semcache:{scope}:lru"
+
+    # ---- lookup ----
+
+    def _best_front(
+        self, scope: str, v: np.ndarray
+    ) -> Tuple[float, Optional[Hashable], Optional[CachedAnswer]]:
+        candidates = [(key, value) for key, value in self.front.items() if key[0] == scope]
+        if not candidates:
+            return 0.0, None, None
+        matrix = np.stack([vec for _, (vec, _) in candidates])
+        sims = matrix @ v
+        best = int(np.argmax(sims))
+        key, (_, answer) = candidates[best]
+        return float(sims[best]), key, answer
+
+    async def _touch(self, scope: str, entry_id: str) -> None:
+        """A hit makes the entry most recently used in Redis too (LRU trimming)."""
+        if self.redis is None:
+            return
+        try:
+            await self.redis.zadd(self._lru_key(scope), {entry_id: time.time()})
+        except Exception:
+            pass
+
+    async def _best_redis(
+        self, scope: str, v: np.ndarray
+    ) -> Tuple[float, Optional[str], Optional[np.ndarray], Optional[CachedAnswer]]:
+        ids = await self.redis.zrevrange(self._lru_key(scope), 0, self.redis_scan - 1)
+        if not ids:
+            return 0.0, None, None, None
+
+        raws = await self.redis.mget([self._entry_key(scope, i) for i in ids])
+        best: Tuple[float, Optional[str], Optional[np.ndarray], Optional[CachedAnswer]] = (
+            0.0, None, None, None,
+        )
+        for entry_id, raw in zip(ids, raws):
+            if not raw:
+                continue
+            data = json.loads(raw)
+            vec = _decode_vector(data["v"])
+            if vec.shape != v.shape:
+                continue
+            sim = float(vec @ v)
+            if sim > best[0]:
+                best = (
+                    sim,
+                    entry_id,
+                    vec,
+                    CachedAnswer(answer=data["answer"], sources=data.get("sources") or []),
+                )
+        return best
+
+    async def lookup(self, scope: str, vector: Sequence[float]) -> Optional[CachedAnswer]:
+        v = _normalize(vector)
+
+        sim, key, hit = self._best_front(scope, v)
+        if hit is not None and sim >= self.threshold:
+            # The scan does not touch recency; the hit does
+            self.front.get(key)
+            await self._touch(scope, key[1])
+            RAG_SEMANTIC_CACHE_SIMILARITY.observe(sim)
+            RAG_SEMANTIC_CACHE_REQUESTS_TOTAL.labels(result="hit", tier="front").inc()
+            return CachedAnswer(answer=hit.answer, sources=hit.sources, similarity=sim)
+
+        if self.redis is not None:
+            try:
+                r_sim, entry_id, vec, r_hit = await self._best_redis(scope, v)
+            except Exception as e:
+                print(f"[RAG] Semantic cache lookup skipped: {e}")
+                r_sim, entry_id, vec, r_hit = 0.0, None, None, None
+
+            if r_hit is not None and r_sim >= self.threshold:
+                self.front.put((scope, entry_id), (vec, r_hit))
+                await self._touch(scope, entry_id)
+                RAG_SEMANTIC_CACHE_SIMILARITY.observe(r_sim)
+                RAG_SEMANTIC_CACHE_REQUESTS_TOTAL.labels(result="hit", tier="redis").inc()
+                return CachedAnswer(answer=r_hit.answer, sources=r_hit.sources, similarity=r_sim)
+            sim = max(sim, r_sim)
+
+        RAG_SEMANTIC_CACHE_SIMILARITY.observe(sim)
+        RAG_SEMANTIC_CACHE_REQUESTS_TOTAL.labels(result="miss", tier="none").inc()
+        return None
+
+    # ---- store ----
+
+    async def store(
+        self,
+        scope: str,
+        vector: Sequence[float],
+        answer: str,
+        sources: Optional[List[Dict[str, Any]]] = None,
+    ) -> None:
+        v = _normalize(vector)
+        entry_id = self._entry_id(v)
+        entry = CachedAnswer(answer=answer, sources=sources or [])
+        self.front.put((scope, entry_id), (v, entry))
+
+        if self.redis is None:
+            return
+
+        now = time.time()
+        lru_key = self._lru_key(scope)
+        payload = json.dumps({"v": _encode_vector(v), "answer": answer, "sources": entry.sources})
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.setex(self._entry_key(scope, entry_id), self.ttl_s, payload)
+                pipe.zadd(lru_key, {entry_id: now})
+                # Drop ids whose entry has expired, then keep only the newest max_entries
+                pipe.zremrangebyscore(lru_key, "-inf", now - self.ttl_s)
+                pipe.zremrangebyrank(lru_key, 0, -(self.max_entries + 1))
+                pipe.expire(lru_key, self.ttl_s)
+                await pipe.execute()
+        except Exception as e:
+            print(f"[RAG] Semantic cache store skipped: {e}")
+
+
+def build_semantic_cache_from_env() -> Optional[SemanticCache]:
+    if os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() != "true":
+        return None
+
+    return SemanticCache(
+        redis_client=get_async_redis(),
+        threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95")),
+        ttl_s=int(os.getenv("SEMANTIC_CACHE_TTL_S", "3600")),
+        max_entries=int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "5000")),
+        front_max_entries=int(os.getenv("SEMANTIC_CACHE_FRONT_MAX_ENTRIES", "512")),
+        redis_scan=int(os.getenv("SEMANTIC_CACHE_REDIS_SCAN", "256")),
+    )
@@ -1,26 +1,38 @@
 import json
 import os
-import redis
 from typing import List, Dict
 
-REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
+from .redis_pool import get_async_redis, get_redis
+
 SESSION_TTL_S = int(os.getenv("SESSION_TTL_S", "0"))
 
-r = redis.from_url(REDIS_URL, decode_responses=True)
+# Legacy JSON-blob helpers. `r` is resolved from the shared pool on first use
+# (tests may assign it directly); importing this module opens no connection.
+r = None
+
+
+def _redis():
+    global r
+    if r is None:
+        r = get_redis()
+        if r is None:
+            raise RuntimeError("Redis is not configured (set REDIS_URL or REDIS_HOST)")
+    return r
+
 
 def _key(session_id: str) -> str:
     return f"session:{session_id}"
 
 def get_session(session_id: str) -> Dict:
-    raw = r.get(_key(session_id))
+    raw = _redis().get(_key(session_id))
     return json.loads(raw) if raw else {"messages": []}
 
 def save_session(session_id: str, data: Dict):
     payload = json.dumps(data)
     if SESSION_TTL_S > 0:
-        r.setex(_key(session_id), SESSION_TTL_S, payload)
+        _redis().setex(_key(session_id), SESSION_TTL_S, payload)
     else:
-        r.set(_key(session_id), payload)
+        _redis().set(_key(session_id), payload)
 
 def append_message(session_id: str, role: str, content: str):
     s = get_session(session_id)
@@ -30,39 +42,94 @@ def append_message(session_id: str, role: str, content: str):
 def get_messages(session_id: str) -> List[Dict]:
     return get_session(session_id)["messages"]
 
+def _history_key(session_id: str) -> str:
+    return f"session:{session_id}:messages"
+
+
 class SessionStore:
+    """
+    Chat history as a Redis list per session (in-memory dict without Redis).
+
+    Each message is one list element, so an append is RPUSH + LTRIM + EXPIRE
+    (+ LRANGE when the caller needs the window) in a single MULTI/EXEC round
+    trip with constant-size payloads. Only the last `max_turns` messages are
+    kept; SESSION_MAX_TURNS counts individual user/assistant messages.
+    """
+
     def __init__(self):
-        self.redis_enabled = False
-        self._client = None
+        # Clients share the process-wide pools in redis_pool
+        self._client = get_redis()
+        self._aclient = get_async_redis()
+        self.redis_enabled = self._client is not None
         self._memory_store: Dict[str, List[Dict]] = {}
 
-        host = os.getenv("REDIS_HOST")
-        if host and redis:
-            self._client = redis.Redis(
-                host=host,
-                port=int(os.getenv("REDIS_PORT", "6379")),
-                db=int(os.getenv("REDIS_DB", "0")),
-                decode_responses=True,
-            )
-            self.redis_enabled = True
-
         self.ttl = int(os.getenv("REDIS_TTL_SECONDS", "86400"))
+        self.max_turns = max(1, int(os.getenv("SESSION_MAX_TURNS", "20")))
+
+    # ---- helpers ----
+
+    @staticmethod
+    def _decode(items: List[str]) -> List[Dict]:
+        return [json.loads(i) for i in items]
+
+    def _queue_append(self, pipe, session_id: str, role: str, content: str, window: bool):
+        key = _history_key(session_id)
+        pipe.rpush(key, json.dumps({"role": role, "content": content}))
+        pipe.ltrim(key, -self.max_turns, -1)
+        if self.ttl > 0:
+            pipe.expire(key, self.ttl)
+        if window:
+            pipe.lrange(key, 0, -1)
+
+    def _memory_append(self, session_id: str, role: str, content: str) -> List[Dict]:
+        history = self._memory_store.setdefault(session_id, [])
+        history.append({"role": role, "content": content})
+        del history[:-self.max_turns]
+        return list(history)
+
+    # ---- sync API ----
 
     def get_history(self, session_id: str) -> List[Dict]:
         if self.redis_enabled:
-            data = self._client.get(session_id)
-            return json.loads(data) if data else []
-        return self._memory_store.get(session_id, [])
+            return self._decode(self._client.lrange(_history_key(session_id), 0, -1))
+        return list(self._memory_store.get(session_id, []))
 
     def append(self, session_id: str, role: str, content: str):
-        history = self.get_history(session_id)
-        history.append({"role": role, "content": content})
+        if self.redis_enabled:
+            pipe = self._client.pipeline()
+            self._queue_append(pipe, session_id, role, content, window=False)
+            pipe.execute()
+        else:
+            self._memory_append(session_id, role, content)
 
+    def append_and_window(self, session_id: str, role: str, content: str) -> List[Dict]:
+        """Append one message and return the retained history in one round trip."""
         if self.redis_enabled:
-            self._client.setex(
-                session_id,
-                self.ttl,
-                json.dumps(history),
-            )
+            pipe = self._client.pipeline()
+            self._queue_append(pipe, session_id, role, content, window=True)
+            return self._decode(pipe.execute()[-1])
+        return self._memory_append(session_id, role, content)
+
+    # ---- async API ----
+
+    async def aget_history(self, session_id: str) -> List[Dict]:
+        if self.redis_enabled:
+            return self._decode(await self._aclient.lrange(_history_key(session_id), 0, -1))
+        return list(self._memory_store.get(session_id, []))
+
+    async def aappend(self, session_id: str, role: str, content: str):
+        if self.redis_enabled:
+            async with self._aclient.pipeline() as pipe:
+                self._queue_append(pipe, session_id, role, content, window=False)
+                await pipe.execute()
         else:
-            self._memory_store[session_id] = history
+            self._memory_append(session_id, role, content)
+
+    async def aappend_and_window(self, session_id: str, role: str, content: str) -> List[Dict]:
+        if self.redis_enabled:
+            async with self._aclient.pipeline() as pipe:
+                self._queue_append(pipe, session_id, role, content, window=True)
+                results = await pipe.execute()
+            return self._decode(results[-1])
+        return self._memory_append(session_id, role, content)
+
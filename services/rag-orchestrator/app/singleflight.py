@@ -0,0 +1,310 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import uuid
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import redis.asyncio as aioredis
+
+from .metrics import RAG_SINGLEFLIGHT_TOTAL
+from .redis_pool import get_async_redis
+from .resilience import remaining_s
+
+# ---------------------------------------------------------------------
+# Request coalescing (single-flight)
+# ---------------------------------------------------------------------
+# A chat turn runs as a Flight: a producer task (retrieval + generation)
+# that publishes sources, then tokens, then a final result, and any number
+# of subscribers (the HTTP requests) that replay and follow it. Concurrent
+# history-free requests for the same question share one Flight per worker.
+# With Redis, one worker holds a lock per key across replicas (renewed while
+# it produces); the others wait for the result it publishes under its lock
+# token instead of generating their own, and generate locally only if it
+# never arrives within their deadline. A result is only read by requests
+# that overlapped its leader, so it never acts as an answer cache.
+
+
+def normalize_question(text: str) -> str:
+    """Case, whitespace and trailing punctuation do not change the question."""
+    return re.sub(r"\s+", " ", text).strip().rstrip("?!. ").casefold()
+
+
+def flight_key(*parts: Any) -> str:
+    return hashlib.sha1("\x1f".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+
+
+class Flight:
+    """One chat turn's output, replayable by every request that joined it."""
+
+    def __init__(self, key: Optional[str] = None):
+        self.key = key
+        self.sources: Optional[List[Dict[str, Any]]] = None
+        self.parts: List[str] = []
+        self.meta: Dict[str, Any] = {}
+        self.error: Optional[BaseException] = None
+        self.done = False
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._admitted = asyncio.Event()
+        self._changed = asyncio.Condition()
+
+    # ---- producer side ----
+
+    async def _notify(self) -> None:
+        async with self._changed:
+            self._changed.notify_all()
+
+    async def set_sources(self, sources: List[Dict[str, Any]]) -> None:
+        self.sources = sources
+        await self._notify()
+
+    def admit(self) -> None:
+        """Generation may start (past admission control): responses can begin."""
+        self._admitted.set()
+
+    async def publish(self, delta: str) -> None:
+        self.parts.append(delta)
+        await self._notify()
+
+    async def finish(self, **meta: Any) -> None:
+        self.meta.update(meta)
+        self.done = True
+        self._admitted.set()
+        await self._notify()
+
+    async def fail(self, exc: BaseException) -> None:
+        self.error = exc
+        self.done = True
+        self._admitted.set()
+        await self._notify()
+
+    # ---- subscriber side ----
+
+    async def admitted(self) -> None:
+        """Wait until generation started; raises if the turn failed before that."""
+        await self._admitted.wait()
+        if self.error is not None and not self.parts:
+            raise self.error
+
+    async def tokens(self) -> AsyncIterator[str]:
+        """Every delta so far, then the rest as it is published."""
+        sent = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: len(self.parts) > sent or self.done)
+            while sent < len(self.parts):
+                sent += 1
+                yield self.parts[sent - 1]
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+
+    async def result(self) -> str:
+        async with self._changed:
+            await self._changed.wait_for(lambda: self.done)
+        if self.error is not None:
+            raise self.error
+        return "".join(self.parts)
+
+    @property
+    def answer(self) -> str:
+        return "".join(self.parts)
+
+    def leave(self) -> None:
+        """A subscriber is gone; the last one out stops an unfinished turn."""
+        self.subscribers -= 1
+        if self.subscribers <= 0 and not self.done and self.task is not None:
+            self.task.cancel()
+
+
+Producer = Callable[[Flight], Awaitable[Dict[str, Any]]]
+
+
+class SingleFlight:
+    """
+    Joins concurrent requests with the same key onto one Flight.
+
+    `produce(flight)` fills the flight and returns its final meta; meta with
+    `shareable=True` is also published to other replicas (answers produced
+    by a fallback or from partial failures are not).
+    """
+
+    _RELEASE = (
+        "if redis.call('get', KEYS[1]) == ARGV[1] then "
+        "return redis.call('del', KEYS[1]) else return 0 end"
+    )
+    _RENEW = (
+        "if redis.call('get', KEYS[1]) == ARGV[1] then "
+        "return redis.call('pexpire', KEYS[1], ARGV[2]) else return 0 end"
+    )
+
+    def __init__(
+        self,
+        redis_client: Optional[aioredis.Redis] = None,
+        lock_ttl_s: float = 30.0,
+        result_ttl_s: float = 10.0,
+        wait_s: float = 120.0,
+        poll_s: float = 0.1,
+    ):
+        self.redis = redis_client
+        self.lock_ttl_s = lock_ttl_s
+        self.result_ttl_s = result_ttl_s
+        self.wait_s = wait_s
+        self.poll_s = poll_s
+        self._flights: Dict[str, Flight] = {}
+
+    @staticmethod
+    def _lock_key(key: str) -> str:
+        return f"singleflight:{key}:lock"
+
+    @staticmethod
+    def _result_key(key: str, token: str) -> str:
+        return f"singleflight:{key}:result:{token}"
+
+    def start(self, produce: Producer, key: Optional[str] = None) -> Tuple[Flight, bool]:
+        """
+        The flight for `key` (a private one when key is None), started if new.
+        Returns (flight, joined) where joined means another request leads it.
+        Synchronous, so check-and-insert cannot interleave with other requests.
+        """
+        flight = self._flights.get(key) if key is not None else None
+        if flight is not None:
+            flight.subscribers += 1
+            RAG_SINGLEFLIGHT_TOTAL.labels(role="follower").inc()
+            return flight, True
+
+        flight = Flight(key)
+        flight.subscribers = 1
+        if key is not None:
+            self._flights[key] = flight
+            RAG_SINGLEFLIGHT_TOTAL.labels(role="leader").inc()
+        flight.task = asyncio.ensure_future(self._run(flight, produce))
+        return flight, False
+
+    async def _run(self, flight: Flight, produce: Producer) -> None:
+        token = None
+        renewal = None
+        try:
+            if flight.key is not None and self.redis is not None:
+                token = await self._lock(flight.key)
+                if token is None and await self._follow_remote(flight):
+                    return
+                if token:
+                    renewal = asyncio.ensure_future(self._keep_lock(flight.key, token))
+            meta = await produce(flight)
+            if token and meta.get("shareable"):
+                await self._share(flight, token, meta)
+            await flight.finish(**meta)
+        except asyncio.CancelledError as exc:
+            await flight.fail(exc)
+            raise
+        except Exception as exc:
+            await flight.fail(exc)
+        finally:
+            if renewal is not None:
+                renewal.cancel()
+            if flight.key is not None and self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+            if token is not None:
+                await self._unlock(flight.key, token)
+
+    # ---- across replicas ----
+
+    async def _lock(self, key: str) -> Optional[str]:
+        """Our lock token if this worker leads the key cluster-wide, else None."""
+        token = uuid.uuid4().hex
+        try:
+            ok = await self.redis.set(
+                self._lock_key(key), token, nx=True, px=int(self.lock_ttl_s * 1000)
+            )
+        except Exception as e:
+            print(f"[RAG] Single-flight lock skipped: {e}")
+            return ""  # Redis trouble: lead locally (falsy token, nothing to release)
+        return token if ok else None
+
+    async def _keep_lock(self, key: str, token: str) -> None:
+        """Extend our lock while producing: a generation may outlast lock_ttl_s."""
+        ttl_ms = int(self.lock_ttl_s * 1000)
+        while True:
+            await asyncio.sleep(self.lock_ttl_s / 3)
+            try:
+                if not await self.redis.eval(self._RENEW, 1, self._lock_key(key), token, ttl_ms):
+                    return  # lost it (expired while Redis was unreachable)
+            except Exception:
+                pass  # try again next period; the lock outlives a couple of misses
+
+    async def _unlock(self, key: str, token: str) -> None:
+        if not token:
+            return
+        try:
+            await self.redis.eval(self._RELEASE, 1, self._lock_key(key), token)
+        except Exception:
+            pass  # the lock expires on its own
+
+    async def _share(self, flight: Flight, token: str, meta: Dict[str, Any]) -> None:
+        payload = json.dumps({"answer": flight.answer, "sources": flight.sources or [], "meta": meta})
+        try:
+            await self.redis.set(
+                self._result_key(flight.key, token), payload, px=int(self.result_ttl_s * 1000)
+            )
+        except Exception as e:
+            print(f"[RAG] Single-flight result not shared: {e}")
+
+    async def _follow_remote(self, flight: Flight) -> bool:
+        """
+        Wait for the replica holding the lock to publish its result. False if
+        it gave up (lock gone or taken over without a result, or wait_s or
+        this request's deadline elapsed): then this worker produces the
+        answer itself.
+        """
+        loop = asyncio.get_running_loop()
+        wait_s = self.wait_s
+        left = remaining_s()
+        if left is not None:
+            wait_s = min(wait_s, left)
+        deadline = loop.time() + wait_s
+        lock_key = self._lock_key(flight.key)
+        try:
+            leader = await self.redis.get(lock_key)
+            if not leader:
+                return False
+            result_key = self._result_key(flight.key, leader)
+            while True:
+                # Lock first: a result published just before the release is still seen
+                held = await self.redis.get(lock_key) == leader
+                raw = await self.redis.get(result_key)
+                if raw:
+                    data = json.loads(raw)
+                    RAG_SINGLEFLIGHT_TOTAL.labels(role="remote").inc()
+                    await flight.set_sources(data.get("sources") or [])
+                    flight.admit()
+                    await flight.publish(data["answer"])
+                    meta = dict(data.get("meta") or {})
+                    meta.update(shareable=False, coalesced=True)
+                    await flight.finish(**meta)
+                    return True
+                if not held or loop.time() >= deadline:
+                    return False
+                await asyncio.sleep(self.poll_s)
+        except Exception as e:
+            print(f"[RAG] Single-flight remote wait skipped: {e}")
+        return False
+
+
+def build_single_flight_from_env() -> SingleFlight:
+    """Always usable for private flights; coalescing is gated in main.py."""
+    redis_client = None
+    if os.getenv("SINGLE_FLIGHT_REDIS", "true").lower() == "true":
+        redis_client = get_async_redis()
+    return SingleFlight(
+        redis_client=redis_client,
+        lock_ttl_s=float(os.getenv("SINGLE_FLIGHT_LOCK_TTL_S", "30")),
+        result_ttl_s=float(os.getenv("SINGLE_FLIGHT_RESULT_TTL_S", "10")),
+        wait_s=float(os.getenv("SINGLE_FLIGHT_WAIT_S", "120")),
+        poll_s=float(os.getenv("SINGLE_FLIGHT_POLL_S", "0.1")),
+    )
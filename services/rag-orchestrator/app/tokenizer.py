@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import os
+import threading
+from typing import List, Optional
+
+# ---------------------------------------------------------------------
+# Prompt token counting
+# ---------------------------------------------------------------------
+# Budgets are only as good as the counts behind them: ~4 chars/token is off
+# by 2x on clinical codes, numbers and non-English text. PROMPT_TOKENIZER
+# names the serving model's tokenizer (a tokenizer.json path baked into the
+# image, or a Hugging Face repo id); it is loaded once per process. Without
+# it (or if it fails to load) counts fall back to the character heuristic.
+
+
+class HeuristicTokenizer:
+    """~4 characters per token for English-like text."""
+
+    name = "heuristic"
+
+    def count(self, text: str) -> int:
+        return max(1, len(text) // 4) if text else 0
+
+    def count_many(self, texts: List[str]) -> List[int]:
+        return [self.count(t) for t in texts]
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        return text[: max(0, max_tokens) * 4]
+
+
+class HFTokenizer:
+    """A Hugging Face `tokenizers` tokenizer (Rust; encodes ~1M tokens/s)."""
+
+    def __init__(self, tokenizer, name: str):
+        self.tokenizer = tokenizer
+        self.name = name
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        return len(self.tokenizer.encode(text, add_special_tokens=False).ids)
+
+    def count_many(self, texts: List[str]) -> List[int]:
+        if not texts:
+            return []
+        return [len(e.ids) for e in self.tokenizer.encode_batch(texts, add_special_tokens=False)]
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        if max_tokens <= 0:
+            return ""
+        offsets = self.tokenizer.encode(text, add_special_tokens=False).offsets
+        if len(offsets) <= max_tokens:
+            return text
+        return text[: offsets[max_tokens - 1][1]]
+
+
+def load_tokenizer(spec: str):
+    spec = spec.strip()
+    if not spec:
+        return HeuristicTokenizer()
+    try:
+        from tokenizers import Tokenizer
+
+        if os.path.exists(spec):
+            tok = Tokenizer.from_file(spec)
+        else:
+            tok = Tokenizer.from_pretrained(spec)
+        tok.no_truncation()
+        tok.no_padding()
+        return HFTokenizer(tok, spec)
+    except Exception as e:
+        print(f"[RAG] Tokenizer '{spec}' unavailable, using heuristic counts: {e}")
+        return HeuristicTokenizer()
+
+
+_tokenizer = None
+_tokenizer_spec: Optional[str] = None
+_tokenizer_lock = threading.Lock()
+
+
+def get_tokenizer():
+    """The process-wide prompt tokenizer, reloaded only if PROMPT_TOKENIZER changes."""
+    global _tokenizer, _tokenizer_spec
+
+    spec = os.getenv("PROMPT_TOKENIZER", "").strip()
+    if spec == _tokenizer_spec:
+        return _tokenizer
+
+    with _tokenizer_lock:
+        if spec != _tokenizer_spec:
+            _tokenizer, _tokenizer_spec = load_tokenizer(spec), spec
+
+    return _tokenizer
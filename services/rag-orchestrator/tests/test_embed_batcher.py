@@ -0,0 +1,74 @@
+import asyncio
+
+from app.embed_batcher import EmbeddingBatcher
+
+def test_concurrent_queries_share_one_call():
+    calls = []
+
+    def embed(texts):
+        calls.append(list(texts))
+        return [[float(len(t))] for t in texts]
+
+    batcher = EmbeddingBatcher(embed, max_batch=16, max_wait_ms=20)
+
+    async def run():
+        return await asyncio.gather(
+            batcher.embed("a"),
+            batcher.embed("bb"),
+            batcher.embed("a"),
+        )
+
+    vectors = asyncio.run(run())
+
+    assert vectors == [[1.0], [2.0], [1.0]]
+    assert calls == [["a", "bb"]]  # one call, duplicates embedded once
+
+def test_flushes_when_batch_is_full():
+    calls = []
+
+    def embed(texts):
+        calls.append(len(texts))
+        return [[0.0] for _ in texts]
+
+    # A window long enough that only the size trigger can flush in time
+    batcher = EmbeddingBatcher(embed, max_batch=2, max_wait_ms=10_000)
+
+    async def run():
+        return await asyncio.wait_for(
+            asyncio.gather(batcher.embed("x"), batcher.embed("y")),
+            timeout=2,
+        )
+
+    asyncio.run(run())
+    assert calls == [2]
+
+def test_errors_propagate_to_every_waiter():
+    def embed(texts):
+        raise RuntimeError("onnx failure")
+
+    batcher = EmbeddingBatcher(embed, max_wait_ms=1)
+
+    async def run():
+        return await asyncio.gather(
+            batcher.embed("a"),
+            batcher.embed("b"),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+def test_in_flight_batches_are_held_and_awaited_on_close():
+    def embed(texts):
+        return [[1.0] for _ in texts]
+
+    batcher = EmbeddingBatcher(embed, max_wait_ms=10_000)
+
+    async def run():
+        waiter = asyncio.ensure_future(batcher.embed("a"))
+        await asyncio.sleep(0)  # queued, window still open
+        await batcher.aclose()
+        assert not batcher._tasks
+        return await waiter
+
+    assert asyncio.run(run()) == [1.0]
@@ -0,0 +1,100 @@
+import asyncio
+import time
+
+import pytest
+
+from app import guardrails_app, llm_router
+from app.resilience import BackendUnavailable
+
+
+class SlowAsyncClient:
+    """Records how many calls overlap: sequential calls never exceed one."""
+
+    def __init__(self, delay_s=0.01):
+        self.delay_s = delay_s
+        self.prompts = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def agenerate(self, prompt, max_tokens=512, temperature=0.2):
+        self.prompts.append(prompt)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay_s)
+        finally:
+            self.in_flight -= 1
+        return f"answer to {prompt}"
+
+    def generate(self, prompt, max_tokens=512, temperature=0.2):
+        self.prompts.append(prompt)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.delay_s)
+        finally:
+            self.in_flight -= 1
+        return f"answer to {prompt}"
+
+
+def test_agenerate_prompt_fans_out(monkeypatch):
+    client = SlowAsyncClient()
+    monkeypatch.setattr(llm_router, "build_kserve_client_from_env", lambda: client)
+    llm = guardrails_app.ExternalInferenceLLM()
+
+    result = asyncio.run(llm.agenerate_prompt(["a", "b", "c", "d"]))
+    assert [g[0].text for g in result.generations] == [f"answer to {p}" for p in "abcd"]
+    assert client.max_in_flight == 4  # concurrent, not one after another
+
+
+def test_acall_does_not_block_the_event_loop(monkeypatch):
+    client = SlowAsyncClient()
+    monkeypatch.setattr(llm_router, "build_kserve_client_from_env", lambda: client)
+    llm = guardrails_app.ExternalInferenceLLM()
+
+    async def run():
+        await asyncio.gather(*(llm.ainvoke(f"q{i}") for i in range(8)))
+
+    asyncio.run(run())
+    # A blocking call would hold the loop and keep the others from starting
+    assert client.max_in_flight == 8
+
+
+def test_generate_prompt_answers_every_prompt_in_order(monkeypatch):
+    client = SlowAsyncClient()
+    monkeypatch.setattr(llm_router, "build_kserve_client_from_env", lambda: client)
+    llm = guardrails_app.ExternalInferenceLLM()
+
+    result = llm.generate_prompt(["a", "b", "c"])
+    assert [g[0].text for g in result.generations] == [f"answer to {p}" for p in "abc"]
+    assert client.prompts == ["a", "b", "c"]
+
+
+def test_agenerate_with_guardrails_awaits_rails(monkeypatch):
+    class FakeRails:
+        async def generate_async(self, messages):
+            assert messages[0] == {"role": "system", "content": "grounded"}
+            return {"role": "assistant", "content": "safe answer"}
+
+    monkeypatch.setattr(guardrails_app, "get_rails_app", lambda: FakeRails())
+    answer = asyncio.run(guardrails_app.agenerate_with_guardrails("hi", "grounded"))
+    assert answer == "safe answer"
+
+
+def test_backend_outage_is_not_hidden_by_rails(monkeypatch):
+    class DownClient:
+        async def agenerate(self, prompt, max_tokens=512, temperature=0.2):
+            raise BackendUnavailable("vllm down")
+
+    class SwallowingRails:
+        # Like NeMo's runtime: a failed action becomes a canned reply
+        async def generate_async(self, messages):
+            try:
+                await guardrails_app.ExternalInferenceLLM().ainvoke("prompt")
+            except Exception:
+                return {"role": "assistant", "content": "I'm sorry, an internal error has occurred."}
+
+    monkeypatch.setattr(llm_router, "build_kserve_client_from_env", lambda: DownClient())
+    monkeypatch.setattr(guardrails_app, "get_rails_app", lambda: SwallowingRails())
+    with pytest.raises(BackendUnavailable):
+        asyncio.run(guardrails_app.agenerate_with_guardrails("hi", "grounded"))
@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+
+from app.limiter import AdaptiveLimiter, Overloaded
+
+
+def test_queue_full_is_shed_with_429():
+    async def run():
+        lim = AdaptiveLimiter(initial_limit=1, max_queue=1, queue_timeout_s=1)
+        await lim.acquire()
+        queued = asyncio.ensure_future(lim.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded) as exc:
+            await lim.acquire()
+        lim.release(0.1)
+        await queued
+        return lim, exc.value
+
+    lim, err = asyncio.run(run())
+
+    assert err.status_code == 429 and err.retry_after_s >= 1
+    assert lim.inflight == 1
+
+
+def test_queue_deadline_is_shed_with_503_and_frees_queue():
+    async def run():
+        lim = AdaptiveLimiter(initial_limit=1, max_queue=4, queue_timeout_s=0.01)
+        await lim.acquire()
+        with pytest.raises(Overloaded) as exc:
+            await lim.acquire()
+        return lim, exc.value
+
+    lim, err = asyncio.run(run())
+
+    assert err.status_code == 503
+    assert lim.inflight == 1 and not lim._waiters
+
+
+def test_slots_handed_over_in_fifo_order():
+    async def run():
+        lim = AdaptiveLimiter(initial_limit=1, queue_timeout_s=1)
+        order = []
+
+        async def call(name):
+            async with lim.slot():
+                order.append(name)
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(*(call(i) for i in range(4)))
+        return lim, order
+
+    lim, order = asyncio.run(run())
+
+    assert order == [0, 1, 2, 3]
+    assert lim.inflight == 0
+
+
+def test_aimd_shrinks_on_slow_or_failed_calls_and_grows_when_saturated():
+    async def run():
+        lim = AdaptiveLimiter(initial_limit=10, min_limit=2, latency_target_s=1.0, backoff=0.5)
+        for _ in range(10):
+            await lim.acquire()
+        lim.release(0.1)  # saturated and fast -> grow
+        grown = lim.limit
+        lim.release(5.0)  # slow, but no first token marked: not a latency signal
+        lim.release(5.0, first_token_s=5.0)  # first token over the target -> halve
+        slow = lim.limit
+        lim.release(0.1, ok=False)  # failure -> halve again
+        return grown, slow, lim.limit
+
+    grown, slow, failed = asyncio.run(run())
+
+    assert grown == pytest.approx(10.1)
+    assert slow == pytest.approx(5.05)
+    assert failed == pytest.approx(2.525)
+
+
+def test_cancelled_call_leaves_the_limit_alone():
+    async def run():
+        lim = AdaptiveLimiter(initial_limit=4, backoff=0.5)
+        started = asyncio.Event()
+
+        async def call():
+            async with lim.slot():
+                started.set()
+                await asyncio.sleep(10)
+
+        task = asyncio.ensure_future(call())
+        await started.wait()
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return lim
+
+    lim = asyncio.run(run())
+
+    assert lim.limit == 4
+    assert lim.inflight == 0
+
+
+def test_streams_are_judged_by_time_to_first_token():
+    async def run():
+        lim = AdaptiveLimiter(initial_limit=4, latency_target_s=0.05, backoff=0.5)
+        async with lim.slot() as held:
+            held.first_token()
+            await asyncio.sleep(0.1)  # long answer after a fast first token
+        return lim
+
+    assert asyncio.run(run()).limit == 4
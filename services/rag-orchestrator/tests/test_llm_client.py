@@ -0,0 +1,65 @@
+import asyncio
+
+import httpx
+
+from app import llm_client, llm_router
+
+
+def _env(monkeypatch):
+    monkeypatch.setenv("KSERVE_ENABLED", "true")
+    monkeypatch.setenv("KSERVE_BASE_URL", "http://vllm")
+    monkeypatch.setenv("KSERVE_COMPLETIONS_PATH", "/v1/chat/completions")
+    monkeypatch.setenv("LLM_MODEL_ID", "test-model")
+
+
+def _ok(request):
+    return httpx.Response(
+        200,
+        json={"choices": [{"message": {"content": " hello "}}], "usage": {}},
+    )
+
+
+def test_build_kserve_client_is_cached(monkeypatch):
+    _env(monkeypatch)
+
+    first = llm_router.build_kserve_client_from_env()
+    second = llm_router.build_kserve_client_from_env()
+    assert first is second
+
+    monkeypatch.setenv("LLM_TIMEOUT_S", "30")
+    third = llm_router.build_kserve_client_from_env()
+    assert third is not first
+    assert third.timeout.read == 30
+
+
+def test_build_kserve_client_disabled(monkeypatch):
+    monkeypatch.setenv("KSERVE_ENABLED", "false")
+    assert llm_router.build_kserve_client_from_env() is None
+
+
+def test_generate_uses_shared_client(monkeypatch):
+    _env(monkeypatch)
+    shared = httpx.Client(transport=httpx.MockTransport(_ok))
+    monkeypatch.setattr(llm_client, "_http", shared)
+
+    client = llm_router.build_kserve_client_from_env()
+    assert client.generate("hi") == "hello"
+    assert llm_client.get_http_client() is shared
+
+
+def test_agenerate(monkeypatch):
+    _env(monkeypatch)
+
+    async def run():
+        monkeypatch.setattr(
+            llm_client,
+            "_async_http",
+            httpx.AsyncClient(transport=httpx.MockTransport(_ok)),
+        )
+        client = llm_router.build_kserve_client_from_env()
+        try:
+            return await client.agenerate("hi")
+        finally:
+            await llm_client.aclose_http_clients()
+
+    assert asyncio.run(run()) == "hello"
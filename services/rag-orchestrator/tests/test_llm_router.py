@@ -0,0 +1,205 @@
+import asyncio
+import time
+
+import httpx
+
+from app import llm_client, llm_router
+from app.llm_router import Endpoint, LLMRouter, parse_endpoints
+from app.resilience import CircuitBreaker
+
+
+def _client(url):
+    return llm_client.KServeClient(
+        base_url=url,
+        completions_path="/v1/chat/completions",
+        model_id="test-model",
+        api_key=None,
+        timeout_s=30,
+        retries=1,
+        retry_backoff_s=0.0,
+        breaker_failures=2,
+        breaker_reset_s=60,
+        name=url,
+    )
+
+
+def _backends(monkeypatch, behaviour):
+    """behaviour: host -> (delay_s, status). Returns the per-host call log."""
+    calls = []
+
+    async def handler(request):
+        host = request.url.host
+        calls.append(host)
+        delay, status = behaviour[host]
+        await asyncio.sleep(delay)
+        if status != 200:
+            return httpx.Response(status)
+        if b'"stream": true' in request.content or b'"stream":true' in request.content:
+            body = (
+                f'data: {{"choices": [{{"delta": {{"content": "{host}"}}}}]}}\n\n'
+                "data: [DONE]\n\n"
+            )
+            return httpx.Response(200, text=body)
+        return httpx.Response(200, json={"choices": [{"message": {"content": host}}]})
+
+    monkeypatch.setattr(
+        llm_client, "_async_http", httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    )
+    return calls
+
+
+def _router(weights, **kw):
+    return LLMRouter([Endpoint(_client(f"http://{h}"), w) for h, w in weights.items()], **kw)
+
+
+def test_parse_endpoints():
+    assert parse_endpoints(" http://a:8080|2, https://b ,") == [
+        ("http://a:8080", 2.0),
+        ("https://b", 1.0),
+    ]
+
+
+def test_ranks_by_outstanding_and_latency():
+    router = _router({"a": 1, "b": 1}, policy="least_outstanding")
+    a, b = router.endpoints
+    a.outstanding = 3
+    assert router.ranked()[0] is b
+
+    router.policy = "ewma"
+    a.outstanding = b.outstanding = 0
+    a.ewma_s, b.ewma_s = 0.2, 2.0
+    assert router.ranked()[0] is a
+    # ...until the fast one is queued up enough
+    a.outstanding = 20
+    assert router.ranked()[0] is b
+
+
+def test_unhealthy_endpoint_is_ejected(monkeypatch):
+    calls = _backends(monkeypatch, {"a": (0, 503), "b": (0, 200)})
+    router = _router({"a": 100, "b": 1})  # a is always preferred while healthy
+
+    async def run():
+        try:
+            return [await router.agenerate("hi") for _ in range(3)]
+        finally:
+            await llm_client.aclose_http_clients()
+
+    assert asyncio.run(run()) == ["b", "b", "b"]
+    assert router.endpoints[0].client.is_down
+    assert calls.count("a") == 2  # until its breaker opened
+    assert not router.is_down
+
+
+def test_slow_primary_is_hedged(monkeypatch):
+    _backends(monkeypatch, {"a": (1.0, 200), "b": (0, 200)})
+    router = _router({"a": 100, "b": 1}, hedge=True, hedge_min_samples=1, hedge_max_ratio=1)
+    router._response.extend([0.02] * 10)
+    router._calls = 10
+
+    async def run():
+        try:
+            start = time.time()
+            answer = await router.agenerate("hi")
+            return answer, time.time() - start
+        finally:
+            await llm_client.aclose_http_clients()
+
+    answer, elapsed = asyncio.run(run())
+    assert answer == "b"
+    assert elapsed < 0.5
+    assert all(ep.outstanding == 0 for ep in router.endpoints)
+
+
+def test_stream_hedges_before_first_token(monkeypatch):
+    _backends(monkeypatch, {"a": (1.0, 200), "b": (0, 200)})
+    router = _router({"a": 100, "b": 1}, hedge=True, hedge_min_samples=1, hedge_max_ratio=1)
+    router._ttfb.extend([0.02] * 10)
+    router._calls = 10
+
+    async def run():
+        try:
+            return [d async for d in router.astream("hi")]
+        finally:
+            await llm_client.aclose_http_clients()
+
+    assert asyncio.run(run()) == ["b"]
+    assert all(ep.outstanding == 0 for ep in router.endpoints)
+
+
+def test_cancelled_hedge_loser_leaves_half_open_endpoint_usable(monkeypatch):
+    behaviour = {"a": (1.0, 200), "b": (0, 200)}
+    _backends(monkeypatch, behaviour)
+    router = _router({"a": 100, "b": 1}, hedge=True, hedge_min_samples=1, hedge_max_ratio=1)
+    router._response.extend([0.02] * 10)
+    router._calls = 10
+    a = router.endpoints[0].client
+    a.breaker.reset_timeout_s = 0.01
+    a.breaker.record_failure()
+    a.breaker.record_failure()
+    time.sleep(0.02)  # due for its half-open probe
+
+    async def run():
+        try:
+            # a's probe is the slow primary: b wins and a is cancelled
+            first = await router.agenerate("hi")
+            assert a.breaker.state == CircuitBreaker.HALF_OPEN
+            behaviour["a"] = (0, 200)
+            router.hedge = False
+            return first, await router.agenerate("hi")
+        finally:
+            await llm_client.aclose_http_clients()
+
+    assert asyncio.run(run()) == ("b", "a")
+    assert a.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_whole_generations_do_not_skew_stream_latency(monkeypatch):
+    _backends(monkeypatch, {"a": (0.05, 200), "b": (0, 200)})
+    router = _router({"a": 1, "b": 1}, hedge=True, hedge_min_samples=1, hedge_max_ratio=1)
+    a, b = router.endpoints
+    a.ewma_s, b.ewma_s = 0.01, 1.0
+    router._ttfb.extend([0.01] * 10)
+
+    async def run():
+        try:
+            for _ in range(5):
+                await router.agenerate("hi")
+        finally:
+            await llm_client.aclose_http_clients()
+
+    asyncio.run(run())
+    # Full-response times land in their own window and EWMA...
+    assert len(router._response) == 5
+    assert a.response_ewma_s > 0 or b.response_ewma_s > 0
+    # ...so stream ranking and the stream hedge delay are untouched
+    assert list(router._ttfb) == [0.01] * 10
+    assert (a.ewma_s, b.ewma_s) == (0.01, 1.0)
+    assert router.hedge_delay_s() == 0.01
+    assert router.ranked()[0] is a
+
+
+def test_factory_builds_router_for_several_urls(monkeypatch):
+    monkeypatch.setenv("KSERVE_ENABLED", "true")
+    monkeypatch.setenv("LLM_MODEL_ID", "test-model")
+    monkeypatch.setenv("KSERVE_BASE_URLS", "http://a|2,http://b")
+
+    router = llm_router.build_kserve_client_from_env()
+    assert isinstance(router, LLMRouter)
+    assert [ep.weight for ep in router.endpoints] == [2.0, 1.0]
+    assert [ep.name for ep in router.endpoints] == ["a", "b"]
+
+    monkeypatch.setenv("KSERVE_BASE_URLS", "http://a")
+    assert isinstance(llm_router.build_kserve_client_from_env(), llm_client.KServeClient)
+
+
+def test_factory_closes_the_client_it_replaces(monkeypatch):
+    monkeypatch.setenv("KSERVE_ENABLED", "true")
+    monkeypatch.setenv("LLM_MODEL_ID", "test-model")
+    monkeypatch.setenv("KSERVE_BASE_URLS", "http://a,http://b")
+    old = llm_router.build_kserve_client_from_env()
+
+    monkeypatch.setenv("KSERVE_BASE_URLS", "http://a,http://c")
+    new = llm_router.build_kserve_client_from_env()
+    assert new is not old
+    assert all(ep.closed for ep in old.endpoints)
+    assert not any(ep.closed for ep in new.endpoints)
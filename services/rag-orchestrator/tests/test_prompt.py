@@ -43,4 +43,92 @@ def test_build_prompt_none_history_equals_empty():
     p1 = build_prompt("Q", [], chat_history=None)
     p2 = build_prompt("Q", [], chat_history=[])
 
-    assert p1 == p2
\ No newline at end of file
+    assert p1 == p2
+
+class WordTokenizer:
+    """One token per whitespace-separated word."""
+
+    def count(self, text):
+        return len(text.split())
+
+    def count_many(self, texts):
+        return [self.count(t) for t in texts]
+
+    def truncate(self, text, max_tokens):
+        return " ".join(text.split()[:max_tokens])
+
+
+def test_current_question_not_repeated_in_history():
+    from app.prompt import assemble_prompt
+
+    history = [
+        {"role": "user", "content": "Hi"},
+        {"role": "assistant", "content": "Hello"},
+        {"role": "user", "content": "What is blood pressure?"},
+    ]
+
+    out = assemble_prompt("What is blood pressure?", [], history, tokenizer=WordTokenizer())
+
+    assert out.text.count("What is blood pressure?") == 1
+    assert "USER: Hi\nASSISTANT: Hello" in out.text
+
+
+def test_older_turns_compacted_then_dropped():
+    from app.prompt import PromptBudget, assemble_prompt
+
+    long_answer = " ".join(f"w{i}" for i in range(200))
+    history = [
+        {"role": "user", "content": "first question"},
+        {"role": "assistant", "content": long_answer},
+        {"role": "user", "content": "second question"},
+        {"role": "assistant", "content": long_answer},
+    ]
+    budget = PromptBudget(
+        context_window=4096,
+        history_max_tokens=60,
+        history_full_turns=1,
+        compact_turn_tokens=10,
+    )
+
+    out = assemble_prompt("Q", [], history, budget=budget, tokenizer=WordTokenizer())
+
+    # newest answer fills the budget up to the cap, older messages go first
+    assert out.history_tokens <= 60
+    assert out.turns_compacted == 1
+    assert out.turns_dropped == 3
+    assert "w0 w1" in out.text and "w199" not in out.text
+    assert "first question" not in out.text
+
+
+def test_context_kept_in_rank_order_within_budget():
+    from app.prompt import PromptBudget, assemble_prompt
+
+    chunks = [
+        RetrievedChunk(id=str(i), text=" ".join(["tok"] * 100), score=1.0 - i / 10, metadata={})
+        for i in range(5)
+    ]
+    tok = WordTokenizer()
+    fixed = assemble_prompt("Q", [], None, tokenizer=tok).tokens
+    budget = PromptBudget(context_window=fixed + 300 + 512 + 32, max_output_tokens=512)
+
+    out = assemble_prompt("Q", chunks, None, budget=budget, tokenizer=tok)
+
+    # two whole chunks, then a truncated third; the rest is dropped
+    assert [c.id for c in out.chunks] == ["0", "1", "2"]
+    assert out.tokens <= budget.prompt_tokens
+    assert "[source:3]" not in out.text
+
+
+def test_hf_tokenizer_counts_and_truncates_on_token_boundaries():
+    from tokenizers import Tokenizer
+    from tokenizers.models import WordLevel
+    from tokenizers.pre_tokenizers import Whitespace
+    from app.tokenizer import HFTokenizer
+
+    tok = Tokenizer(WordLevel({"[UNK]": 0, "blood": 1, "pressure": 2}, unk_token="[UNK]"))
+    tok.pre_tokenizer = Whitespace()
+    hf = HFTokenizer(tok, "test")
+
+    assert hf.count("blood pressure is high") == 4
+    assert hf.count_many(["blood", ""]) == [1, 0]
+    assert hf.truncate("blood pressure is high", 2) == "blood pressure"
@@ -0,0 +1,66 @@
+import asyncio
+
+from app import redis_pool
+
+
+def _reset_pools(monkeypatch):
+    monkeypatch.setattr(redis_pool, "_sync_pool", None)
+    monkeypatch.setattr(redis_pool, "_async_pool", None)
+
+
+def test_redis_not_configured_returns_none(monkeypatch):
+    _reset_pools(monkeypatch)
+    monkeypatch.delenv("REDIS_HOST", raising=False)
+    monkeypatch.delenv("REDIS_URL", raising=False)
+
+    assert redis_pool.get_redis() is None
+    assert redis_pool.get_async_redis() is None
+
+
+def test_redis_enabled_false_disables_pool(monkeypatch):
+    _reset_pools(monkeypatch)
+    monkeypatch.setenv("REDIS_HOST", "redis")
+    monkeypatch.setenv("REDIS_ENABLED", "false")
+
+    assert redis_pool.get_redis() is None
+
+
+def test_clients_share_one_pool(monkeypatch):
+    _reset_pools(monkeypatch)
+    monkeypatch.delenv("REDIS_URL", raising=False)
+    monkeypatch.delenv("REDIS_ENABLED", raising=False)
+    monkeypatch.setenv("REDIS_HOST", "redis")
+    monkeypatch.setenv("REDIS_MAX_CONNECTIONS", "7")
+    monkeypatch.setenv("REDIS_SOCKET_TIMEOUT_S", "0.5")
+
+    a = redis_pool.get_redis()
+    b = redis_pool.get_redis()
+
+    assert a.connection_pool is b.connection_pool
+    assert a.connection_pool.max_connections == 7
+    assert a.connection_pool.connection_kwargs["socket_timeout"] == 0.5
+    # Nothing is connected until the first command
+    assert redis_pool._pool_usage(a.connection_pool) == (0, 0)
+
+    asyncio.run(redis_pool.aclose_redis_pools())
+    assert redis_pool._sync_pool is None
+
+
+def test_redis_url_takes_precedence(monkeypatch):
+    _reset_pools(monkeypatch)
+    monkeypatch.delenv("REDIS_ENABLED", raising=False)
+    monkeypatch.setenv("REDIS_URL", "redis://cache:6380/2")
+    monkeypatch.setenv("REDIS_HOST", "redis")
+
+    client = redis_pool.get_async_redis()
+    kwargs = client.connection_pool.connection_kwargs
+
+    assert (kwargs["host"], kwargs["port"], kwargs["db"]) == ("cache", 6380, 2)
+    assert redis_pool._pool_usage(client.connection_pool) == (0, 0)
+
+
+def test_pool_usage_tolerates_missing_internals():
+    class Opaque:
+        pass
+
+    assert redis_pool._pool_usage(Opaque()) == (0, 0)
@@ -0,0 +1,132 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from app import reranker as reranker_mod
+from app import retriever as retriever_mod
+from app.retriever import QdrantRetriever
+
+
+class FakeTextEmbedding:
+    def __init__(self, model_name=None, **kwargs):
+        pass
+
+    def embed(self, texts):
+        for _ in texts:
+            yield np.array([0.1, 0.2, 0.3])
+
+    def query_embed(self, texts):
+        return self.embed(texts)
+
+
+class FakeCrossEncoder:
+    delay_s = 0.0
+    gate = None  # a threading.Event to hold the forward pass on
+    calls = []
+
+    def __init__(self, model_name=None, **kwargs):
+        pass
+
+    def rerank(self, query, documents, batch_size=64):
+        FakeCrossEncoder.calls.append(list(documents))
+        time.sleep(FakeCrossEncoder.delay_s)
+        if FakeCrossEncoder.gate is not None:
+            FakeCrossEncoder.gate.wait(5)
+        # Longer passages are "more relevant"
+        return [float(len(d)) for d in documents]
+
+
+class CountingClient:
+    def __init__(self):
+        self.limits = []
+
+    async def search(self, **kwargs):
+        self.limits.append(kwargs["limit"])
+        return [
+            SimpleNamespace(id="a", score=0.9, payload={"text": "short", "metadata": {}}),
+            SimpleNamespace(id="b", score=0.8, payload={"text": "a bit longer", "metadata": {}}),
+            SimpleNamespace(id="c", score=0.7, payload={"text": "the longest passage", "metadata": {}}),
+        ]
+
+
+def _retriever(monkeypatch, budget_ms=1000.0):
+    FakeCrossEncoder.calls = []
+    monkeypatch.setattr(retriever_mod, "TextEmbedding", FakeTextEmbedding)
+    monkeypatch.setattr(reranker_mod, "TextCrossEncoder", FakeCrossEncoder)
+    r = QdrantRetriever(
+        qdrant_url="http://fake",
+        collection="test",
+        top_k=2,
+        score_threshold=0.5,
+        rerank_model="fake/cross-encoder",
+        rerank_candidates=10,
+        rerank_budget_ms=budget_ms,
+        embed_batch_window_ms=0,
+    )
+    client = CountingClient()
+    monkeypatch.setattr(r, "aclient", client)
+    monkeypatch.setattr(r, "acollection_version", lambda: asyncio.sleep(0, result="v1"))
+    return r, client
+
+
+def test_rerank_overfetches_and_reorders(monkeypatch):
+    FakeCrossEncoder.delay_s = 0.0
+    r, client = _retriever(monkeypatch)
+
+    chunks = asyncio.run(r.aretrieve("query"))
+
+    assert client.limits == [10]
+    assert [c.id for c in chunks] == ["c", "b"]
+    assert chunks[0].rerank_score > chunks[1].rerank_score
+    assert len(FakeCrossEncoder.calls) == 1  # one forward pass for all candidates
+
+
+def test_rerank_over_budget_falls_back_to_vector_order(monkeypatch):
+    FakeCrossEncoder.delay_s = 0.2
+    r, client = _retriever(monkeypatch, budget_ms=20)
+
+    chunks = asyncio.run(r.aretrieve("query"))
+
+    assert [c.id for c in chunks] == ["a", "b"]
+    assert chunks[0].rerank_score is None
+    # Degraded results are not cached
+    asyncio.run(r.aretrieve("query"))
+    assert len(client.limits) == 2
+    FakeCrossEncoder.delay_s = 0.0
+
+
+def test_reranker_scores_only_uncached_candidates(monkeypatch):
+    FakeCrossEncoder.calls = []
+    monkeypatch.setattr(reranker_mod, "TextCrossEncoder", FakeCrossEncoder)
+    rr = reranker_mod.CrossEncoderReranker(model_name="fake")
+
+    first = rr.score("q", "query", ["a", "b"], ["x", "yy"])
+    second = rr.score("q", "query", ["b", "c"], ["yy", "zzz"])
+
+    assert first == [1.0, 2.0]
+    assert second == [2.0, 3.0]
+    assert FakeCrossEncoder.calls == [["x", "yy"], ["zzz"]]
+
+
+def test_over_budget_reranks_do_not_queue_up(monkeypatch):
+    FakeCrossEncoder.gate = threading.Event()
+    r, client = _retriever(monkeypatch, budget_ms=10)
+
+    async def run():
+        for _ in range(5):
+            chunks = await r.aretrieve("query")
+            assert chunks[0].rerank_score is None
+
+    try:
+        asyncio.run(run())
+        # The first rerank holds the worker; the rest were skipped instead
+        # of piling up behind it
+        assert r._rerank_executor._work_queue.qsize() == 0
+    finally:
+        FakeCrossEncoder.gate.set()
+        FakeCrossEncoder.gate = None
+    r._rerank_executor.shutdown(wait=True)
+    assert len(FakeCrossEncoder.calls) == 1
@@ -0,0 +1,191 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app import llm_client
+from app.resilience import (
+    BackendUnavailable,
+    CircuitBreaker,
+    CircuitOpen,
+    DeadlineExceeded,
+    RetryPolicy,
+    acall_with_retries,
+    deadline_scope,
+    remaining_s,
+)
+
+
+def _client(breaker_failures=5):
+    return llm_client.KServeClient(
+        base_url="http://vllm",
+        completions_path="/v1/chat/completions",
+        model_id="test-model",
+        api_key=None,
+        timeout_s=30,
+        retries=3,
+        retry_backoff_s=0.0,
+        breaker_failures=breaker_failures,
+        breaker_reset_s=60,
+    )
+
+
+def _transport(monkeypatch, statuses):
+    """Answer with `statuses` in turn (200 = success); returns the call log."""
+    calls = []
+
+    def handler(request):
+        status = statuses[min(len(calls), len(statuses) - 1)]
+        calls.append(status)
+        if status == 200:
+            return httpx.Response(200, json={"choices": [{"message": {"content": "ok"}}]})
+        return httpx.Response(status, json={"error": "nope"})
+
+    monkeypatch.setattr(llm_client, "_http", httpx.Client(transport=httpx.MockTransport(handler)))
+    return calls
+
+
+def test_retries_transient_status_then_succeeds(monkeypatch):
+    calls = _transport(monkeypatch, [503, 429, 200])
+    assert _client().generate("hi") == "ok"
+    assert calls == [503, 429, 200]
+
+
+def test_client_error_is_not_retried(monkeypatch):
+    calls = _transport(monkeypatch, [400])
+    client = _client()
+    with pytest.raises(httpx.HTTPStatusError):
+        client.generate("hi")
+    assert calls == [400]
+    # A bad request says nothing about backend health
+    assert client.breaker.failures == 0
+
+
+def test_exhausted_retries_raise_backend_unavailable(monkeypatch):
+    calls = _transport(monkeypatch, [502])
+    with pytest.raises(BackendUnavailable):
+        _client().generate("hi")
+    assert len(calls) == 4
+
+
+def test_breaker_opens_and_fails_fast(monkeypatch):
+    calls = _transport(monkeypatch, [503])
+    client = _client(breaker_failures=2)
+    with pytest.raises(BackendUnavailable):
+        client.generate("hi")
+    assert client.breaker.is_open
+    n = len(calls)
+    with pytest.raises(CircuitOpen):
+        client.generate("hi")
+    assert len(calls) == n
+
+
+def test_breaker_half_open_probe_closes_on_success():
+    breaker = CircuitBreaker("m", failure_threshold=1, reset_timeout_s=0.05)
+    breaker.before_call()
+    breaker.record_failure()
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+
+    time.sleep(0.06)
+    breaker.before_call()  # the probe
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()  # only one probe at a time
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.before_call()
+
+
+def test_deadline_bounds_attempts_and_backoff():
+    timeouts = []
+
+    async def call(timeout_s):
+        timeouts.append(timeout_s)
+        raise httpx.ConnectError("refused")
+
+    async def run():
+        with deadline_scope(0.2):
+            await acall_with_retries(call, RetryPolicy(10, 1.0, 1.0), timeout_s=30)
+
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(run())
+    # Each attempt got at most what was left of the deadline, and the
+    # (up to 1s) backoff never ran past it
+    assert time.monotonic() - start < 0.4
+    assert all(t <= 0.2 for t in timeouts)
+    assert timeouts == sorted(timeouts, reverse=True)
+
+
+def test_inner_deadline_cannot_extend_outer():
+    with deadline_scope(1.0):
+        with deadline_scope(10.0):
+            assert remaining_s() <= 1.0
+    assert remaining_s() is None
+
+
+def test_retry_after_is_honoured_and_capped():
+    policy = RetryPolicy(4, base_delay_s=0.1, max_delay_s=5.0)
+
+    def err(retry_after):
+        response = httpx.Response(429, headers={"Retry-After": retry_after})
+        response.request = httpx.Request("POST", "http://vllm")
+        return httpx.HTTPStatusError("busy", request=response.request, response=response)
+
+    assert policy.delay_s(0, err("2")) == 2.0
+    assert policy.delay_s(0, err("120")) == 5.0
+    assert 0 <= policy.delay_s(3, httpx.ConnectError("x")) <= 0.8
+
+
+def _half_open_breaker():
+    breaker = CircuitBreaker("m", failure_threshold=1, reset_timeout_s=0.02)
+    breaker.record_failure()
+    time.sleep(0.03)
+    return breaker
+
+
+def test_cancelled_probe_frees_the_breaker():
+    breaker = _half_open_breaker()
+
+    async def hang(timeout_s):
+        await asyncio.sleep(10)
+
+    async def run():
+        task = asyncio.ensure_future(acall_with_retries(hang, RetryPolicy(1), breaker))
+        await asyncio.sleep(0.01)  # the probe is in flight
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(run())
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.before_call() is True  # the next call gets to probe
+
+
+def test_probe_past_its_deadline_does_not_wedge_the_breaker():
+    breaker = _half_open_breaker()
+
+    async def slow(timeout_s):
+        # The per-attempt timeout (shrunk to the deadline) fires
+        await asyncio.sleep(timeout_s)
+        raise httpx.ReadTimeout("read timed out")
+
+    async def run():
+        with deadline_scope(0.05):
+            await acall_with_retries(slow, RetryPolicy(3, 0.0, 0.0), breaker)
+
+    with pytest.raises(BackendUnavailable):
+        asyncio.run(run())
+    # A timed-out probe counts as a failure: open again, visibly ejected
+    assert breaker.is_open
+
+    # A request already out of time never takes the probe slot
+    time.sleep(0.03)
+
+    async def expired():
+        with deadline_scope(0.0):
+            await acall_with_retries(slow, RetryPolicy(3), breaker)
+
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(expired())
+    assert breaker.before_call() is True
@@ -1,3 +1,6 @@
+import asyncio
+
+import anyio.to_thread
 import numpy as np
 from types import SimpleNamespace
 from app.retriever import QdrantRetriever, RetrievedChunk
@@ -7,6 +10,9 @@ class FakeEmbedder:
     def embed(self, texts):
         yield np.array([0.1, 0.2, 0.3])
 
+    def query_embed(self, texts):
+        return self.embed(texts)
+
 
 class FakeClient:
     def search(self, **kwargs):
@@ -78,4 +84,302 @@ def test_retriever_score_equals_threshold(monkeypatch):
     chunks = r.retrieve("query")
 
     assert len(chunks) == 1
-    assert chunks[0].text == "Edge case text"
\ No newline at end of file
+    assert chunks[0].text == "Edge case text"
+
+class FakeTextEmbedding:
+    loads = 0
+
+    def __init__(self, model_name=None, **kwargs):
+        FakeTextEmbedding.loads += 1
+
+    def embed(self, texts):
+        for _ in texts:
+            yield np.array([0.1, 0.2, 0.3])
+
+    def query_embed(self, texts):
+        return self.embed(texts)
+
+
+def test_get_retriever_is_built_once_and_reused(monkeypatch):
+    from app import retriever as retriever_mod
+
+    FakeTextEmbedding.loads = 0
+    monkeypatch.setattr(retriever_mod, "TextEmbedding", FakeTextEmbedding)
+    monkeypatch.setenv("QDRANT_URL", "http://fake")
+    retriever_mod.reset_retriever()
+
+    first = retriever_mod.get_retriever()
+    second = retriever_mod.get_retriever()
+
+    assert first is second
+    assert FakeTextEmbedding.loads == 1
+    retriever_mod.reset_retriever()
+
+
+def test_get_retriever_rebuilds_on_config_change(monkeypatch):
+    from app import retriever as retriever_mod
+
+    monkeypatch.setattr(retriever_mod, "TextEmbedding", FakeTextEmbedding)
+    monkeypatch.setenv("QDRANT_URL", "http://fake")
+    monkeypatch.setenv("RAG_TOP_K", "4")
+    retriever_mod.reset_retriever()
+
+    first = retriever_mod.get_retriever()
+    monkeypatch.setenv("RAG_TOP_K", "8")
+    second = retriever_mod.get_retriever()
+
+    assert first is not second
+    assert second.top_k == 8
+
+    monkeypatch.delenv("QDRANT_URL")
+    assert retriever_mod.get_retriever() is None
+    retriever_mod.reset_retriever()
+
+
+def test_replaced_retriever_is_closed(monkeypatch):
+    from app import retriever as retriever_mod
+
+    monkeypatch.setattr(retriever_mod, "TextEmbedding", FakeTextEmbedding)
+    monkeypatch.setattr(retriever_mod, "_RETIRE_GRACE_S", 0)
+    monkeypatch.setenv("QDRANT_URL", "http://fake")
+    monkeypatch.setenv("RAG_TOP_K", "4")
+    retriever_mod.reset_retriever()
+
+    # Without an event loop the threads and sync client are closed right away
+    first = retriever_mod.get_retriever()
+    monkeypatch.setenv("RAG_TOP_K", "8")
+    second = retriever_mod.get_retriever()
+    assert first._embed_executor._shutdown and first._rerank_executor._shutdown
+    assert not second._embed_executor._shutdown
+
+    # From a FastAPI worker thread the close, async client included, runs on the loop
+    closed = []
+
+    async def aclose():
+        closed.append(True)
+
+    monkeypatch.setattr(second.aclient, "close", aclose)
+
+    async def run():
+        monkeypatch.setenv("RAG_TOP_K", "6")
+        await anyio.to_thread.run_sync(retriever_mod.get_retriever)
+        await asyncio.sleep(0.01)
+
+    asyncio.run(run())
+    assert closed and second._embed_executor._shutdown
+    retriever_mod.reset_retriever()
+
+
+class AsyncFakeClient:
+    async def search(self, **kwargs):
+        return FakeClient().search(**kwargs)
+
+
+def test_aretrieve_filters_by_score(monkeypatch):
+    import asyncio
+    from app import retriever as retriever_mod
+
+    monkeypatch.setattr(retriever_mod, "TextEmbedding", FakeTextEmbedding)
+    r = QdrantRetriever(
+        qdrant_url="http://fake",
+        collection="test",
+        score_threshold=0.5,
+    )
+    monkeypatch.setattr(r, "aclient", AsyncFakeClient())
+
+    chunks = asyncio.run(r.aretrieve("query"))
+
+    assert [c.text for c in chunks] == ["Medical text"]
+
+
+class CountingEmbedding(FakeTextEmbedding):
+    calls = 0
+
+    def embed(self, texts):
+        CountingEmbedding.calls += 1
+        return super().embed(texts)
+
+
+class VersionedAsyncClient:
+    def __init__(self):
+        self.searches = 0
+        self.version = "v1"
+
+    async def search(self, **kwargs):
+        self.searches += 1
+        return FakeClient().search(**kwargs)
+
+    async def retrieve(self, **kwargs):
+        return [SimpleNamespace(payload={"version": self.version})]
+
+
+def test_aretrieve_memoizes_embedding_and_search(monkeypatch):
+    import asyncio
+    from app import retriever as retriever_mod
+
+    CountingEmbedding.calls = 0
+    monkeypatch.setattr(retriever_mod, "TextEmbedding", CountingEmbedding)
+    r = QdrantRetriever(qdrant_url="http://fake", collection="test", score_threshold=0.5)
+    client = VersionedAsyncClient()
+    monkeypatch.setattr(r, "aclient", client)
+
+    async def run():
+        first = await r.aretrieve("What is  migraine?")
+        second = await r.aretrieve("what is migraine?")
+        return first, second
+
+    first, second = asyncio.run(run())
+
+    assert [c.text for c in first] == [c.text for c in second] == ["Medical text"]
+    assert CountingEmbedding.calls == 1
+    assert client.searches == 1
+
+
+def test_search_cache_invalidated_by_collection_version(monkeypatch):
+    import asyncio
+    from app import retriever as retriever_mod
+
+    monkeypatch.setattr(retriever_mod, "TextEmbedding", FakeTextEmbedding)
+    r = QdrantRetriever(
+        qdrant_url="http://fake",
+        collection="test",
+        version_ttl_s=0,
+    )
+    client = VersionedAsyncClient()
+    monkeypatch.setattr(r, "aclient", client)
+
+    async def run():
+        await r.aretrieve("query")
+        client.version = "v2"
+        await r.aretrieve("query")
+
+    asyncio.run(run())
+
+    assert client.searches == 2
+
+
+class FakeSparseEmbedding:
+    def __init__(self, model_name=None, **kwargs):
+        pass
+
+    def query_embed(self, query):
+        yield SimpleNamespace(indices=np.array([3, 7]), values=np.array([1.0, 1.0]))
+
+
+class HybridAsyncClient:
+    def __init__(self):
+        self.requests = []
+
+    async def query_points(self, **kwargs):
+        self.requests.append(kwargs)
+        # RRF scores are rank-based and far below any cosine threshold
+        return SimpleNamespace(points=[
+            SimpleNamespace(id="1", score=0.5, payload={"text": "ICD-10 E11", "metadata": {}}),
+            SimpleNamespace(id="2", score=0.016, payload={"text": "Metformin", "metadata": {}}),
+        ])
+
+
+def test_aretrieve_hybrid_fuses_dense_and_sparse_in_one_call(monkeypatch):
+    import asyncio
+    from app import retriever as retriever_mod
+
+    monkeypatch.setattr(retriever_mod, "TextEmbedding", FakeTextEmbedding)
+    monkeypatch.setattr(retriever_mod, "SparseTextEmbedding", FakeSparseEmbedding)
+    r = QdrantRetriever(
+        qdrant_url="http://fake",
+        collection="test",
+        top_k=2,
+        score_threshold=0.3,
+        sparse_model="Qdrant/bm25",
+        embed_batch_window_ms=0,
+    )
+    client = HybridAsyncClient()
+    monkeypatch.setattr(r, "aclient", client)
+    monkeypatch.setattr(r, "acollection_version", lambda: asyncio.sleep(0, result="v1"))
+
+    chunks = asyncio.run(r.aretrieve("metformin E11"))
+
+    assert [c.text for c in chunks] == ["ICD-10 E11", "Metformin"]
+    assert len(client.requests) == 1
+    req = client.requests[0]
+    dense, sparse = req["prefetch"]
+    assert (dense.using, sparse.using) == ("dense", "sparse")
+    assert dense.score_threshold == 0.3 and sparse.score_threshold is None
+    assert sparse.query.indices == [3, 7]
+    assert req["query"].fusion == "rrf"
+    assert req["limit"] == 2 and dense.limit == 8
+
+
+class RecordingClient:
+    def __init__(self):
+        self.requests = []
+
+    def search(self, **kwargs):
+        self.requests.append(kwargs)
+        return FakeClient().search(**kwargs)
+
+
+def test_search_params_from_env_reach_qdrant(monkeypatch):
+    from app import retriever as retriever_mod
+
+    monkeypatch.setattr(retriever_mod, "TextEmbedding", FakeTextEmbedding)
+    monkeypatch.setenv("QDRANT_URL", "http://fake")
+    monkeypatch.setenv("RAG_HNSW_EF", "128")
+    monkeypatch.setenv("RAG_QUANTIZATION_RESCORE", "true")
+    monkeypatch.setenv("RAG_QUANTIZATION_OVERSAMPLING", "2.0")
+    r = retriever_mod.build_retriever_from_env()
+    client = RecordingClient()
+    monkeypatch.setattr(r, "client", client)
+
+    r.retrieve("query")
+
+    params = client.requests[0]["search_params"]
+    assert params.hnsw_ef == 128 and params.exact is False
+    assert params.quantization.rescore is True
+    assert params.quantization.oversampling == 2.0
+
+
+def test_default_search_params_leave_collection_defaults():
+    from app.retriever import build_search_params
+
+    assert build_search_params() is None
+    assert build_search_params(exact=True).quantization is None
+
+
+class PrefixRecordingEmbedding(FakeTextEmbedding):
+    seen = []
+
+    def query_embed(self, texts):
+        PrefixRecordingEmbedding.seen.extend(texts)
+        return self.embed(texts)
+
+
+def test_query_instruction_prefixes_queries_only(monkeypatch):
+    from app import retriever as retriever_mod
+
+    monkeypatch.setattr(retriever_mod, "TextEmbedding", PrefixRecordingEmbedding)
+    monkeypatch.setenv("QDRANT_URL", "http://fake")
+    monkeypatch.setenv("EMBEDDING_MODEL", "BAAI/bge-small-en-v1.5")
+    monkeypatch.setenv("RAG_QUERY_INSTRUCTION", "auto")
+    r = retriever_mod.build_retriever_from_env()
+    monkeypatch.setattr(r, "client", FakeClient())
+    PrefixRecordingEmbedding.seen = []
+
+    r.retrieve("what is migraine?")
+
+    assert PrefixRecordingEmbedding.seen == [
+        "Represent this sentence for searching relevant passages: what is migraine?"
+    ]
+    assert retriever_mod.query_instruction("BAAI/bge-small-en-v1.5", "") == ""
+    assert retriever_mod.query_instruction("unknown/model", "auto") == ""
+    assert retriever_mod.query_instruction("any", "query: ") == "query: "
+
+
+def test_onnx_threads_follow_cpu_limit(monkeypatch):
+    from app import retriever as retriever_mod
+
+    monkeypatch.setattr(retriever_mod, "cpu_limit", lambda: 1.5)
+    assert retriever_mod.onnx_threads() == 2
+    assert retriever_mod.onnx_threads(3) == 3
+    monkeypatch.setattr(retriever_mod, "cpu_limit", lambda: None)
+    assert retriever_mod.onnx_threads() is None
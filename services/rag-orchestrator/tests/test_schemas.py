@@ -1,4 +1,4 @@
-from app.schemas import ChatRequest, ChatResponse, ChatMessage
+from app.schemas import ChatRequest, ChatResponse, ChatMessage, ChatSource
 from pydantic import ValidationError
 
 
@@ -24,3 +24,8 @@ def test_chat_response():
         context_used=2,
     )
     assert resp.context_used == 2
+
+
+def test_chat_source_defaults_metadata():
+    src = ChatSource(id="1", score=0.7)
+    assert src.model_dump() == {"id": "1", "score": 0.7, "rerank_score": None, "metadata": {}}
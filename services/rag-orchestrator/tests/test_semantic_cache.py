@@ -0,0 +1,124 @@
+import asyncio
+
+from app.semantic_cache import SemanticCache, make_scope
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.ops = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __getattr__(self, name):
+        def op(*args, **kwargs):
+            self.ops.append((name, args, kwargs))
+        return op
+
+    async def execute(self):
+        for name, args, kwargs in self.ops:
+            await getattr(self.redis, name)(*args, **kwargs)
+
+
+class FakeAsyncRedis:
+    def __init__(self):
+        self.kv = {}
+        self.zsets = {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def setex(self, key, ttl, value):
+        self.kv[key] = value
+
+    async def mget(self, keys):
+        return [self.kv.get(k) for k in keys]
+
+    async def zadd(self, key, mapping):
+        self.zsets.setdefault(key, {}).update(mapping)
+
+    async def zrevrange(self, key, start, end):
+        items = sorted(self.zsets.get(key, {}).items(), key=lambda kv: kv[1], reverse=True)
+        return [k for k, _ in items][start:end + 1]
+
+    async def zremrangebyscore(self, key, lo, hi):
+        pass
+
+    async def zremrangebyrank(self, key, start, end):
+        pass
+
+    async def expire(self, key, ttl):
+        pass
+
+
+def test_front_tier_hit_above_threshold():
+    cache = SemanticCache(threshold=0.9)
+    scope = make_scope("docs", "v1", "1", "model")
+
+    async def run():
+        await cache.store(scope, [1.0, 0.0], "answer", sources=[{"id": "1"}])
+        near = await cache.lookup(scope, [0.99, 0.05])
+        far = await cache.lookup(scope, [0.0, 1.0])
+        return near, far
+
+    near, far = asyncio.run(run())
+
+    assert near is not None
+    assert near.answer == "answer"
+    assert near.sources == [{"id": "1"}]
+    assert near.similarity > 0.9
+    assert far is None
+
+
+def test_scopes_are_isolated():
+    cache = SemanticCache(threshold=0.9)
+
+    async def run():
+        await cache.store(make_scope("docs", "v1"), [1.0, 0.0], "old")
+        return await cache.lookup(make_scope("docs", "v2"), [1.0, 0.0])
+
+    assert asyncio.run(run()) is None
+
+
+def test_redis_tier_shared_between_instances():
+    redis = FakeAsyncRedis()
+    writer = SemanticCache(redis_client=redis, threshold=0.9)
+    reader = SemanticCache(redis_client=redis, threshold=0.9)
+
+    async def run():
+        await writer.store("s", [0.0, 1.0, 0.0], "shared")
+        return await reader.lookup("s", [0.0, 1.0, 0.01])
+
+    hit = asyncio.run(run())
+
+    assert hit is not None
+    assert hit.answer == "shared"
+    # promoted into the reader's front tier
+    assert len(reader.front) == 1
+
+
+def test_front_hit_refreshes_recency_in_both_tiers():
+    redis = FakeAsyncRedis()
+    cache = SemanticCache(redis_client=redis, threshold=0.9, front_max_entries=2)
+    scope = make_scope("docs", "v1", "1", "model")
+
+    async def run():
+        await cache.store(scope, [1.0, 0.0], "old")
+        await cache.store(scope, [0.0, 1.0], "newer")
+        lru = redis.zsets[cache._lru_key(scope)]
+        before = dict(lru)
+        assert (await cache.lookup(scope, [1.0, 0.01])).answer == "old"
+        # "old" is now the most recent: the next store evicts "newer" instead
+        await cache.store(scope, [0.7, -0.7], "third")
+        return before, lru
+
+    before, lru = asyncio.run(run())
+
+    answers = {value[1].answer for _, value in cache.front.items()}
+    assert answers == {"old", "third"}
+    old_id = min(before, key=before.get)  # stored first
+    assert lru[old_id] > before[old_id]
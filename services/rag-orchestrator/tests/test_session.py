@@ -83,4 +83,104 @@ def test_module_level_append_and_get_messages(monkeypatch):
     assert msgs[0]["role"] == "user"
     assert msgs[0]["content"] == "hello"
     assert msgs[1]["role"] == "assistant"
-    assert msgs[1]["content"] == "hi"
\ No newline at end of file
+    assert msgs[1]["content"] == "hi"
+
+def test_session_store_async_memory_fallback(monkeypatch):
+    import asyncio
+
+    monkeypatch.delenv("REDIS_HOST", raising=False)
+    store = SessionStore()
+
+    async def run():
+        await store.aappend("s1", "user", "hello")
+        await store.aappend("s1", "assistant", "hi")
+        return await store.aget_history("s1")
+
+    history = asyncio.run(run())
+    assert [m["content"] for m in history] == ["hello", "hi"]
+
+
+class FakeListRedis:
+    """Just enough of redis-py's list + pipeline API for SessionStore."""
+
+    def __init__(self):
+        self.lists = {}
+        self.ttls = {}
+        self.round_trips = 0
+
+    def pipeline(self):
+        return FakeListPipeline(self)
+
+    def lrange(self, key, start, end):
+        self.round_trips += 1
+        return self._lrange(key, start, end)
+
+    def _lrange(self, key, start, end):
+        items = self.lists.get(key, [])
+        end = len(items) if end == -1 else end + 1
+        return items[start:end] if start >= 0 else items[start:][: end or None]
+
+
+class FakeListPipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.ops = []
+
+    def rpush(self, key, value):
+        self.ops.append(lambda: self.redis.lists.setdefault(key, []).append(value) or 1)
+
+    def ltrim(self, key, start, end):
+        def op():
+            self.redis.lists[key] = self.redis.lists.get(key, [])[start:]
+            return True
+        self.ops.append(op)
+
+    def expire(self, key, ttl):
+        self.ops.append(lambda: self.redis.ttls.__setitem__(key, ttl) or True)
+
+    def lrange(self, key, start, end):
+        self.ops.append(lambda: self.redis._lrange(key, start, end))
+
+    def execute(self):
+        self.redis.round_trips += 1
+        return [op() for op in self.ops]
+
+
+def _redis_store(monkeypatch, max_turns="4"):
+    monkeypatch.delenv("REDIS_HOST", raising=False)
+    monkeypatch.setenv("SESSION_MAX_TURNS", max_turns)
+    store = SessionStore()
+    store._client = FakeListRedis()
+    store.redis_enabled = True
+    return store
+
+
+def test_session_store_redis_list_window_is_bounded(monkeypatch):
+    store = _redis_store(monkeypatch, max_turns="4")
+
+    for i in range(6):
+        window = store.append_and_window("s1", "user", f"m{i}")
+
+    assert [m["content"] for m in window] == ["m2", "m3", "m4", "m5"]
+    assert store.get_history("s1") == window
+    assert store._client.ttls["session:s1:messages"] == store.ttl
+
+
+def test_session_store_append_and_window_is_one_round_trip(monkeypatch):
+    store = _redis_store(monkeypatch)
+
+    store.append_and_window("s1", "user", "hello")
+
+    assert store._client.round_trips == 1
+
+
+def test_session_store_memory_window_is_bounded(monkeypatch):
+    monkeypatch.delenv("REDIS_HOST", raising=False)
+    monkeypatch.setenv("SESSION_MAX_TURNS", "2")
+    store = SessionStore()
+
+    store.append("s1", "user", "a")
+    store.append("s1", "assistant", "b")
+    window = store.append_and_window("s1", "user", "c")
+
+    assert [m["content"] for m in window] == ["b", "c"]
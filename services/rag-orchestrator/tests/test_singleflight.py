@@ -0,0 +1,224 @@
+import asyncio
+
+import pytest
+
+from app.resilience import deadline_scope
+from app.singleflight import SingleFlight, flight_key, normalize_question
+
+
+class FakeAsyncRedis:
+    def __init__(self):
+        self.kv = {}
+        self.renewals = 0
+
+    async def set(self, key, value, nx=False, px=None):
+        if nx and key in self.kv:
+            return None
+        self.kv[key] = value
+        return True
+
+    async def get(self, key):
+        return self.kv.get(key)
+
+    async def exists(self, key):
+        return int(key in self.kv)
+
+    async def eval(self, script, numkeys, key, token, *args):
+        if self.kv.get(key) != token:
+            return 0
+        if "pexpire" in script:
+            self.renewals += 1
+        else:
+            del self.kv[key]
+        return 1
+
+
+def _producer(calls, answer="hello", delay=0.05, **meta):
+    async def produce(flight):
+        calls.append(1)
+        await flight.set_sources([{"id": "1"}])
+        flight.admit()
+        await asyncio.sleep(delay)
+        for part in answer.split(" "):
+            await flight.publish(part)
+        return {"shareable": True, **meta}
+
+    return produce
+
+
+def test_normalized_questions_share_a_key():
+    assert normalize_question("  What is  FLU?! ") == normalize_question("what is flu")
+    assert flight_key("a", 1) != flight_key("a", 2)
+
+
+def test_concurrent_requests_share_one_flight():
+    sf = SingleFlight()
+    calls = []
+
+    async def request():
+        flight, joined = sf.start(_producer(calls), key="k")
+        try:
+            return await flight.result(), joined
+        finally:
+            flight.leave()
+
+    async def run():
+        return await asyncio.gather(*[request() for _ in range(5)])
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert [answer for answer, _ in results] == ["hello"] * 5
+    assert [joined for _, joined in results].count(False) == 1
+    assert sf._flights == {}
+
+
+def test_private_flights_do_not_coalesce():
+    sf = SingleFlight()
+    calls = []
+
+    async def run():
+        flights = [sf.start(_producer(calls))[0] for _ in range(3)]
+        return [await f.result() for f in flights]
+
+    assert asyncio.run(run()) == ["hello"] * 3
+    assert len(calls) == 3
+
+
+def test_followers_replay_streamed_tokens():
+    sf = SingleFlight()
+    calls = []
+
+    async def run():
+        leader, _ = sf.start(_producer(calls, answer="a b c"), key="k")
+        await leader.admitted()
+        first = [t async for t in leader.tokens()]
+        # joined once the flight is done: the key is free again
+        again, joined = sf.start(_producer(calls, answer="x"), key="k")
+        return first, await again.result(), joined
+
+    first, again, joined = asyncio.run(run())
+    assert first == ["a", "b", "c"]
+    assert again == "x" and not joined
+
+
+def test_failure_reaches_every_subscriber():
+    sf = SingleFlight()
+
+    async def produce(flight):
+        await asyncio.sleep(0.01)
+        raise RuntimeError("backend exploded")
+
+    async def run():
+        a, _ = sf.start(produce, key="k")
+        b, joined = sf.start(produce, key="k")
+        assert joined
+        for flight in (a, b):
+            with pytest.raises(RuntimeError):
+                await flight.admitted()
+
+    asyncio.run(run())
+
+
+def test_last_subscriber_leaving_cancels_the_turn():
+    sf = SingleFlight()
+    started = []
+
+    async def produce(flight):
+        started.append(1)
+        await asyncio.sleep(10)
+        return {}
+
+    async def run():
+        flight, _ = sf.start(produce, key="k")
+        await asyncio.sleep(0)
+        flight.leave()
+        await asyncio.sleep(0.01)
+        return flight
+
+    flight = asyncio.run(run())
+    assert started and flight.done
+    assert isinstance(flight.error, asyncio.CancelledError)
+
+
+def test_replicas_share_one_generation_through_redis():
+    redis = FakeAsyncRedis()
+    replica_a = SingleFlight(redis_client=redis, poll_s=0.01)
+    replica_b = SingleFlight(redis_client=redis, poll_s=0.01)
+    calls_a, calls_b = [], []
+
+    async def run():
+        a, _ = replica_a.start(_producer(calls_a, answer="from-a", usage={"t": 1}), key="k")
+        await asyncio.sleep(0.01)  # a holds the lock
+        b, joined = replica_b.start(_producer(calls_b, answer="from-b"), key="k")
+        return await a.result(), await b.result(), b, joined
+
+    answer_a, answer_b, b, joined = asyncio.run(run())
+    assert (answer_a, answer_b) == ("from-a", "from-a")
+    assert not joined  # b leads locally but follows a across replicas
+    assert calls_a == [1] and calls_b == []
+    assert b.sources == [{"id": "1"}]
+    assert b.meta["coalesced"] and not b.meta["shareable"]
+    assert "singleflight:k:lock" not in redis.kv
+
+
+def test_remote_leader_without_result_falls_back_to_local():
+    redis = FakeAsyncRedis()
+    redis.kv["singleflight:k:lock"] = "someone-else"
+    sf = SingleFlight(redis_client=redis, wait_s=0.05, poll_s=0.01)
+    calls = []
+
+    async def run():
+        flight, _ = sf.start(_producer(calls), key="k")
+        return await flight.result()
+
+    assert asyncio.run(run()) == "hello"
+    assert calls == [1]
+
+
+def test_result_of_an_earlier_leader_is_not_served():
+    redis = FakeAsyncRedis()
+    # A finished flight's result is still in Redis; a new leader holds the key
+    redis.kv["singleflight:k:result:old-leader"] = '{"answer": "stale", "sources": []}'
+    redis.kv["singleflight:k:lock"] = "new-leader"
+    sf = SingleFlight(redis_client=redis, wait_s=0.05, poll_s=0.01)
+    calls = []
+
+    async def run():
+        flight, _ = sf.start(_producer(calls), key="k")
+        return await flight.result()
+
+    assert asyncio.run(run()) == "hello"
+    assert calls == [1]
+
+
+def test_remote_wait_is_bounded_by_the_request_deadline():
+    redis = FakeAsyncRedis()
+    redis.kv["singleflight:k:lock"] = "someone-else"
+    sf = SingleFlight(redis_client=redis, wait_s=60, poll_s=0.01)
+    calls = []
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        with deadline_scope(0.05):
+            flight, _ = sf.start(_producer(calls, delay=0), key="k")
+        start = loop.time()
+        await flight.result()
+        return loop.time() - start
+
+    # Gave up on the remote leader at its own deadline, not after wait_s
+    assert asyncio.run(run()) < 1.0
+    assert calls == [1]
+
+
+def test_leader_renews_its_lock_while_producing():
+    redis = FakeAsyncRedis()
+    sf = SingleFlight(redis_client=redis, lock_ttl_s=0.03)
+    calls = []
+
+    async def run():
+        flight, _ = sf.start(_producer(calls, delay=0.1), key="k")
+        return await flight.result()
+
+    assert asyncio.run(run()) == "hello"
+    assert redis.renewals >= 2
+    assert "singleflight:k:lock" not in redis.kv
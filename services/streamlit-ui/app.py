@@ -24,6 +24,9 @@ RAG_API_URL = os.getenv(
 
 REQUEST_TIMEOUT_S = int(os.getenv("RAG_API_TIMEOUT_S", "120"))
 
+# Render tokens as they arrive via /api/chat/stream (SSE)
+STREAMING_ENABLED = os.getenv("RAG_API_STREAM", "true").lower() == "true"
+
 # -----------------------
 # Structured stdout logger (for Filebeat)
 # -----------------------
@@ -34,6 +37,38 @@ _handler = logging.StreamHandler()
 _handler.setFormatter(logging.Formatter("%(message)s"))
 logger.addHandler(_handler)
 
+# -----------------------
+# SSE helpers
+# -----------------------
+def iter_sse(resp):
+    """Yield (event, data) pairs from a text/event-stream response."""
+    event, data_lines = "message", []
+    for line in resp.iter_lines(chunk_size=None, decode_unicode=True):
+        if line is None:
+            continue
+        if not line:
+            if data_lines:
+                yield event, json.loads("\n".join(data_lines))
+            event, data_lines = "message", []
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data_lines.append(line[len("data:"):].strip())
+    if data_lines:
+        yield event, json.loads("\n".join(data_lines))
+
+
+def stream_tokens(events, result):
+    """Feed token events to st.write_stream; keep the trailing event in `result`."""
+    for event, data in events:
+        if event == "token":
+            yield data.get("text", "")
+        elif event == "done":
+            result["done"] = data
+        elif event == "error":
+            raise RuntimeError(data.get("detail", "stream error"))
+
+
 # -----------------------
 # Streamlit page setup
 # -----------------------
@@ -81,28 +116,78 @@ if prompt:
         error_msg = None
         answer = ""
         context_used = 0
+        streamed = False
+        retry_after = None
+        bubble = None  # placeholder of the streamed assistant reply
 
         try:
-            resp = requests.post(
-                f"{RAG_API_URL}/api/chat",
-                json={
-                    "session_id": st.session_state.session_id,
-                    "message": prompt,
-                },
-                timeout=REQUEST_TIMEOUT_S,
-            )
-
-            status_code = resp.status_code
-            resp.raise_for_status()
-
-            data = resp.json()
-            answer = data.get("answer", "")
-            context_used = int(data.get("context_used", 0))
+            if STREAMING_ENABLED:
+                with requests.post(
+                    f"{RAG_API_URL}/api/chat/stream",
+                    json={
+                        "session_id": st.session_state.session_id,
+                        "message": prompt,
+                    },
+                    headers={"X-Request-Timeout": str(REQUEST_TIMEOUT_S)},
+                    timeout=REQUEST_TIMEOUT_S,
+                    stream=True,
+                ) as resp:
+                    status_code = resp.status_code
+                    if status_code in (429, 503):
+                        retry_after = resp.headers.get("Retry-After")
+                    resp.raise_for_status()
+
+                    events = iter_sse(resp)
+                    result = {}
+                    with st.chat_message("assistant"):
+                        # First event carries the retrieved sources
+                        for event, data in events:
+                            if event == "sources":
+                                context_used = int(data.get("context_used", 0))
+                                break
+                        if context_used > 0:
+                            st.caption(f"Context chunks used: {context_used}")
+                        streamed = True
+                        bubble = st.empty()
+                        answer = bubble.write_stream(stream_tokens(events, result))
+                    if isinstance(answer, list):
+                        answer = "".join(str(a) for a in answer)
+
+                    timings = (result.get("done") or {}).get("timings") or {}
+                    if timings.get("ttft_ms") is not None:
+                        span.set_attribute("rag.ttft_ms", timings["ttft_ms"])
+            else:
+                resp = requests.post(
+                    f"{RAG_API_URL}/api/chat",
+                    json={
+                        "session_id": st.session_state.session_id,
+                        "message": prompt,
+                    },
+                    headers={"X-Request-Timeout": str(REQUEST_TIMEOUT_S)},
+                    timeout=REQUEST_TIMEOUT_S,
+                )
+
+                status_code = resp.status_code
+                if status_code in (429, 503):
+                    retry_after = resp.headers.get("Retry-After")
+                resp.raise_for_status()
+
+                data = resp.json()
+                answer = data.get("answer", "")
+                context_used = int(data.get("context_used", 0))
 
         except Exception as e:
             error_msg = str(e)
             answer = f" Error calling RAG API: {e}"
-            context_used = 0
+            if retry_after:
+                # Shed by the orchestrator's LLM admission control
+                answer = f" The assistant is busy right now; please retry in {retry_after}s."
+            if bubble is not None:
+                # Failed mid-stream: replace the partial reply in its own bubble
+                bubble.markdown(answer)
+            else:
+                context_used = 0
+                streamed = False
 
         duration_ms = round((time.time() - start) * 1000.0, 2)
 
@@ -129,7 +214,8 @@ if prompt:
 
         # ---- render assistant reply ----
         st.session_state.messages.append({"role": "assistant", "content": answer})
-        with st.chat_message("assistant"):
-            if context_used > 0:
-                st.caption(f"Context chunks used: {context_used}")
-            st.markdown(answer)
+        if not streamed:
+            with st.chat_message("assistant"):
+                if context_used > 0:
+                    st.caption(f"Context chunks used: {context_used}")
+                st.markdown(answer)